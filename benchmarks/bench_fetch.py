@@ -0,0 +1,121 @@
+"""Benchmark annotation fetch engines against the stub API server.
+
+Usage:
+    python -m benchmarks.bench_fetch --videos 100 --latency 0.05 --connect-latency 0.1
+    python -m benchmarks.bench_fetch --project-dir ./bench_project --rate-limit 20
+
+Every engine downloads all annotations of the synthetic project from its own stub server, so
+connections and rate limited requests are counted per engine. Annotations downloaded by
+different engines are checked to be the same.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import src.globals as g
+import supervisely as sly
+from benchmarks import synthetic
+from benchmarks.bench_pipeline import prepare_project
+from src import fetch
+from src.local_api import LocalApi
+
+ENGINES = ["threads", "async"]
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(project_dir: str, port: int, args) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "benchmarks.stub_server", project_dir, "--port", str(port)]
+    cmd += ["--latency", str(args.latency), "--connect-latency", str(args.connect_latency)]
+    cmd += ["--rate-limit", str(args.rate_limit)]
+    server = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()
+    return server
+
+
+def stop_server(server: subprocess.Popen) -> dict:
+    server.send_signal(signal.SIGINT)
+    stats = json.loads(server.stdout.readline() or "{}")
+    server.wait()
+    return stats
+
+
+def fetch_project(api: sly.Api, local_api: LocalApi):
+    """Download annotations of all datasets, return videos count and digest of annotations"""
+    digest = hashlib.sha1()
+    videos_count = 0
+    for dataset in local_api.dataset.get_list(1, recursive=True):
+        videos = local_api.video.get_list(dataset.id)
+        for video_info, ann_info in fetch.iter_annotations(api, dataset.id, videos):
+            digest.update(json.dumps([video_info.id, ann_info], sort_keys=True).encode())
+            videos_count += 1
+    return videos_count, digest.hexdigest()
+
+
+def run_engine(engine: str, project_dir: str, local_api: LocalApi, args) -> dict:
+    g.FETCH_ENGINE = engine
+    port = get_free_port()
+    server = start_server(project_dir, port, args)
+    try:
+        api = sly.Api(f"http://127.0.0.1:{port}", "x" * 128, ignore_task_id=True)
+        start = time.perf_counter()
+        videos_count, digest = fetch_project(api, local_api)
+        elapsed = time.perf_counter() - start
+    finally:
+        server_stats = stop_server(server)
+    return {
+        "engine": engine,
+        "time": elapsed,
+        "videos_per_s": videos_count / elapsed,
+        "digest": digest,
+        **server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    synthetic.add_arguments(parser)
+    parser.add_argument("--project-dir", default=None, help="where to generate the project")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--connect-latency", type=float, default=0.1, help="seconds per connection")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second")
+    parser.add_argument("--engine", nargs="+", default=ENGINES, choices=ENGINES)
+    args = parser.parse_args()
+
+    params = synthetic.get_project_params(args)
+    project_dir = args.project_dir or os.path.join(
+        tempfile.gettempdir(), "video-objects-stats-bench-fetch"
+    )
+    prepare_project(project_dir, params)
+    local_api = LocalApi(project_dir)
+    print(
+        f"workers={g.FETCH_WORKERS} batch={g.FETCH_BATCH_SIZE} latency={args.latency}s "
+        f"connect={args.connect_latency}s rate_limit={args.rate_limit or '-'}"
+    )
+
+    results = [run_engine(engine, project_dir, local_api, args) for engine in args.engine]
+    for result in results:
+        print(
+            f"{result['engine']:>8}: {result['time']:7.3f} s, {result['videos_per_s']:7.1f} "
+            f"videos/s, {result['connections']} connections, {result['requests']} requests, "
+            f"{result['rate_limited']} rate limited"
+        )
+    if len({result["digest"] for result in results}) > 1:
+        print("Error: engines downloaded different annotations")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Benchmark the stats pipeline on a synthetic project with local API and file store.
+
+Usage:
+    python -m benchmarks.bench_pipeline --videos 100 --frames 500 --output results.json
+    python -m benchmarks.bench_pipeline --compare base.json results.json
+
+The project is generated once per set of synthetic parameters and reused by the next runs,
+so results of different commits are measured on the same data.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+
+import src.functions as f
+import src.globals as g
+import supervisely as sly
+from benchmarks import synthetic
+from src.local_api import LocalApi, _Namespace
+from src.stats import class_balance, object_balance
+
+PARAMS_FILE = "benchmark.json"
+STAGES = ["process_project", "classes_table", "objects_table", "write_report", "save_report"]
+
+FileInfo = namedtuple("FileInfo", ["id", "path", "name"])
+
+
+class LocalFilesApi(LocalApi):
+    """LocalApi with Team Files and task methods used by save_report.
+
+    Uploaded files are copied to files_dir.
+    """
+
+    def __init__(self, project_dir: str, files_dir: str):
+        super().__init__(project_dir)
+        self.files_dir = files_dir
+        self.file = _Namespace()
+        self.file.get_free_dir_name = self._get_free_dir_name
+        self.file.upload_directory = self._upload_directory
+        self.file.upload = self._upload
+        self.file.upload_bulk = self._upload_bulk
+        self.file.get_info_by_path = self._get_file_info
+        self.task = _Namespace()
+        self.task.set_output_report = lambda task_id, file_id, file_name: None
+        self.app = _Namespace()
+        self.app.get_url = lambda task_id: f"local://tasks/{task_id}"
+
+    def _local_path(self, remote_path):
+        return os.path.join(self.files_dir, remote_path.lstrip("/"))
+
+    def _get_free_dir_name(self, team_id, remote_dir):
+        remote_path, idx = remote_dir, 0
+        while os.path.exists(self._local_path(remote_path)):
+            idx += 1
+            remote_path = f"{remote_dir}_{idx:03d}"
+        return remote_path
+
+    def _upload_directory(self, team_id, local_dir, remote_dir, **kwargs):
+        shutil.copytree(local_dir, self._local_path(remote_dir))
+
+    def _upload(self, team_id, src, dst, **kwargs):
+        sly.fs.ensure_base_path(self._local_path(dst))
+        shutil.copy(src, self._local_path(dst))
+
+    def _upload_bulk(self, team_id, src_paths, dst_paths, **kwargs):
+        for src, dst in zip(src_paths, dst_paths):
+            self._upload(team_id, src, dst)
+
+    def _get_file_info(self, team_id, remote_path):
+        if not os.path.exists(self._local_path(remote_path)):
+            return None
+        return FileInfo(1, remote_path, os.path.basename(remote_path))
+
+
+class NullProgress:
+    def __init__(self, total, message):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def update(self, count):
+        pass
+
+
+def get_max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_project(project_dir: str, params: dict) -> dict:
+    """Generate project unless project_dir already has one with the same parameters"""
+    params_path = os.path.join(project_dir, PARAMS_FILE)
+    if os.path.exists(params_path):
+        project_params = sly.json.load_json_file(params_path)
+        same_params = {key: project_params.get(key) for key in params} == params
+        if same_params and project_params.get("generator") == synthetic.GENERATOR_VERSION:
+            return project_params
+    print(f"Generating synthetic project in {project_dir} ...")
+    project_params = synthetic.generate_project(project_dir, **params)
+    sly.json.dump_json_file(project_params, params_path)
+    return project_params
+
+
+def run_once(api, need_to_add_tags: bool, formats: list, work_dir: str) -> dict:
+    g.init(api, 1)
+    timings = {}
+
+    def measure(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    datasets_counts, videos_counts = measure("process_project", f.process_project, NullProgress)
+    classes_stats = measure("classes_table", class_balance.calculate_classes_stats, datasets_counts)
+    objects_store = measure(
+        "objects_table", object_balance.calculate_objects_store, videos_counts, need_to_add_tags
+    )
+    report_dir = os.path.join(work_dir, "report")
+    measure(
+        "write_report",
+        f.write_report_files,
+        classes_stats,
+        objects_store,
+        report_dir,
+        formats,
+        videos_counts,
+        need_to_add_tags,
+    )
+    measure("save_report", f.save_report, report_dir)
+    return timings
+
+
+def run_benchmark(args) -> dict:
+    params = synthetic.get_project_params(args)
+    params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:10]
+    project_dir = args.project_dir or os.path.join(
+        tempfile.gettempdir(), f"video-objects-stats-bench-{params_hash}"
+    )
+    project_params = prepare_project(project_dir, params)
+
+    rss_before_mb = get_max_rss_mb()
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        api = LocalFilesApi(project_dir, os.path.join(work_dir, "files"))
+        for run_idx in range(args.repeat):
+            shutil.rmtree(api.files_dir, ignore_errors=True)
+            runs.append(run_once(api, not args.no_tags, args.format, work_dir))
+            print(f"run {run_idx + 1}/{args.repeat}: {sum(runs[-1].values()):.3f} s")
+
+    best = {stage: min(run[stage] for run in runs) for stage in STAGES}
+    return {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "supervisely": sly.__version__,
+        "params": project_params,
+        "tags": not args.no_tags,
+        "formats": args.format,
+        "count_engine": g.COUNT_ENGINE,
+        "aggregation_workers": g.AGGREGATION_WORKERS,
+        "runs": runs,
+        "best": best,
+        "total": sum(best.values()),
+        "videos_per_s": project_params["total_videos"] / best["process_project"],
+        "figures_per_s": project_params["figures"] / best["process_project"],
+        "max_rss_mb": get_max_rss_mb(),
+        "rss_before_mb": rss_before_mb,
+    }
+
+
+def print_result(result: dict):
+    params = result["params"]
+    print(
+        f"commit {result['commit']}: {params['total_videos']} videos, "
+        f"{params['figures']} figures, tags={result['tags']}, formats={result['formats']}"
+    )
+    for stage in STAGES:
+        print(f"  {stage:>16}: {result['best'][stage]:8.3f} s")
+    print(f"  {'total':>16}: {result['total']:8.3f} s")
+    print(
+        f"  {result['videos_per_s']:.1f} videos/s, {result['figures_per_s']:.0f} figures/s, "
+        f"peak RSS {result['max_rss_mb']:.0f} MiB (before run {result['rss_before_mb']:.0f} MiB)"
+    )
+
+
+def compare(base_path: str, new_path: str):
+    base = sly.json.load_json_file(base_path)
+    new = sly.json.load_json_file(new_path)
+    if base["params"] != new["params"]:
+        print("Warning: results were measured on different synthetic projects")
+    print(f"{'stage':>16} {base['commit'] or 'base':>10} {new['commit'] or 'new':>10}  speedup")
+    for stage in [*STAGES, "total"]:
+        base_time = base["best"][stage] if stage != "total" else base["total"]
+        new_time = new["best"][stage] if stage != "total" else new["total"]
+        speedup = base_time / new_time if new_time > 0 else float("inf")
+        print(f"{stage:>16} {base_time:10.3f} {new_time:10.3f}  x{speedup:.2f}")
+    for key in ("videos_per_s", "figures_per_s", "max_rss_mb"):
+        print(f"{key:>16} {base[key]:10.1f} {new[key]:10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    synthetic.add_arguments(parser)
+    parser.add_argument("--project-dir", default=None, help="where to generate the project")
+    parser.add_argument("--no-tags", action="store_true", help="do not add tags columns")
+    parser.add_argument("--format", nargs="+", default=["csv"], help="report formats")
+    parser.add_argument("--repeat", type=int, default=3, help="runs, the best time is reported")
+    parser.add_argument("--output", default=None, help="json file to save results to")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare results")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = run_benchmark(args)
+    print_result(result)
+    if args.output:
+        sly.json.dump_json_file(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare building the objects table payload with and without the DataFrame round trip.
+
+Usage:
+    python -m benchmarks.bench_tables --rows 500000
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+
+from src.stats.object_balance import NUMERIC_COLUMNS
+from src.stats.table import get_split_table
+
+COLUMNS = [
+    "#",
+    "type",
+    "name",
+    "dataset",
+    "video",
+    "video duration",
+    "video frames",
+    "frames",
+    "presence in video",
+    "count",
+    "first frame",
+    "last frame",
+]
+
+
+def generate_rows(rows_count):
+    rows = []
+    for idx in range(rows_count):
+        frames_count = random.randint(100, 10000)
+        figures = random.randint(1, frames_count)
+        first_frame = random.randint(0, frames_count - figures)
+        rows.append(
+            [
+                idx + 1,
+                "Object",
+                f"class_{idx % 20}",
+                "ds0",
+                f"video_{idx // 50}.mp4",
+                "00:01:40",
+                frames_count,
+                figures,
+                round(figures / frames_count * 100, 2),
+                figures,
+                first_frame,
+                first_frame + figures - 1,
+            ]
+        )
+    return rows
+
+
+def build_with_dataframe(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    return json.loads(df.to_json(orient="split"))
+
+
+def build_split_table(rows):
+    return get_split_table(COLUMNS, rows, NUMERIC_COLUMNS)
+
+
+def measure(name, func, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>12}: {elapsed:8.3f} s, peak {peak / 2**20:8.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    rows = generate_rows(args.rows)
+    expected = measure("dataframe", build_with_dataframe, [list(row) for row in rows])
+    result = measure("split table", build_split_table, rows)
+    assert json.dumps(expected) == json.dumps(result), "payloads differ"
+
+
+if __name__ == "__main__":
+    main()
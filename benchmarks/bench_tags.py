@@ -0,0 +1,65 @@
+"""Compare objects table rows building with and without tags columns.
+
+Usage:
+    python -m benchmarks.bench_tags --objects 200000 --tag-metas 200
+"""
+
+import argparse
+import random
+import time
+
+import src.globals as g
+import supervisely as sly
+from src.stats.object_balance import get_video_name, iter_objects_rows
+from src.summary import ObjectRecord, TagRecord, VideoRecord, VideoSummary
+
+OBJECTS_PER_VIDEO = 100
+
+
+def generate_project_meta(tag_metas_count):
+    tag_metas = [
+        sly.TagMeta(f"tag_{idx}", sly.TagValueType.ANY_STRING if idx % 2 else sly.TagValueType.NONE)
+        for idx in range(tag_metas_count)
+    ]
+    return sly.ProjectMeta(tag_metas=sly.TagMetaCollection(tag_metas))
+
+
+def generate_videos_counts(objects_count, tag_metas_count, tags_per_object):
+    videos = []
+    for video_idx in range((objects_count + OBJECTS_PER_VIDEO - 1) // OBJECTS_PER_VIDEO):
+        video = VideoRecord(video_idx, f"video_{video_idx}.mp4", 1, 1000, 40.0, None)
+        objects = []
+        for obj_idx in range(OBJECTS_PER_VIDEO):
+            tags = []
+            for _ in range(tags_per_object):
+                start = random.randint(0, 900)
+                frame_range = (start, start + 99) if random.random() < 0.5 else None
+                tags.append(TagRecord(f"tag_{random.randrange(tag_metas_count)}", "v", frame_range))
+            objects.append(ObjectRecord(str(obj_idx), "car", 100, 100, 0, 99, tuple(tags)))
+        videos.append(VideoSummary(video, objects, (), {}, {}, {}))
+    return {"ds0": videos}
+
+
+def measure(name, videos_counts, need_to_add_tags):
+    start = time.perf_counter()
+    rows_count = sum(1 for _ in iter_objects_rows(videos_counts, need_to_add_tags, get_video_name))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10}: {elapsed:8.3f} s for {rows_count} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=100000)
+    parser.add_argument("--tag-metas", type=int, default=200)
+    parser.add_argument("--tags-per-object", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    g.PROJECT_META = generate_project_meta(args.tag_metas)
+    videos_counts = generate_videos_counts(args.objects, args.tag_metas, args.tags_per_object)
+    measure("untagged", videos_counts, False)
+    measure("tagged", videos_counts, True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Stub API server serving annotations of a video project on disk with injected latency.
+
+Usage:
+    python -m benchmarks.stub_server ./bench_project --port 8000 --latency 0.05 --connect-latency 0.1
+
+Only bulk annotations download (and instance version) is served:
+POST /public/api/v3/videos.annotations.bulk.info.
+Video and dataset ids are the ones of LocalApi for the same project. --connect-latency is
+added once per new connection to emulate TLS and connection setup, --rate-limit answers 429
+with Retry-After to requests over the limit.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.local_api import LocalApi
+
+BULK_DOWNLOAD_PATH = "/public/api/v3/videos.annotations.bulk.info"
+# the SDK checks instance version after failed requests
+VERSION_PATH = "/public/api/v3/instance.version"
+
+
+class RateLimiter:
+    """Fixed window limit of requests per second"""
+
+    def __init__(self, requests_per_second: float):
+        self.requests_per_second = requests_per_second
+        self._lock = threading.Lock()
+        self._window = None
+        self._count = 0
+
+    def allow(self) -> bool:
+        if not self.requests_per_second:
+            return True
+        with self._lock:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window, self._count = window, 0
+            self._count += 1
+            return self._count <= self.requests_per_second
+
+
+def make_handler(api: LocalApi, latency: float, connect_latency: float, limiter: RateLimiter):
+    stats = {"connections": 0, "requests": 0, "rate_limited": 0}
+    stats_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with stats_lock:
+                stats["connections"] += 1
+            time.sleep(connect_latency)
+
+        def send_body(self, status: int, body: bytes, headers: dict = None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.send_body(404, b"{}")
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if self.path == VERSION_PATH:
+                self.send_body(200, b'{"version": "unknown"}')
+                return
+            if self.path != BULK_DOWNLOAD_PATH:
+                self.send_body(404, b"{}")
+                return
+            with stats_lock:
+                stats["requests"] += 1
+            if not limiter.allow():
+                with stats_lock:
+                    stats["rate_limited"] += 1
+                self.send_body(429, b'{"error": "rate limit"}', {"Retry-After": "1"})
+                return
+            time.sleep(latency)
+            ann_infos = [
+                api.video.annotation.download(video_id) for video_id in payload["videoIds"]
+            ]
+            self.send_body(200, json.dumps(ann_infos).encode("utf-8"))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler, stats
+
+
+def serve(project_dir: str, port: int, latency=0.0, connect_latency=0.0, rate_limit=0.0):
+    api = LocalApi(project_dir)
+    handler, stats = make_handler(api, latency, connect_latency, RateLimiter(rate_limit))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    print(f"Serving {project_dir} on http://127.0.0.1:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(stats), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("project_dir")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="seconds per connection")
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="requests per second, 0 - off"
+    )
+    args = parser.parse_args()
+    serve(args.project_dir, args.port, args.latency, args.connect_latency, args.rate_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Generate synthetic video project in Supervisely format for benchmarks.
+
+Usage:
+    python -m benchmarks.synthetic ./bench_project --videos 200 --frames 1000 --objects 20
+
+The same arguments and seed always produce the same project, so benchmark results
+of different commits are comparable.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import uuid
+
+import supervisely as sly
+
+# bump when generated projects change, so benchmarks regenerate them
+GENERATOR_VERSION = 2
+GEOMETRY_TYPES = [sly.Rectangle, sly.Polygon, sly.Point]
+
+
+def get_key(rng: random.Random) -> str:
+    return uuid.UUID(int=rng.getrandbits(128)).hex
+
+
+def generate_meta(classes: int, tag_metas: int) -> sly.ProjectMeta:
+    obj_classes = [
+        sly.ObjClass(
+            f"class_{idx}",
+            GEOMETRY_TYPES[idx % len(GEOMETRY_TYPES)],
+            color=[(idx * 37) % 256, (idx * 91) % 256, (idx * 53) % 256],
+        )
+        for idx in range(classes)
+    ]
+    tags = [
+        sly.TagMeta(
+            f"tag_{idx}",
+            sly.TagValueType.ANY_STRING if idx % 2 else sly.TagValueType.NONE,
+            color=[(idx * 41) % 256, (idx * 17) % 256, (idx * 29) % 256],
+        )
+        for idx in range(tag_metas)
+    ]
+    return sly.ProjectMeta(
+        obj_classes=sly.ObjClassCollection(obj_classes), tag_metas=sly.TagMetaCollection(tags)
+    )
+
+
+def generate_geometry(rng: random.Random, geometry_type: str) -> dict:
+    x, y = rng.randint(0, 1200), rng.randint(0, 640)
+    if geometry_type == sly.Point.geometry_name():
+        exterior = [[x, y]]
+    elif geometry_type == sly.Rectangle.geometry_name():
+        exterior = [[x, y], [x + rng.randint(1, 80), y + rng.randint(1, 80)]]
+    else:
+        exterior = [[x, y], [x + rng.randint(1, 80), y], [x, y + rng.randint(1, 80)]]
+    return {"points": {"exterior": exterior, "interior": []}}
+
+
+def generate_tags(rng: random.Random, ids, tag_metas: list, count: int, frames: int) -> list:
+    tags = []
+    for tag_meta in rng.sample(tag_metas, min(count, len(tag_metas))):
+        tag = {"id": next(ids), "name": tag_meta.name, "key": get_key(rng)}
+        if tag_meta.value_type != sly.TagValueType.NONE:
+            tag["value"] = f"value_{rng.randint(0, 9)}"
+        if rng.random() < 0.5:
+            start = rng.randrange(frames)
+            tag["frameRange"] = [start, min(frames - 1, start + rng.randint(0, frames // 4))]
+        tags.append(tag)
+    return tags
+
+
+def generate_annotation(
+    rng: random.Random,
+    ids,
+    meta: sly.ProjectMeta,
+    frames: int,
+    objects: int,
+    figures_per_frame: float,
+    tags_per_object: int,
+) -> dict:
+    """Objects are tracks of consecutive frames; figures_per_frame is the mean number of
+    figures on a frame. Objects, figures and tags get ids from ids iterator as on the server.
+    """
+    obj_classes = list(meta.obj_classes)
+    tag_metas = list(meta.tag_metas)
+    track_length = max(1, min(frames, round(frames * figures_per_frame / max(objects, 1))))
+
+    ann_objects = []
+    frame_figures = {}
+    for _ in range(objects):
+        obj_class = rng.choice(obj_classes)
+        obj_key, obj_id = get_key(rng), next(ids)
+        ann_objects.append(
+            {
+                "id": obj_id,
+                "key": obj_key,
+                "classTitle": obj_class.name,
+                "tags": generate_tags(rng, ids, tag_metas, tags_per_object, frames),
+            }
+        )
+        start = rng.randint(0, frames - track_length)
+        for frame_index in range(start, start + track_length):
+            frame_figures.setdefault(frame_index, []).append(
+                {
+                    "id": next(ids),
+                    "key": get_key(rng),
+                    "objectId": obj_id,
+                    "objectKey": obj_key,
+                    "geometryType": obj_class.geometry_type.geometry_name(),
+                    "geometry": generate_geometry(rng, obj_class.geometry_type.geometry_name()),
+                }
+            )
+
+    return {
+        "key": get_key(rng),
+        "description": "",
+        "size": {"height": 720, "width": 1280},
+        "framesCount": frames,
+        "tags": generate_tags(rng, ids, tag_metas, 2, frames),
+        "objects": ann_objects,
+        "frames": [
+            {"index": frame_index, "figures": figures}
+            for frame_index, figures in sorted(frame_figures.items())
+        ],
+    }
+
+
+def generate_project(
+    project_dir: str,
+    datasets: int = 2,
+    videos: int = 20,
+    frames: int = 300,
+    objects: int = 10,
+    figures_per_frame: float = 3.0,
+    classes: int = 5,
+    tag_metas: int = 10,
+    tags_per_object: int = 1,
+    seed: int = 0,
+) -> dict:
+    """Write project to project_dir and return its parameters with total figures count.
+
+    :param videos: number of videos in every dataset
+    """
+    rng = random.Random(seed)
+    ids = itertools.count(1)
+    meta = generate_meta(classes, tag_metas)
+    sly.fs.mkdir(project_dir, remove_content_if_exists=True)
+    sly.json.dump_json_file(meta.to_json(), os.path.join(project_dir, "meta.json"))
+
+    figures = 0
+    for ds_idx in range(datasets):
+        ann_dir = os.path.join(project_dir, f"ds_{ds_idx}", "ann")
+        sly.fs.mkdir(ann_dir)
+        for video_idx in range(videos):
+            ann_json = generate_annotation(
+                rng, ids, meta, frames, objects, figures_per_frame, tags_per_object
+            )
+            figures += sum(len(frame["figures"]) for frame in ann_json["frames"])
+            ann_path = os.path.join(ann_dir, f"video_{video_idx:05d}.mp4.json")
+            sly.json.dump_json_file(ann_json, ann_path, indent=None)
+
+    return {
+        "datasets": datasets,
+        "videos": videos,
+        "total_videos": datasets * videos,
+        "frames": frames,
+        "objects": objects,
+        "figures_per_frame": figures_per_frame,
+        "classes": classes,
+        "tag_metas": tag_metas,
+        "tags_per_object": tags_per_object,
+        "seed": seed,
+        "generator": GENERATOR_VERSION,
+        "figures": figures,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--datasets", type=int, default=2)
+    parser.add_argument("--videos", type=int, default=20, help="videos in every dataset")
+    parser.add_argument("--frames", type=int, default=300, help="frames in every video")
+    parser.add_argument("--objects", type=int, default=10, help="objects in every video")
+    parser.add_argument("--figures-per-frame", type=float, default=3.0)
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--tag-metas", type=int, default=10)
+    parser.add_argument("--tags-per-object", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def get_project_params(args) -> dict:
+    return {
+        "datasets": args.datasets,
+        "videos": args.videos,
+        "frames": args.frames,
+        "objects": args.objects,
+        "figures_per_frame": args.figures_per_frame,
+        "classes": args.classes,
+        "tag_metas": args.tag_metas,
+        "tags_per_object": args.tags_per_object,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("project_dir")
+    add_arguments(parser)
+    args = parser.parse_args()
+    params = generate_project(args.project_dir, **get_project_params(args))
+    print(f"Generated {params['total_videos']} videos with {params['figures']} figures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import json
+import os
+
+import src.globals as g
+import supervisely as sly
+from src import perf, summary
+
+CACHE_VERSION = 6
+
+
+def get_meta_hash(project_meta: sly.ProjectMeta) -> str:
+    """Hash of project meta and of the settings that change video summaries"""
+    meta_json = json.dumps(
+        {"meta": project_meta.to_json(), "geometry_stats": g.GEOMETRY_STATS}, sort_keys=True
+    )
+    return hashlib.sha1(meta_json.encode("utf-8")).hexdigest()
+
+
+class StatsCache:
+    """Per-video summaries of previous runs, keyed by video id and updated_at.
+
+    Summaries are kept in a file per dataset with the meta hash, a dataset file is read when
+    its first video is looked up, and written back only if its entries have changed. Only the
+    dataset being processed is kept in memory, complete_dataset writes and drops it. A dataset
+    file is ignored if project meta or settings of summaries have changed.
+    """
+
+    def __init__(self, dir_path: str, meta_hash: str, download=None):
+        self.dir_path = dir_path
+        self.meta_hash = meta_hash
+        # function(file name, local path) that downloads a dataset file missing on disk
+        self.download = download
+        # dataset id -> {video id: [updated_at, summary json]}
+        self.datasets = {}
+        self.changed = set()
+        # names of dataset files written by this run
+        self.saved = []
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get_path(self, dataset_id: int) -> str:
+        return os.path.join(self.dir_path, get_file_name(dataset_id))
+
+    def _load_dataset(self, dataset_id: int) -> dict:
+        path = self.get_path(dataset_id)
+        if self.download is not None and not os.path.isfile(path):
+            self.download(get_file_name(dataset_id), path)
+        if not os.path.isfile(path):
+            return {}
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                data = json.load(file)
+        except Exception as e:
+            sly.logger.warning(f"Failed to read stats cache {path}: {repr(e)}. Ignoring it")
+            return {}
+        if data.get("version") != CACHE_VERSION or data.get("meta_hash") != self.meta_hash:
+            sly.logger.info(
+                f"Project meta or stats settings have changed, stats cache of dataset "
+                f"{dataset_id} is invalidated"
+            )
+            self.changed.add(dataset_id)
+            return {}
+        return {int(video_id): entry for video_id, entry in data["entries"].items()}
+
+    def get_entries(self, dataset_id: int) -> dict:
+        if dataset_id not in self.datasets:
+            self.datasets[dataset_id] = self._load_dataset(dataset_id)
+        return self.datasets[dataset_id]
+
+    def get(self, video_info):
+        """Return cached VideoSummary if the video has not changed since it was cached"""
+        entry = self.get_entries(video_info.dataset_id).get(video_info.id)
+        updated_at = getattr(video_info, "updated_at", None)
+        if entry is None or updated_at is None or entry[0] != updated_at:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return summary.summary_from_json(entry[1])
+
+    def put(self, video_summary: summary.VideoSummary):
+        video = video_summary.video
+        if video.updated_at is None:
+            return
+        entries = self.get_entries(video.dataset_id)
+        entries[video.id] = [video.updated_at, summary.summary_to_json(video_summary)]
+        self.changed.add(video.dataset_id)
+
+    def complete_dataset(self, dataset_id: int, alive_video_ids):
+        """Drop entries of deleted videos, write the dataset file if it has changed and
+        release the dataset
+        """
+        entries = self.get_entries(dataset_id)
+        alive_video_ids = set(alive_video_ids)
+        for video_id in list(entries):
+            if video_id not in alive_video_ids:
+                del entries[video_id]
+                self.evicted += 1
+                self.changed.add(dataset_id)
+        if dataset_id in self.changed:
+            self._save_dataset(dataset_id)
+        del self.datasets[dataset_id]
+
+    def _save_dataset(self, dataset_id: int):
+        sly.fs.mkdir(self.dir_path)
+        data = {
+            "version": CACHE_VERSION,
+            "meta_hash": self.meta_hash,
+            "entries": self.datasets[dataset_id],
+        }
+        path = self.get_path(dataset_id)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        self.changed.discard(dataset_id)
+        self.saved.append(get_file_name(dataset_id))
+
+    def save(self):
+        """Write changed datasets that are still in memory"""
+        for dataset_id in list(self.changed):
+            if dataset_id in self.datasets:
+                self._save_dataset(dataset_id)
+
+
+def get_file_name(dataset_id: int) -> str:
+    return f"{dataset_id}.json.gz"
+
+
+def get_cache_dir(project_id: int) -> str:
+    return os.path.join(g.STORAGE_DIR, "cache", str(project_id))
+
+
+def get_remote_cache_dir(project_id: int) -> str:
+    return f"{g.CACHE_TEAM_FILES_DIR.rstrip('/')}/{project_id}"
+
+
+@perf.timed("cache_load")
+def load_cache(api: sly.Api, project_id: int, project_meta: sly.ProjectMeta) -> StatsCache:
+    """Cache in local storage, dataset files missing on disk are downloaded from Team Files
+    if mirroring is enabled
+    """
+    remote_dir = get_remote_cache_dir(project_id)
+
+    def download(file_name: str, path: str):
+        remote_path = f"{remote_dir}/{file_name}"
+        try:
+            if api.file.exists(g.TEAM_ID, remote_path):
+                sly.fs.mkdir(os.path.dirname(path))
+                api.file.download(g.TEAM_ID, remote_path, path)
+        except Exception as e:
+            sly.logger.warning(f"Failed to download stats cache {remote_path}: {repr(e)}")
+
+    return StatsCache(
+        get_cache_dir(project_id),
+        get_meta_hash(project_meta),
+        download if g.CACHE_TEAM_FILES_DIR else None,
+    )
+
+
+@perf.timed("cache_save")
+def save_cache(api: sly.Api, project_id: int, cache: StatsCache):
+    """Save changed datasets of the cache and mirror them to Team Files if enabled"""
+    cache.save()
+    sly.logger.info(
+        "Stats cache saved",
+        extra={
+            "cache hits": cache.hits,
+            "cache misses": cache.misses,
+            "evicted": cache.evicted,
+            "datasets saved": len(cache.saved),
+        },
+    )
+    if not g.CACHE_TEAM_FILES_DIR:
+        return
+    remote_dir = get_remote_cache_dir(project_id)
+    for file_name in cache.saved:
+        remote_path = f"{remote_dir}/{file_name}"
+        try:
+            if api.file.exists(g.TEAM_ID, remote_path):
+                api.file.remove(g.TEAM_ID, remote_path)
+            api.file.upload(g.TEAM_ID, os.path.join(cache.dir_path, file_name), remote_path)
+        except Exception as e:
+            sly.logger.warning(f"Failed to upload stats cache to {remote_path}: {repr(e)}")
@@ -0,0 +1,137 @@
+import gzip
+import json
+import os
+import time
+
+import src.globals as g
+import supervisely as sly
+from src import perf, summary
+from src.cache import get_meta_hash
+
+CHECKPOINT_VERSION = 4
+STATE_FILE = "state.json"
+
+
+class Checkpoint:
+    """Video summaries of an interrupted run, so a restarted run resumes where it stopped.
+
+    New summaries are written as gzipped segments; the state file lists saved segments and
+    completed datasets. Both are replaced atomically, a segment missing in the state is ignored.
+    """
+
+    def __init__(self, dir_path: str, meta_hash: str):
+        self.dir_path = dir_path
+        self.meta_hash = meta_hash
+        self.segments = []
+        self.completed_datasets = []
+        # dataset id -> {video id: VideoSummary} restored from the previous run,
+        # summaries of the current run are only written to segments
+        self.summaries = {}
+        self.restored = 0
+        self._pending = []
+        self._saved_at = time.monotonic()
+
+    @classmethod
+    def load(cls, dir_path: str, meta_hash: str) -> "Checkpoint":
+        checkpoint = cls(dir_path, meta_hash)
+        state_path = os.path.join(dir_path, STATE_FILE)
+        if not os.path.isfile(state_path):
+            return checkpoint
+        try:
+            state = sly.json.load_json_file(state_path)
+            if state.get("version") != CHECKPOINT_VERSION or state.get("meta_hash") != meta_hash:
+                sly.logger.info(
+                    "Project meta or stats settings have changed, "
+                    "checkpoint of the previous run is ignored"
+                )
+                return checkpoint
+            for segment in state["segments"]:
+                with gzip.open(os.path.join(dir_path, segment), "rt", encoding="utf-8") as file:
+                    for dataset_id, summary_json in json.load(file):
+                        video_summary = summary.summary_from_json(summary_json)
+                        dataset_summaries = checkpoint.summaries.setdefault(dataset_id, {})
+                        dataset_summaries[video_summary.video.id] = video_summary
+        except Exception as e:
+            sly.logger.warning(f"Failed to read checkpoint {dir_path}: {repr(e)}. Ignoring it")
+            return cls(dir_path, meta_hash)
+        checkpoint.segments = state["segments"]
+        checkpoint.completed_datasets = state["completed_datasets"]
+        return checkpoint
+
+    def get_completed_dataset(self, dataset_id: int):
+        """Return list of VideoSummary of a dataset completed before or None"""
+        if dataset_id not in self.completed_datasets:
+            return None
+        dataset_summaries = list(self.summaries.get(dataset_id, {}).values())
+        self.restored += len(dataset_summaries)
+        return dataset_summaries
+
+    def get(self, dataset_id: int, video_info):
+        """Return VideoSummary saved before if the video has not changed since then"""
+        video_summary = self.summaries.get(dataset_id, {}).get(video_info.id)
+        if video_summary is None:
+            return None
+        if video_summary.video.updated_at != getattr(video_info, "updated_at", None):
+            return None
+        self.restored += 1
+        return video_summary
+
+    def add(self, dataset_id: int, video_summary: summary.VideoSummary):
+        if self.summaries.get(dataset_id, {}).get(video_summary.video.id) is video_summary:
+            return
+        self._pending.append([dataset_id, summary.summary_to_json(video_summary)])
+
+    def complete_dataset(self, dataset_id: int):
+        if dataset_id not in self.completed_datasets:
+            self.completed_datasets.append(dataset_id)
+        self.summaries.pop(dataset_id, None)
+        self.save()
+
+    def is_due(self) -> bool:
+        return time.monotonic() - self._saved_at >= g.CHECKPOINT_INTERVAL
+
+    @perf.timed("checkpoint")
+    def save(self):
+        sly.fs.mkdir(self.dir_path)
+        if len(self._pending) > 0:
+            segment = f"{len(self.segments):06d}.json.gz"
+            segment_path = os.path.join(self.dir_path, segment)
+            with gzip.open(segment_path + ".tmp", "wt", encoding="utf-8") as file:
+                json.dump(self._pending, file, separators=(",", ":"))
+            os.replace(segment_path + ".tmp", segment_path)
+            self.segments.append(segment)
+            self._pending = []
+
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "meta_hash": self.meta_hash,
+            "segments": self.segments,
+            "completed_datasets": self.completed_datasets,
+        }
+        state_path = os.path.join(self.dir_path, STATE_FILE)
+        sly.json.dump_json_file(state, state_path + ".tmp")
+        os.replace(state_path + ".tmp", state_path)
+        self._saved_at = time.monotonic()
+
+    def remove(self):
+        sly.fs.remove_dir(self.dir_path)
+
+
+def get_checkpoint_dir(project_id: int, dataset_id=None) -> str:
+    selection = dataset_id if dataset_id is not None else "all"
+    return os.path.join(g.STORAGE_DIR, "checkpoints", f"{project_id}_{selection}")
+
+
+def load_checkpoint(project_id: int, dataset_id, project_meta: sly.ProjectMeta) -> Checkpoint:
+    checkpoint = Checkpoint.load(
+        get_checkpoint_dir(project_id, dataset_id), get_meta_hash(project_meta)
+    )
+    if len(checkpoint.summaries) > 0:
+        sly.logger.info(
+            "Resuming from checkpoint of the previous run",
+            extra={
+                "videos": sum(map(len, checkpoint.summaries.values())),
+                "completed datasets": len(checkpoint.completed_datasets),
+            },
+        )
+    return checkpoint
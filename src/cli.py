@@ -0,0 +1,158 @@
+"""Headless stats calculation without the app UI.
+
+Examples:
+    python -m src.cli --project-id 123 456 --output-dir ./stats --format csv parquet
+    python -m src.cli --dataset-id 789 --output-dir ./stats --no-tags
+    python -m src.cli --fixture-dir ./my_video_project --output-dir ./stats --format json
+
+Sharded run, every shard may run on its own machine, then shard files are merged:
+    python -m src.cli --project-id 123 --output-dir ./stats --shard 0 4
+    ...
+    python -m src.cli --project-id 123 --output-dir ./stats --shard 3 4
+    python -m src.cli --project-id 123 --output-dir ./stats --merge
+Or all shards in local processes and the merge at once:
+    python -m src.cli --project-id 123 --output-dir ./stats --processes 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+import src.functions as f
+import src.globals as g
+import supervisely as sly
+from src import shard
+from src.local_api import LocalApi
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Video objects stats for every class")
+    parser.add_argument("--project-id", type=int, nargs="*", default=[], help="video project ids")
+    parser.add_argument("--dataset-id", type=int, nargs="*", default=[], help="video dataset ids")
+    parser.add_argument(
+        "--fixture-dir",
+        default=None,
+        help="video project in Supervisely format on disk to use instead of the server",
+    )
+    parser.add_argument("--output-dir", default="stats", help="directory to write reports to")
+    parser.add_argument(
+        "--format",
+        nargs="+",
+        default=["csv"],
+        choices=["csv", "json", "parquet", "arrow"],
+        help="report formats",
+    )
+    parser.add_argument(
+        "--no-tags", action="store_true", help="do not add tags columns to objects table"
+    )
+    parser.add_argument(
+        "--shard",
+        type=int,
+        nargs=2,
+        metavar=("INDEX", "COUNT"),
+        default=None,
+        help="process shard INDEX of COUNT and save its shard file to the output directory",
+    )
+    parser.add_argument(
+        "--shard-by", choices=shard.SHARD_BY, default=g.SHARD_BY, help="how to split videos"
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="merge shard files of --shards-dir into reports instead of processing the project",
+    )
+    parser.add_argument(
+        "--shards-dir",
+        default=None,
+        help="directory with shard files of sharded runs, --output-dir by default",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="run shards in N local processes and merge them",
+    )
+    args = parser.parse_args(args)
+    if args.fixture_dir is None and not args.project_id and not args.dataset_id:
+        parser.error("at least one of --project-id, --dataset-id or --fixture-dir is required")
+    if sum([args.shard is not None, args.merge, args.processes > 1]) > 1:
+        parser.error("--shard, --merge and --processes can not be used together")
+    return args
+
+
+def get_shard_command(args, index: int, count: int) -> list:
+    """Return command line of a shard process with the same targets and options"""
+    command = [sys.executable, "-m", "src.cli", "--output-dir", args.output_dir]
+    if args.project_id:
+        command += ["--project-id", *map(str, args.project_id)]
+    if args.dataset_id:
+        command += ["--dataset-id", *map(str, args.dataset_id)]
+    if args.fixture_dir is not None:
+        command += ["--fixture-dir", args.fixture_dir]
+    if args.no_tags:
+        command.append("--no-tags")
+    command += ["--format", *args.format, "--shard-by", args.shard_by]
+    return command + ["--shard", str(index), str(count)]
+
+
+def run_shard_processes(args):
+    """Run all shards in local processes, raise if any of them fails"""
+    processes = [
+        subprocess.Popen(get_shard_command(args, index, args.processes))
+        for index in range(args.processes)
+    ]
+    failed = [index for index, process in enumerate(processes) if process.wait() != 0]
+    if len(failed) > 0:
+        raise RuntimeError(f"Shards {failed} of {args.processes} failed")
+
+
+def get_targets(api, args):
+    """Return list of (project_id, dataset_id) pairs to calculate stats for"""
+    if args.fixture_dir is not None:
+        project_id = api.project.get_info_by_id(1).id
+        targets = [(project_id, dataset_id) for dataset_id in args.dataset_id]
+        return targets or [(project_id, None)]
+    targets = [(project_id, None) for project_id in args.project_id]
+    targets.extend((None, dataset_id) for dataset_id in args.dataset_id)
+    return targets
+
+
+def run(args):
+    if args.processes > 1:
+        run_shard_processes(args)
+        args.merge = True
+    if args.shard is not None:
+        shard.configure(*args.shard, args.shard_by)
+
+    if args.fixture_dir is not None:
+        api = LocalApi(args.fixture_dir)
+    else:
+        # one API connection is reused for all projects
+        api = sly.Api.from_env()
+
+    for project_id, dataset_id in get_targets(api, args):
+        g.init(api, project_id, dataset_id)
+
+        report_name = f"{g.PROJECT.id}_{g.PROJECT.name}"
+        if g.DATASET is not None:
+            report_name += f"_{g.DATASET.id}_{g.DATASET.name}"
+        report_dir = os.path.join(args.output_dir, report_name)
+        shards_dir = None
+        if args.merge:
+            shards_dir = os.path.join(args.shards_dir or args.output_dir, report_name)
+        f.calculate_stats(
+            need_to_add_tags=not args.no_tags,
+            report_dir=report_dir,
+            formats=args.format,
+            shards_dir=shards_dir,
+        )
+        sly.logger.info(f"Stats saved to {report_dir}")
+
+
+def main():
+    run(parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import supervisely as sly
+
+
+class DatasetTree:
+    """Project datasets hierarchy resolved with a single API call per run"""
+
+    def __init__(self, datasets: list, selected_id: int = None):
+        self.datasets = datasets
+        self.by_id = {ds_info.id: ds_info for ds_info in datasets}
+        self.children = {}
+        for ds_info in datasets:
+            parent_id = getattr(ds_info, "parent_id", None)
+            self.children.setdefault(parent_id, []).append(ds_info.id)
+        self.selected_id = selected_id
+        if selected_id is None:
+            self.selected_ids = set(self.by_id)
+        else:
+            self.selected_ids = {selected_id, *self.get_nested_ids(selected_id)}
+
+    @classmethod
+    def build(cls, api: sly.Api, project_id: int, selected_id: int = None) -> "DatasetTree":
+        return cls(api.dataset.get_list(project_id, recursive=True), selected_id)
+
+    def get_nested_ids(self, dataset_id: int) -> list:
+        """Return ids of all nested datasets of any depth"""
+        nested_ids = []
+        stack = list(reversed(self.children.get(dataset_id, [])))
+        while stack:
+            nested_id = stack.pop()
+            nested_ids.append(nested_id)
+            stack.extend(reversed(self.children.get(nested_id, [])))
+        return nested_ids
+
+    def is_selected(self, dataset_id: int) -> bool:
+        return dataset_id in self.selected_ids
+
+    def get_selected(self) -> list:
+        """Return selected datasets in the order of the project datasets list"""
+        return [ds_info for ds_info in self.datasets if ds_info.id in self.selected_ids]
+
+    def get_items_count(self) -> int:
+        return sum(ds_info.items_count for ds_info in self.get_selected())
+
+    def get_name(self, dataset_id: int) -> str:
+        return self.by_id[dataset_id].name
@@ -0,0 +1,206 @@
+import gzip
+import os
+
+import pandas as pd
+
+import src.globals as g
+import supervisely as sly
+from src.stats import object_balance
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+BATCH_SIZE = 65536
+OBJECTS_CSV_NAME = "objects_stats"
+# faster than the default level 9 and only a few percent larger
+GZIP_LEVEL = 6
+
+# objects table columns that are not strings
+OBJECTS_COLUMNS_TYPES = {
+    "#": "int64",
+    "video frames": "int64",
+    "frames": "int64",
+    "presence in video": "float64",
+    "count": "int64",
+    "first frame": "int64",
+    "last frame": "int64",
+    "runs": "int64",
+    "longest gap": "int64",
+    "average gap": "float64",
+    "average area": "float64",
+    "min area": "float64",
+    "median area": "float64",
+    "max area": "float64",
+    "average width": "float64",
+    "average height": "float64",
+}
+
+
+def check_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for parquet and arrow reports: pip install pyarrow")
+
+
+def get_unique_columns(columns, columns_options):
+    """Make duplicated column names unique with their subtitles (e.g. objects in every dataset)"""
+    unique_columns = []
+    for column, options in zip(columns, columns_options):
+        if columns.count(column) > 1 and options.get("subtitle"):
+            column = f"{column} {options['subtitle']}"
+        unique_columns.append(column)
+    return unique_columns
+
+
+def batched_rows(rows, batch_size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def write_columnar(rows, schema, path: str, fmt: str):
+    """Write rows in record batches, so rows are never materialized as a whole table"""
+    check_pyarrow()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression=g.PARQUET_COMPRESSION)
+    elif fmt == "arrow":
+        writer = pa.ipc.new_file(path, schema)
+    else:
+        raise ValueError(f"Unsupported columnar format {fmt!r}")
+    with writer:
+        for batch in batched_rows(rows):
+            arrays = [
+                pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+
+def write_classes_columnar(cls_stats, path: str, fmt: str, string_columns=("class",)):
+    """Write classes or classes co-occurrence table, columns except string_columns are ints"""
+    check_pyarrow()
+    columns = get_unique_columns(cls_stats["columns"], cls_stats["columnsOptions"])
+    fields = [
+        pa.field(column, pa.string() if column in string_columns else pa.int64())
+        for column in columns
+    ]
+    write_columnar(cls_stats["data"], pa.schema(fields), path, fmt)
+
+
+def write_rows(columns: list, rows, path: str, fmt: str, columns_types: dict = None):
+    """Write a table given as rows iterator, columns not in columns_types are strings.
+
+    csv and columnar formats are written in batches of rows, json as columns and data lists.
+    """
+    columns_types = columns_types or {}
+    if fmt == "csv":
+        with open(path, "w", newline="") as file:
+            pd.DataFrame(columns=columns).to_csv(file, index=False)
+            for batch in batched_rows(rows):
+                pd.DataFrame(batch, columns=columns).to_csv(file, index=False, header=False)
+    elif fmt == "json":
+        sly.json.dump_json_file({"columns": columns, "data": list(rows)}, path, indent=None)
+    elif fmt in COLUMNAR_FORMATS:
+        check_pyarrow()
+        fields = [
+            pa.field(column, pa.type_for_alias(columns_types.get(column, "string")))
+            for column in columns
+        ]
+        write_columnar(rows, pa.schema(fields), path, fmt)
+    else:
+        raise ValueError(f"Unsupported report format {fmt!r}")
+
+
+def write_objects_columnar(videos_counts, need_to_add_tags, path: str, fmt: str):
+    """Write objects table straight from video summaries with typed columns"""
+    check_pyarrow()
+    columns, _ = object_balance.get_objects_columns(need_to_add_tags)
+    fields = [
+        pa.field(column, pa.type_for_alias(OBJECTS_COLUMNS_TYPES.get(column, "string")))
+        for column in columns
+    ]
+    rows = object_balance.iter_objects_rows(
+        videos_counts, need_to_add_tags, object_balance.get_video_name
+    )
+    write_columnar(rows, pa.schema(fields), path, fmt)
+    sly.logger.debug(f"Objects stats saved to {path}")
+
+
+class ObjectsCsvWriter:
+    """Objects table csv written in chunks of rows while the table grows.
+
+    Every write appends rows of the store that are not written yet. With part_rows the table is
+    split into standalone csv files of part_rows rows (objects_stats.part-00001.csv, ...) and
+    on_part(path) is called with every finished part, so it can be uploaded while the next
+    parts are written. Integer columns are written as ints next to empty cells, so rows do not
+    depend on rows appended later.
+    """
+
+    def __init__(self, report_dir: str, compress=None, part_rows=None, on_part=None):
+        self.report_dir = report_dir
+        self.compress = g.REPORT_CSV_GZIP if compress is None else compress
+        self.part_rows = g.REPORT_CSV_PART_ROWS if part_rows is None else part_rows
+        self.on_part = on_part
+        self.rows_written = 0
+        self.paths = []
+        self._file = None
+        self._file_rows = 0
+
+    def get_path(self, part_idx: int = None) -> str:
+        name = OBJECTS_CSV_NAME
+        if part_idx is not None:
+            name += f".part-{part_idx:05d}"
+        name += ".csv.gz" if self.compress else ".csv"
+        return os.path.join(self.report_dir, name)
+
+    def _open(self):
+        path = self.get_path(len(self.paths) + 1 if self.part_rows > 0 else None)
+        sly.fs.ensure_base_path(path)
+        if self.compress:
+            self._file = gzip.open(path, "wt", newline="", compresslevel=GZIP_LEVEL)
+        else:
+            self._file = open(path, "w", newline="")
+        self._file_rows = 0
+        self.paths.append(path)
+
+    def _close_file(self):
+        self._file.close()
+        self._file = None
+        if self.on_part is not None:
+            self.on_part(self.paths[-1])
+
+    def _write_rows(self, rows, columns):
+        csv = pd.DataFrame(rows, columns=columns, dtype=object)
+        csv.to_csv(self._file, index=False, header=self._file_rows == 0)
+        self._file_rows += len(rows)
+
+    def write(self, objects_store, batch_size=BATCH_SIZE):
+        """Write rows of objects_store that are not written yet"""
+        while self.rows_written < len(objects_store):
+            if self._file is None:
+                self._open()
+            count = min(batch_size, len(objects_store) - self.rows_written)
+            if self.part_rows > 0:
+                count = min(count, self.part_rows - self._file_rows)
+            indexes = range(self.rows_written, self.rows_written + count)
+            rows = objects_store.get_rows(indexes, exact_ints=True)
+            self._write_rows(object_balance.format_objects_rows(rows), objects_store.columns)
+            self.rows_written += count
+            if self.part_rows > 0 and self._file_rows == self.part_rows:
+                self._close_file()
+
+    def close(self, objects_store):
+        """Write the rest of rows and finish the last file, header only file for empty table"""
+        self.write(objects_store)
+        if self._file is None and len(self.paths) == 0:
+            self._open()
+            self._write_rows([], objects_store.columns)
+        if self._file is not None:
+            self._close_file()
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import httpx
+
+import src.globals as g
+import supervisely as sly
+from src import perf
+from supervisely.api.module_api import ApiField
+
+BULK_DOWNLOAD_METHOD = "videos.annotations.bulk.info"
+RATE_LIMIT_STATUSES = (429, 503)
+
+
+def batched(items, batch_size):
+    """Split list into consecutive chunks of batch_size items"""
+    for start in range(0, len(items), batch_size):
+        yield items[start : start + batch_size]
+
+
+def call_with_retries(func, *args, retries=None, backoff=None):
+    """Call func with exponential backoff between failed attempts"""
+    retries = g.FETCH_RETRIES if retries is None else retries
+    backoff = g.FETCH_BACKOFF if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2**attempt
+            sly.logger.warning(
+                f"Request failed ({repr(e)}), retrying in {delay:.1f}s "
+                f"[attempt {attempt + 1}/{retries}]"
+            )
+            time.sleep(delay)
+
+
+@perf.timed("fetch")
+def download_batch(api: sly.Api, dataset_id: int, videos: list, retries=None, backoff=None):
+    """Download annotations for a batch of videos from one dataset.
+
+    Uses bulk download when the SDK supports it and falls back to per-video requests.
+
+    :return: List of annotation jsons in the same order as videos.
+    :rtype: list
+    """
+    video_ids = [video_info.id for video_info in videos]
+
+    def download(video_id):
+        return call_with_retries(
+            api.video.annotation.download, video_id, retries=retries, backoff=backoff
+        )
+
+    if not hasattr(api.video.annotation, "download_bulk"):
+        return [download(video_id) for video_id in video_ids]
+
+    ann_infos = call_with_retries(
+        api.video.annotation.download_bulk, dataset_id, video_ids, retries=retries, backoff=backoff
+    )
+    return order_annotations(video_ids, ann_infos, download)
+
+
+def order_annotations(video_ids: list, ann_infos: list, download) -> list:
+    """Return annotations in the order of video_ids.
+
+    Bulk response is not guaranteed to keep the requested order or to have all requested
+    videos. Annotations are matched by video id only, missing ones are downloaded one by one.
+
+    :param download: function(video_id) returning annotation json of a video
+    """
+    id2ann = {ann_info.get("videoId"): ann_info for ann_info in ann_infos}
+    missing = [video_id for video_id in video_ids if video_id not in id2ann]
+    if len(missing) > 0:
+        sly.logger.warning(
+            f"Bulk response has no annotations of {len(missing)} videos, downloading them one by one",
+            extra={"video ids": missing},
+        )
+    for video_id in missing:
+        ann_info = download(video_id)
+        if ann_info.get("videoId", video_id) != video_id:
+            raise RuntimeError(f"Got annotation of video {ann_info.get('videoId')} for {video_id}")
+        id2ann[video_id] = ann_info
+    return [id2ann[video_id] for video_id in video_ids]
+
+
+class AdaptiveBackoff:
+    """Pause shared by all requests of the async fetcher.
+
+    After a failed request all requests wait until the pause ends. The pause is Retry-After of
+    a rate limited response or grows exponentially with consecutive failures; failures of
+    requests started before the previous pause do not make it longer.
+    """
+
+    def __init__(self, initial: float = None, max_delay: float = 60.0):
+        self.initial = g.FETCH_BACKOFF if initial is None else initial
+        self.max_delay = max_delay
+        self.resume_at = 0.0
+        self.failures = 0
+        self._consecutive = 0
+        self._failed_at = 0.0
+
+    async def wait(self):
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        self._consecutive = 0
+
+    def on_failure(self, started_at: float, retry_after: float = None) -> float:
+        """Register failure of request started at started_at (time.monotonic), return pause"""
+        self.failures += 1
+        now = time.monotonic()
+        if started_at >= self._failed_at:
+            self._consecutive += 1
+        self._failed_at = now
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+        else:
+            delay = min(self.initial * 2 ** (self._consecutive - 1), self.max_delay)
+        self.resume_at = max(self.resume_at, now + delay)
+        return self.resume_at - now
+
+
+def get_retry_after(error: Exception):
+    response = (
+        getattr(error, "response", None) if isinstance(error, httpx.HTTPStatusError) else None
+    )
+    if response is None or response.status_code not in RATE_LIMIT_STATUSES:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def download_batch_async(
+    api: sly.Api,
+    dataset_id: int,
+    videos: list,
+    semaphore: asyncio.Semaphore,
+    backoff: AdaptiveBackoff,
+    retries=None,
+):
+    """Same as download_batch, but over the pooled keep-alive http client of api.
+
+    Responses are decoded in a thread, so decoding overlaps with other requests. Rate limited
+    requests (429, 503 with Retry-After) do not count towards retries.
+    """
+    retries = g.FETCH_RETRIES if retries is None else retries
+    video_ids = [video_info.id for video_info in videos]
+    payload = {ApiField.DATASET_ID: dataset_id, ApiField.VIDEO_IDS: video_ids}
+    failures = 0
+    while True:
+        async with semaphore:
+            await backoff.wait()
+            started_at = time.monotonic()
+            try:
+                response = await api.post_async(
+                    BULK_DOWNLOAD_METHOD, json=payload, retries=1, raise_error=True
+                )
+            except (httpx.RequestError, httpx.HTTPStatusError) as e:
+                retry_after = get_retry_after(e)
+                # rate limited requests are retried when the server asks to
+                failures += retry_after is None
+                if failures > retries:
+                    raise
+                delay = backoff.on_failure(started_at, retry_after)
+                if retry_after is not None:
+                    sly.logger.warning(f"Request was rate limited, retrying in {delay:.1f}s")
+                else:
+                    sly.logger.warning(
+                        f"Request failed ({repr(e)}), retrying in {delay:.1f}s "
+                        f"[attempt {failures}/{retries}]"
+                    )
+                continue
+        ann_infos = await asyncio.to_thread(json.loads, response.content)
+        backoff.on_success()
+        if g.PERF_STATS:
+            perf.add("fetch", time.monotonic() - started_at)
+
+        def download(video_id):
+            return call_with_retries(api.video.annotation.download, video_id, retries=retries)
+
+        # missing annotations are rare, they are downloaded by sync requests in a thread
+        return await asyncio.to_thread(order_annotations, video_ids, ann_infos, download)
+
+
+class AsyncFetcher:
+    """Downloads annotation batches on an event loop running in a background thread.
+
+    The loop lives as long as the process: the pooled http client of api is bound to it,
+    so connections are kept alive between datasets and projects.
+    """
+
+    def __init__(self, concurrency: int):
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.backoff = AdaptiveBackoff()
+        thread = threading.Thread(target=self.loop.run_forever, name="fetcher", daemon=True)
+        thread.start()
+
+    def submit(self, api: sly.Api, dataset_id: int, videos: list, retries=None):
+        """Return concurrent.futures.Future with annotations of videos"""
+        coroutine = download_batch_async(
+            api, dataset_id, videos, self.semaphore, self.backoff, retries
+        )
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+_async_fetcher = None
+_async_fetcher_lock = threading.Lock()
+
+
+def get_async_fetcher() -> AsyncFetcher:
+    global _async_fetcher
+    with _async_fetcher_lock:
+        if _async_fetcher is None:
+            _async_fetcher = AsyncFetcher(g.FETCH_WORKERS)
+    return _async_fetcher
+
+
+def get_fetch_engine(api) -> str:
+    if g.FETCH_ENGINE == "async" and hasattr(api, "post_async"):
+        return "async"
+    return "threads"
+
+
+def iter_annotations(
+    api: sly.Api,
+    dataset_id: int,
+    videos: list,
+    batch_size=None,
+    workers=None,
+    prefetch=None,
+    retries=None,
+    backoff=None,
+):
+    """Yield (video_info, ann_json) pairs in the order of videos.
+
+    Batches are downloaded by a bounded thread pool or, with g.FETCH_ENGINE "async", by the
+    async fetcher limited to g.FETCH_WORKERS concurrent requests. At most `prefetch` batches
+    are in flight, so memory does not depend on the number of videos in the dataset.
+    """
+    batch_size = batch_size or g.FETCH_BATCH_SIZE
+    workers = workers or g.FETCH_WORKERS
+    prefetch = max(prefetch or g.FETCH_PREFETCH, workers)
+
+    batches = batched(videos, batch_size)
+    in_flight = deque()
+    with ExitStack() as stack:
+        if get_fetch_engine(api) == "async":
+            async_fetcher = get_async_fetcher()
+
+            def download(batch):
+                return async_fetcher.submit(api, dataset_id, batch, retries)
+
+        else:
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+
+            def download(batch):
+                return executor.submit(download_batch, api, dataset_id, batch, retries, backoff)
+
+        def submit_next():
+            batch = next(batches, None)
+            if batch is None:
+                return False
+            in_flight.append((batch, download(batch)))
+            return True
+
+        try:
+            while len(in_flight) < prefetch and submit_next():
+                pass
+
+            while in_flight:
+                batch, future = in_flight.popleft()
+                with perf.stage("fetch_wait"):
+                    ann_infos = future.result()
+                submit_next()
+                for video_info, ann_info in zip(batch, ann_infos):
+                    yield video_info, ann_info
+        finally:
+            # consumer stopped early
+            for _, future in in_flight:
+                future.cancel()
@@ -0,0 +1,144 @@
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+# frames - number of frames covered by the ranges, ranges - merged ranges sorted by start,
+# count - number of ranges before merging
+RangesCoverage = namedtuple(
+    "RangesCoverage", ["frames", "ranges", "first_frame", "last_frame", "count"]
+)
+# numpy overhead is not worth it for fewer ranges
+VECTORIZE_MIN_RANGES = 64
+
+
+def merge_ranges_by_group(groups, starts, ends):
+    """Union of inclusive frame ranges [start, end] within every group, vectorized over groups.
+
+    Overlapping and adjacent ranges are merged, empty ranges (end < start) are dropped.
+
+    :return: groups, starts and ends of merged ranges sorted by group and start
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    valid = ends >= starts
+    groups, starts, ends = groups[valid], starts[valid], ends[valid]
+    if len(starts) == 0:
+        return groups, starts, ends
+
+    order = np.lexsort((starts, groups))
+    groups, starts, ends = groups[order], starts[order], ends[order]
+    # groups are shifted apart, so the running maximum of ends does not leak into the next group
+    low = int(starts.min())
+    shift = groups * (int(ends.max()) - low + 2) - low
+    max_ends = np.maximum.accumulate(ends + shift)
+    is_first = np.ones(len(starts), dtype=bool)
+    is_first[1:] = starts[1:] + shift[1:] > max_ends[:-1] + 1
+    first_idx = np.flatnonzero(is_first)
+    last_idx = np.append(first_idx[1:] - 1, len(starts) - 1)
+    return groups[first_idx], starts[first_idx], max_ends[last_idx] - shift[last_idx]
+
+
+def merge_ranges(ranges) -> list:
+    """Union of a few inclusive frame ranges, same as merge_ranges_by_group for one group"""
+    merged = []
+    for start, end in sorted(ranges):
+        if end < start:
+            continue
+        if len(merged) > 0 and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_coverage(merged_ranges: list, count: int) -> RangesCoverage:
+    return RangesCoverage(
+        frames=sum(end - start + 1 for start, end in merged_ranges),
+        ranges=merged_ranges,
+        first_frame=merged_ranges[0][0] if len(merged_ranges) > 0 else None,
+        last_frame=merged_ranges[-1][1] if len(merged_ranges) > 0 else None,
+        count=count,
+    )
+
+
+def get_ranges_coverage(names, ranges) -> dict:
+    """Exact coverage of inclusive frame ranges grouped by name.
+
+    A few ranges are merged in Python, many ranges by merge_ranges_by_group at once.
+
+    :param names: name of every range, any hashable
+    :param ranges: (start, end) of every range
+    :return: name -> RangesCoverage, first_frame and last_frame are None if all ranges are empty
+    """
+    if len(ranges) <= VECTORIZE_MIN_RANGES:
+        ranges_by_name = {}
+        for name, frame_range in zip(names, ranges):
+            ranges_by_name.setdefault(name, []).append(tuple(frame_range))
+        return {
+            name: get_coverage(merge_ranges(name_ranges), len(name_ranges))
+            for name, name_ranges in ranges_by_name.items()
+        }
+
+    codes = {}
+    groups = np.fromiter(
+        (codes.setdefault(name, len(codes)) for name in names), dtype=np.int64, count=len(ranges)
+    )
+    bounds = np.fromiter(chain.from_iterable(ranges), dtype=np.int64, count=2 * len(ranges))
+    bounds = bounds.reshape(-1, 2)
+    merged_groups, merged_starts, merged_ends = merge_ranges_by_group(
+        groups, bounds[:, 0], bounds[:, 1]
+    )
+    counts = np.bincount(groups, minlength=len(codes)).tolist()
+    splits = np.searchsorted(merged_groups, np.arange(len(codes) + 1)).tolist()
+    merged_ranges = list(zip(merged_starts.tolist(), merged_ends.tolist()))
+    return {
+        name: get_coverage(merged_ranges[splits[code] : splits[code + 1]], counts[code])
+        for name, code in codes.items()
+    }
+
+
+# runs - number of contiguous frame ranges, max_gap - longest run of frames without the track
+TrackStats = namedtuple("TrackStats", ["frames", "first_frame", "last_frame", "runs", "max_gap"])
+
+
+def get_tracks_stats(frames_by_key: dict) -> dict:
+    """Frames count, first and last frame, runs and the longest gap of every track at once.
+
+    :param frames_by_key: key -> distinct frame indexes in any order, not empty
+    :return: key -> TrackStats
+    """
+    keys = list(frames_by_key)
+    if len(keys) == 0:
+        return {}
+    sizes = np.fromiter(map(len, frames_by_key.values()), dtype=np.int64, count=len(keys))
+    frames = np.fromiter(
+        chain.from_iterable(frames_by_key.values()), dtype=np.int64, count=int(sizes.sum())
+    )
+    groups = np.repeat(np.arange(len(keys)), sizes)
+    order = np.lexsort((frames, groups))
+    frames = frames[order]
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+
+    # gaps between neighbour frames of the same track
+    same_track = groups[1:] == groups[:-1]
+    gaps = np.diff(frames)[same_track] - 1
+    gap_groups = groups[1:][same_track]
+    runs = np.bincount(gap_groups[gaps > 0], minlength=len(keys)) + 1
+    max_gaps = np.zeros(len(keys), dtype=np.int64)
+    np.maximum.at(max_gaps, gap_groups, gaps)
+
+    columns = [sizes, frames[starts], frames[ends - 1], runs, max_gaps]
+    return {
+        key: TrackStats(*values)
+        for key, values in zip(keys, zip(*(column.tolist() for column in columns)))
+    }
+
+
+def get_ranges_gaps(merged_ranges: list):
+    """Return runs count and the longest gap between merged ranges sorted by start"""
+    gaps = [start - end - 1 for (_, end), (start, _) in zip(merged_ranges, merged_ranges[1:])]
+    return len(merged_ranges), max(gaps, default=0)
@@ -0,0 +1,93 @@
+import base64
+
+import numpy as np
+
+# number of set bits for every byte value
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class FrameSet:
+    """Set of frame indexes of one video stored as a packed bitmap (1 bit per frame)"""
+
+    __slots__ = ("bits", "size")
+
+    def __init__(self, size: int, bits: np.ndarray = None):
+        self.size = size
+        if bits is None:
+            bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+        self.bits = bits
+
+    @classmethod
+    def from_indexes(cls, indexes, size: int = 0) -> "FrameSet":
+        indexes = np.asarray(indexes, dtype=np.int64)
+        if len(indexes) > 0:
+            size = max(size or 0, int(indexes.max()) + 1)
+        mask = np.zeros(size or 0, dtype=bool)
+        mask[indexes] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "FrameSet":
+        return cls(len(mask), np.packbits(mask))
+
+    @classmethod
+    def union_all(cls, frame_sets) -> "FrameSet":
+        frame_sets = list(frame_sets)
+        if len(frame_sets) == 0:
+            return cls(0)
+        size = max(frame_set.size for frame_set in frame_sets)
+        bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+        for frame_set in frame_sets:
+            bits[: len(frame_set.bits)] |= frame_set.bits
+        return cls(size, bits)
+
+    def to_mask(self) -> np.ndarray:
+        return np.unpackbits(self.bits, count=self.size).astype(bool)
+
+    def to_indexes(self) -> np.ndarray:
+        return np.flatnonzero(self.to_mask())
+
+    def count(self) -> int:
+        return int(POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def first(self):
+        """Return the smallest frame index or None if the set is empty"""
+        nonzero = np.flatnonzero(self.bits)
+        if len(nonzero) == 0:
+            return None
+        byte_idx = int(nonzero[0])
+        return byte_idx * 8 + int(
+            np.flatnonzero(np.unpackbits(self.bits[byte_idx : byte_idx + 1]))[0]
+        )
+
+    def last(self):
+        """Return the largest frame index or None if the set is empty"""
+        nonzero = np.flatnonzero(self.bits)
+        if len(nonzero) == 0:
+            return None
+        byte_idx = int(nonzero[-1])
+        return byte_idx * 8 + int(
+            np.flatnonzero(np.unpackbits(self.bits[byte_idx : byte_idx + 1]))[-1]
+        )
+
+    def __or__(self, other: "FrameSet") -> "FrameSet":
+        return FrameSet.union_all([self, other])
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FrameSet):
+            return NotImplemented
+        return np.array_equal(self.to_indexes(), other.to_indexes())
+
+    def __repr__(self) -> str:
+        return f"FrameSet(size={self.size}, count={self.count()})"
+
+    def to_json(self) -> list:
+        return [self.size, base64.b64encode(self.bits.tobytes()).decode("ascii")]
+
+    @classmethod
+    def from_json(cls, data) -> "FrameSet":
+        size, bits = data
+        return cls(size, np.frombuffer(base64.b64decode(bits), dtype=np.uint8).copy())
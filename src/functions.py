@@ -1,12 +1,31 @@
+import multiprocessing
 import os
-from collections import defaultdict
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 
 import src.globals as g
-import src.ui.controls as c
 import supervisely as sly
-from src.stats import class_balance, object_balance
+from src import (
+    cache,
+    checkpoint,
+    export,
+    fetch,
+    frame_ranges,
+    geometry,
+    perf,
+    sampling,
+    shard,
+    spill,
+    summary,
+)
+from src.dataset_tree import DatasetTree
+from src.frame_set import FrameSet
+from src.throttle import Throttle
+from src.upload import ReportUploader
+from src.stats import class_balance, cooccurrence, object_balance, temporal
 
 
 def process_video_annotation(
@@ -42,98 +61,622 @@ def process_video_annotation(
                 obj_already_on_frame.add(fig.video_object.key())
 
 
+def process_video_annotation_json(
+    ann_json,
+    project_meta,
+    class_objects_counter,
+    class_figures_counter,
+    objcls_frames_counter,
+    obj_figures_counter,
+):
+    """Same counting as process_video_annotation, but straight from annotation json.
+
+    Geometries are never built. Raises the same kind of errors as
+    VideoAnnotation.from_json for annotations that do not match the project meta.
+
+    :return: dict with object key as key and class name as value
+    """
+    classname2frames = objcls_frames_counter.setdefault(g.BY_CLS_NAME, {})
+    objkey_dict = objcls_frames_counter.setdefault(g.BY_OBJ_KEY, {})
+    objkey2frames = objkey_dict.setdefault(g.FRAMES, {})
+    objkey2tags = objkey_dict.setdefault(g.TAGS, {})
+
+    objkey2classname = {}
+    objid2key = {}
+    for obj in ann_json["objects"]:
+        class_name = obj["classTitle"]
+        if project_meta.get_obj_class(class_name) is None:
+            raise RuntimeError(f"Class name {class_name!r} was not found in the given project meta")
+        obj_key = str(uuid.UUID(obj["key"])) if "key" in obj else str(uuid.uuid4())
+        if obj_key in objkey2classname:
+            raise KeyError(f"Duplicate object key {obj_key!r}")
+        if obj.get("id") is not None:
+            objid2key[obj["id"]] = obj_key
+        objkey2classname[obj_key] = class_name
+        objkey2tags[obj_key] = summary.tag_records_from_json(
+            obj.get("tags", []), project_meta.tag_metas
+        )
+        class_objects_counter[class_name] += 1
+
+    frames_count = ann_json["framesCount"]
+    frame_indexes = set()
+    for frame in ann_json["frames"]:
+        index = frame["index"]
+        if index < 0 or index > frames_count:
+            raise ValueError(f"Item contains {frames_count} frames. Frame index is {index}")
+        if index in frame_indexes:
+            raise KeyError(f"Duplicate frame index {index}")
+        frame_indexes.add(index)
+
+        cls_already_on_frame = set()
+        obj_already_on_frame = set()
+        for fig in frame.get("figures", []):
+            if "objectKey" in fig:
+                obj_key = str(uuid.UUID(fig["objectKey"]))
+            else:
+                obj_key = objid2key.get(fig.get("objectId"))
+            class_name = objkey2classname.get(obj_key)
+            if class_name is None:
+                raise RuntimeError(f"Figure refers to unknown object on frame {index}")
+
+            class_figures_counter[class_name] += 1
+            obj_figures_counter[obj_key] += 1
+            if class_name not in cls_already_on_frame:
+                classname2frames.setdefault(class_name, []).append(index)
+                cls_already_on_frame.add(class_name)
+
+            if obj_key not in obj_already_on_frame:
+                objkey2frames.setdefault(obj_key, []).append(index)
+                obj_already_on_frame.add(obj_key)
+    return objkey2classname
+
+
 def get_annotated_frames_count_by_classes_in_dataset(ds_frames):
     """Return dict with class name as key and annotated frames count as value"""
     object_name_to_annotated_frames = defaultdict(int)
     for video_name, objects_on_video in ds_frames.items():
-        for obj_name, annotated_frames_list in objects_on_video[g.BY_CLS_NAME].items():
-            object_name_to_annotated_frames[obj_name] += len(annotated_frames_list)
+        for obj_name, annotated_frames in objects_on_video[g.BY_CLS_NAME].items():
+            object_name_to_annotated_frames[obj_name] += annotated_frames
     return object_name_to_annotated_frames
 
 
 def get_frames_tags_by_objects_on_videos(video_frames):
     """
     Return:
-        - dict with object key as key and value is tuple with annotated frames count,
-    first annotated frame and last annotated frame
+        - dict with object key as key and TrackStats (annotated frames count, first and last
+    annotated frame, runs and the longest gap) as value
         - dict with object key as key and all tags for this object as value
     """
-    objkey_to_annotated_frames = defaultdict(lambda: defaultdict(int))
+    objkey_to_annotated_frames = frame_ranges.get_tracks_stats(video_frames[g.BY_OBJ_KEY][g.FRAMES])
     objkey_to_tags = defaultdict(lambda: defaultdict(int))
-    for obj_key, frames_list in video_frames[g.BY_OBJ_KEY][g.FRAMES].items():
-        objkey_to_annotated_frames[obj_key] = (len(frames_list), min(frames_list), max(frames_list))
     for obj_key, tags in video_frames[g.BY_OBJ_KEY][g.TAGS].items():
         objkey_to_tags[obj_key] = tags
     return objkey_to_annotated_frames, objkey_to_tags
 
 
-def process_project():
+@perf.timed("geometry")
+def get_objects_geometry(ann_json):
+    """Return object key -> GeometryStats or None if g.GEOMETRY_STATS is off"""
+    if not g.GEOMETRY_STATS:
+        return None
+    return geometry.get_objects_geometry(ann_json)
+
+
+@perf.timed("count")
+def summarize_annotation(
+    video_info, ann: sly.VideoAnnotation, ann_json=None
+) -> summary.VideoSummary:
+    """Build VideoSummary from VideoAnnotation, geometry stats are taken from its json"""
+    class_objects = defaultdict(int)
+    class_figures = defaultdict(int)
+    obj_figures = defaultdict(int)
+    video_frames = {}
+
+    process_video_annotation(ann, class_objects, class_figures, video_frames, obj_figures)
+    objkey2frames_cnt, objkey2tags = get_frames_tags_by_objects_on_videos(video_frames)
+    objkey2classname = {str(obj.key()): obj.obj_class.name for obj in ann.objects}
+    return summary.summarize_video(
+        video_info,
+        objkey2classname,
+        objkey2frames_cnt,
+        {obj_key: summary.tag_records(tags) for obj_key, tags in objkey2tags.items()},
+        obj_figures,
+        summary.tag_records(ann.tags),
+        class_objects,
+        class_figures,
+        video_frames[g.BY_CLS_NAME],
+        get_objects_geometry(ann_json) if ann_json is not None else None,
+        tuple(ann.img_size) if ann.img_size is not None else None,
+    )
+
+
+@perf.timed("count_json")
+def summarize_annotation_json(video_info, ann_json, project_meta) -> summary.VideoSummary:
+    """Build VideoSummary without VideoAnnotation deserialization"""
+    class_objects = defaultdict(int)
+    class_figures = defaultdict(int)
+    obj_figures = defaultdict(int)
+    video_frames = {}
+
+    objkey2classname = process_video_annotation_json(
+        ann_json, project_meta, class_objects, class_figures, video_frames, obj_figures
+    )
+    objkey2frames_cnt, objkey2tags = get_frames_tags_by_objects_on_videos(video_frames)
+    video_tags = summary.tag_records_from_json(ann_json["tags"], project_meta.tag_metas)
+    return summary.summarize_video(
+        video_info,
+        objkey2classname,
+        objkey2frames_cnt,
+        objkey2tags,
+        obj_figures,
+        video_tags,
+        class_objects,
+        class_figures,
+        video_frames[g.BY_CLS_NAME],
+        get_objects_geometry(ann_json),
+        geometry.get_frame_size(ann_json),
+    )
+
+
+def add_video_summary(ds_objects, ds_figures, ds_frames, video_summary: summary.VideoSummary):
+    """Add per-video class counters to dataset counters.
+
+    Only frame counts are kept in ds_frames: annotated frames of every class and of the video.
+    """
+    for class_name, count in video_summary.class_objects.items():
+        ds_objects[class_name] += count
+    for class_name, count in video_summary.class_figures.items():
+        ds_figures[class_name] += count
+    class_frames = video_summary.class_frames
+    ds_frames[video_summary.video.name] = {
+        g.BY_CLS_NAME: {class_name: frames.count() for class_name, frames in class_frames.items()},
+        g.FRAMES: FrameSet.union_all(class_frames.values()).count(),
+    }
+
+
+def summarize_annotation_deserialized(video_info, ann_info, key_id_map):
+    """Build VideoSummary via VideoAnnotation, return None if annotation can not be deserialized"""
+    try:
+        with perf.stage("deserialize"):
+            ann = sly.VideoAnnotation.from_json(ann_info, g.PROJECT_META, key_id_map)
+    except Exception as e:
+        err_msg = "An error occured while deserialization. Skipping annotation..."
+        debug_info = {
+            "json annotation": ann_info,
+            "key id map": key_id_map,
+            "exception message": repr(e),
+        }
+        sly.logger.error(err_msg, extra=debug_info)
+        return None
+    return summarize_annotation(video_info, ann, ann_info)
+
+
+def summarize_annotation_info(video_info, ann_info, key_id_map):
+    """Build VideoSummary with the configured counting engine.
+
+    The json engine falls back to deserialization if the annotation can not be counted;
+    "validate" engine runs both and reports mismatches.
+    """
+    json_summary = None
+    if g.COUNT_ENGINE in ("json", "validate"):
+        try:
+            json_summary = summarize_annotation_json(video_info, ann_info, g.PROJECT_META)
+        except Exception as e:
+            sly.logger.warning(
+                f"Failed to count annotation json of video {video_info.name!r}: {repr(e)}. "
+                "Falling back to annotation deserialization"
+            )
+        if json_summary is not None and g.COUNT_ENGINE == "json":
+            return json_summary
+
+    video_summary = summarize_annotation_deserialized(video_info, ann_info, key_id_map)
+    if g.COUNT_ENGINE == "validate" and json_summary != video_summary:
+        sly.logger.warning(
+            f"Json counting engine result differs from deserialized annotation "
+            f"for video {video_info.name!r}"
+        )
+    return video_summary
+
+
+# settings of the parent process that change video summaries, they are sent to worker processes
+# as the parent may have changed them after import
+AGGREGATION_SETTINGS = ("COUNT_ENGINE", "GEOMETRY_STATS", "PERF_STATS")
+
+
+def init_aggregation_worker(meta_json, settings):
+    """Worker process initializer: project meta and settings of the parent process"""
+    g.PROJECT_META = sly.ProjectMeta.from_json(meta_json)
+    for name, value in settings.items():
+        setattr(g, name, value)
+
+
+def summarize_annotation_chunk(chunk):
+    """Worker process entry point: summarize list of (video_info, ann_info) pairs.
+
+    :return: list of VideoSummary or None, perf records of the chunk
+    """
+    if g.PROJECT_META is None:
+        raise RuntimeError("Aggregation worker is not initialized with project meta")
+    key_id_map = sly.KeyIdMap()
+    summaries = [
+        summarize_annotation_info(video_info, ann_info, key_id_map)
+        for video_info, ann_info in chunk
+    ]
+    return summaries, perf.pop_records()
+
+
+def iter_summaries(fetched, key_id_map, executor=None):
+    """Yield (video_info, VideoSummary or None) pairs in the order of fetched annotations.
+
+    With executor, chunks of annotations are summarized in worker processes and the
+    results are merged back in the original order.
+    """
+    if executor is None:
+        for video_info, ann_info in fetched:
+            yield video_info, summarize_annotation_info(video_info, ann_info, key_id_map)
+        return
+
+    in_flight = deque()
+    max_in_flight = get_aggregation_workers() * 2
+
+    def submit(chunk):
+        videos = [video_info for video_info, _ in chunk]
+        in_flight.append((videos, executor.submit(summarize_annotation_chunk, chunk)))
+
+    def wait(future):
+        with perf.stage("aggregation_wait"):
+            chunk_summaries, chunk_records = future.result()
+        perf.merge_records(chunk_records)
+        return chunk_summaries
+
+    chunk = []
+    for item in fetched:
+        chunk.append(item)
+        if len(chunk) < g.AGGREGATION_CHUNK_SIZE:
+            continue
+        submit(chunk)
+        chunk = []
+        while len(in_flight) >= max_in_flight:
+            videos, future = in_flight.popleft()
+            yield from zip(videos, wait(future))
+    if len(chunk) > 0:
+        submit(chunk)
+    while in_flight:
+        videos, future = in_flight.popleft()
+        yield from zip(videos, wait(future))
+
+
+def summarize_videos(
+    dataset, videos, key_id_map, stats_cache=None, executor=None, run_checkpoint=None
+):
+    """Yield VideoSummary for every video that can be deserialized, in the order of videos.
+
+    Only videos missing in the checkpoint of the previous run and in the stats cache
+    are downloaded.
+    """
+    id2summary = {}
+    videos_to_fetch = []
+    for video_info in videos:
+        cached = None
+        if run_checkpoint is not None:
+            cached = run_checkpoint.get(dataset.id, video_info)
+            if cached is not None and stats_cache is not None:
+                stats_cache.put(cached)
+        if cached is None and stats_cache is not None:
+            cached = stats_cache.get(video_info)
+        if cached is not None:
+            id2summary[video_info.id] = cached
+        else:
+            videos_to_fetch.append(video_info)
+
+    fetched = fetch.iter_annotations(g.api, dataset.id, videos_to_fetch)
+    summarized = iter_summaries(fetched, key_id_map, executor)
+    for video_info in videos:
+        video_summary = id2summary.pop(video_info.id, None)
+        if video_summary is not None:
+            yield video_summary
+            continue
+        _, video_summary = next(summarized)
+        if video_summary is None:
+            continue
+        if stats_cache is not None:
+            stats_cache.put(video_summary)
+        yield video_summary
+
+
+def get_aggregation_workers() -> int:
+    if g.AGGREGATION_WORKERS == 0:
+        return os.cpu_count() or 1
+    return g.AGGREGATION_WORKERS
+
+
+def get_aggregation_executor():
+    """Return process pool for annotations aggregation or None for serial run.
+
+    Workers are spawned, not forked: the pool starts while fetch threads are running, and
+    project meta and settings are passed to every worker by the initializer.
+    """
+    workers = get_aggregation_workers()
+    if workers <= 1:
+        return None
+    sly.logger.info(f"Aggregating annotations in {workers} worker processes")
+    settings = {name: getattr(g, name) for name in AGGREGATION_SETTINGS}
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_aggregation_worker,
+        initargs=(g.PROJECT_META.to_json(), settings),
+    )
+
+
+def get_dataset_counts(dataset, ds_objects, ds_figures, ds_frames):
+    """Return (ds_name, objects, figures, frames) class counters of the dataset, estimated
+    ones for a sampled run
+    """
+    if g.SAMPLE is not None:
+        return g.SAMPLE.get_dataset_counts(dataset.id)
+    frames_counts = get_annotated_frames_count_by_classes_in_dataset(ds_frames)
+    return dataset.name, ds_objects, ds_figures, frames_counts
+
+
+def log_progress(total, message):
+    """Progress bar for headless runs"""
+    return sly.tqdm_sly(total=total, desc=message)
+
+
+def process_project(progress=log_progress, on_update=None, shard_writer=None):
+    """Aggregate annotations of the selected datasets.
+
+    Video summaries are kept in spill files on disk if g.SPILL_MEMORY_MB is set.
+    If sampling is enabled, only sampled videos are processed and class counts of datasets
+    are estimates (see sampling.ProjectSample).
+
+    :param on_update: function(datasets_counts, videos_counts) called with partial results every
+        g.LIVE_UPDATE_VIDEOS videos and after each dataset, throttled to a share of runtime
+    :param shard_writer: shard.ShardWriter of a sharded run, only videos of the shard are
+        processed and their summaries are written to it
+    """
+    g.DATASET_TREE = DatasetTree.build(g.api, g.PROJECT.id, g.DATASET_ID)
     total_count = g.PROJECT.items_count
     if g.DATASET_ID is not None:
-        total_count = get_dataset_items_count(g.api, g.DATASET_ID)
+        total_count = g.DATASET_TREE.get_items_count()
+    g.SAMPLE = None
+    if sampling.is_enabled():
+        g.SAMPLE = sampling.ProjectSample(
+            [obj_class.name for obj_class in g.PROJECT_META.obj_classes]
+        )
+        total_count = g.SAMPLE.plan(g.DATASET_TREE.get_selected())
+    if shard_writer is not None:
+        total_count = shard_writer.plan(g.DATASET_TREE.get_selected())
 
     datasets_counts = []
-    videos_counts = defaultdict(list)
+    videos_counts = defaultdict(spill.SpilledList if spill.is_enabled() else list)
+
+    stats_cache = None
+    if g.CACHE_ENABLED:
+        stats_cache = cache.load_cache(g.api, g.PROJECT.id, g.PROJECT_META)
 
+    run_checkpoint = None
+    # a sample is quick to repeat, its videos are reused through the stats cache instead
+    if g.CHECKPOINT_INTERVAL > 0 and g.SAMPLE is None:
+        run_checkpoint = checkpoint.load_checkpoint(g.PROJECT.id, g.DATASET_ID, g.PROJECT_META)
+
+    perf.instrument_api(g.api)
+    class_indexes = cooccurrence.get_class_indexes()
+    throttle = Throttle()
     key_id_map = sly.KeyIdMap()
-    with c.progress(total=total_count, message="Processing video labels ...") as pbar:
-        for dataset in g.api.dataset.get_list(g.PROJECT.id, recursive=True):
-            if g.DATASET_ID is not None and dataset.id not in get_all_selected_ds_list(
-                g.api, g.DATASET_ID
-            ):
+    executor = get_aggregation_executor()
+    with progress(total=total_count, message="Processing video labels ...") as pbar:
+        for dataset in g.DATASET_TREE.get_selected():
+            if shard_writer is not None and not shard_writer.has_dataset(dataset):
+                datasets_counts.append((dataset.name, defaultdict(int), defaultdict(int), {}))
                 continue
+            perf.set_dataset(dataset.name)
             # for classes stats
             ds_objects = defaultdict(int)
             ds_figures = defaultdict(int)
 
-            # for objects stats
-            obj_figures = defaultdict(int)
-
             # common for both stats
             ds_frames = g.ANNOTATED_FRAMES.setdefault(dataset.name, {})
-
-            videos = g.api.video.get_list(dataset.id)
-            for video_info in videos:
-
-                ann_info = g.api.video.annotation.download(video_info.id)
-                try:
-                    ann = sly.VideoAnnotation.from_json(ann_info, g.PROJECT_META, key_id_map)
-                except Exception as e:
-                    err_msg = "An error occured while deserialization. Skipping annotation..."
-                    debug_info = {
-                        "json annotation": ann_info,
-                        "key id map": key_id_map,
-                        "exception message": repr(e),
-                    }
-                    sly.logger.error(err_msg, extra=debug_info)
-                    continue
-                video_frames = ds_frames.setdefault(video_info.name, {})
-
-                process_video_annotation(ann, ds_objects, ds_figures, video_frames, obj_figures)
-                objkey2frames_cnt, objkey2tags = get_frames_tags_by_objects_on_videos(video_frames)
-                objkey2classname = {str(obj.key()): obj.obj_class.name for obj in ann.objects}
-                videos_counts[dataset.name].append(
-                    (video_info, objkey2classname, objkey2frames_cnt, objkey2tags, obj_figures, ann)
+            ds_pairs = g.CLASS_PAIRS.setdefault(dataset.name, defaultdict(int))
+
+            summaries, alive_video_ids = None, None
+            # videos of a shard are selected from the dataset videos list
+            if run_checkpoint is not None and shard_writer is None:
+                summaries = run_checkpoint.get_completed_dataset(dataset.id)
+            if summaries is None:
+                videos = g.api.video.get_list(dataset.id)
+                alive_video_ids = [video_info.id for video_info in videos]
+                if g.SAMPLE is not None:
+                    videos = g.SAMPLE.select_videos(dataset, videos)
+                if shard_writer is not None:
+                    videos = shard_writer.select_videos(dataset, videos)
+                summaries = summarize_videos(
+                    dataset, videos, key_id_map, stats_cache, executor, run_checkpoint
                 )
+            for video_idx, video_summary in enumerate(summaries, start=1):
+                add_video_summary(ds_objects, ds_figures, ds_frames, video_summary)
+                if g.SAMPLE is not None:
+                    g.SAMPLE.add(dataset.id, video_summary, ds_frames[video_summary.video.name])
+                cooccurrence.add_video_pairs(ds_pairs, video_summary.class_frames, class_indexes)
+                videos_counts[dataset.name].append(video_summary)
+                if shard_writer is not None:
+                    shard_writer.add(dataset, video_summary)
                 pbar.update(1)
+                if run_checkpoint is not None:
+                    run_checkpoint.add(dataset.id, video_summary)
+                    if run_checkpoint.is_due():
+                        run_checkpoint.save()
+
+                if (
+                    on_update is not None
+                    and video_idx % g.LIVE_UPDATE_VIDEOS == 0
+                    and throttle.is_ready()
+                ):
+                    ds_counts = get_dataset_counts(dataset, ds_objects, ds_figures, ds_frames)
+                    throttle.call(on_update, [*datasets_counts, ds_counts], videos_counts)
+                if g.SAMPLE is not None and g.SAMPLE.is_over(dataset.id):
+                    break
+
+            datasets_counts.append(get_dataset_counts(dataset, ds_objects, ds_figures, ds_frames))
+            if spill.is_enabled():
+                videos_counts[dataset.name].flush()
+            if stats_cache is not None and alive_video_ids is not None:
+                stats_cache.complete_dataset(dataset.id, alive_video_ids)
+            if run_checkpoint is not None:
+                run_checkpoint.complete_dataset(dataset.id)
+            if on_update is not None and throttle.is_ready():
+                throttle.call(on_update, datasets_counts, videos_counts)
+
+    perf.set_dataset(None)
+    if g.SAMPLE is not None:
+        g.SAMPLE.log_summary()
+    if executor is not None:
+        executor.shutdown()
+    if throttle.calls > 0:
+        sly.logger.debug(f"Live updates: {throttle.calls} calls, {throttle.spent:.2f} s")
+    if stats_cache is not None:
+        cache.save_cache(g.api, g.PROJECT.id, stats_cache)
+    if run_checkpoint is not None:
+        if run_checkpoint.restored > 0:
+            sly.logger.info(f"{run_checkpoint.restored} videos were restored from checkpoint")
+        run_checkpoint.remove()
 
-            obj_name2annotated_frames_count = get_annotated_frames_count_by_classes_in_dataset(
-                ds_frames
-            )
-            datasets_counts.append(
-                (dataset.name, ds_objects, ds_figures, obj_name2annotated_frames_count)
-            )
+    return datasets_counts, videos_counts
 
+
+def merge_shards(shards_dir, progress=log_progress, on_update=None):
+    """Aggregate video summaries of shard files saved by sharded runs to shards_dir.
+
+    Summaries are merged in the order of datasets and their videos lists, so the result
+    is the same as of process_project for the whole project.
+    """
+    g.DATASET_TREE = DatasetTree.build(g.api, g.PROJECT.id, g.DATASET_ID)
+    reader = shard.ShardsReader(shards_dir)
+    datasets = g.DATASET_TREE.get_selected()
+
+    datasets_counts = []
+    videos_counts = defaultdict(spill.SpilledList if spill.is_enabled() else list)
+    class_indexes = cooccurrence.get_class_indexes()
+    throttle = Throttle()
+    with progress(total=g.DATASET_TREE.get_items_count(), message="Merging shards ...") as pbar:
+        for dataset, summaries in reader.iter_datasets(datasets):
+            ds_objects = defaultdict(int)
+            ds_figures = defaultdict(int)
+            ds_frames = g.ANNOTATED_FRAMES.setdefault(dataset.name, {})
+            ds_pairs = g.CLASS_PAIRS.setdefault(dataset.name, defaultdict(int))
+            for video_summary in summaries:
+                add_video_summary(ds_objects, ds_figures, ds_frames, video_summary)
+                cooccurrence.add_video_pairs(ds_pairs, video_summary.class_frames, class_indexes)
+                videos_counts[dataset.name].append(video_summary)
+                pbar.update(1)
+            datasets_counts.append(get_dataset_counts(dataset, ds_objects, ds_figures, ds_frames))
+            if spill.is_enabled():
+                videos_counts[dataset.name].flush()
+            if on_update is not None and throttle.is_ready():
+                throttle.call(on_update, datasets_counts, videos_counts)
     return datasets_counts, videos_counts
 
 
-def calculate_stats(need_to_add_tags=False):
-    datasets_counts, videos_counts = process_project()
+def has_unique_dataset_names() -> bool:
+    names = [dataset.name for dataset in g.DATASET_TREE.get_selected()]
+    return len(set(names)) == len(names)
 
-    classes_stats = class_balance.calculate_classes_stats(datasets_counts)
-    objects_stats = object_balance.calculate_objects_stats(videos_counts, need_to_add_tags)
 
-    return classes_stats, objects_stats
+def calculate_stats(
+    need_to_add_tags=False,
+    progress=log_progress,
+    report_dir=None,
+    formats=None,
+    on_update=None,
+    uploader=None,
+    shards_dir=None,
+):
+    """Calculate classes table and objects table kept in a ColumnStore.
+
+    If report_dir is given, report files are written there in the given formats
+    (g.REPORT_FORMATS by default). The objects csv is written while processing, its finished
+    parts (g.REPORT_CSV_PART_ROWS) are uploaded by uploader before processing ends.
+    If on_update is given, it is called while processing
+    with partial tables: on_update(classes_stats, objects_store).
+    With g.PERF_STATS stage timings are logged and saved to report_dir.
+
+    In a sharded run (g.SHARD_COUNT) only the shard file is saved to report_dir.
+    If shards_dir is given, shard files saved there are merged instead of processing
+    the project.
+    """
+    perf.reset()
+    spill.reset()
+    objects_store = object_balance.create_objects_store(need_to_add_tags)
+    appended = {}
+    rows_in_order = True
+    formats = formats or g.REPORT_FORMATS
+    shard_writer = None
+    if shard.is_enabled() and shards_dir is None:
+        if sampling.is_enabled():
+            raise ValueError("Sampled stats can not be calculated in shards")
+        if report_dir is None:
+            raise ValueError("Report directory is required to save the shard")
+        shard_writer = shard.ShardWriter(report_dir)
+    objects_csv = None
+    if report_dir is not None and "csv" in formats and shard_writer is None:
+        objects_csv = export.ObjectsCsvWriter(
+            report_dir, on_part=uploader.submit if uploader is not None else None
+        )
+
+    @perf.timed("live_update")
+    def update_tables(datasets_counts, videos_counts):
+        nonlocal rows_in_order
+        rows_in_order &= object_balance.append_objects_rows(
+            objects_store, videos_counts, need_to_add_tags, appended
+        )
+        # rows of datasets with the same name are reordered in the end
+        if objects_csv is not None and has_unique_dataset_names():
+            objects_csv.write(objects_store)
+        if on_update is None:
+            return
+        classes_stats = None
+        if len(g.PROJECT_META.obj_classes) > 0:
+            # datasets that are not processed yet have zero counts
+            datasets_counts = list(datasets_counts)
+            for dataset in g.DATASET_TREE.get_selected()[len(datasets_counts) :]:
+                datasets_counts.append((dataset.name, defaultdict(int), defaultdict(int), {}))
+            classes_stats = class_balance.calculate_classes_stats(datasets_counts)
+        on_update(classes_stats, objects_store)
+
+    with perf.stage("process_project"):
+        update = update_tables if on_update is not None or objects_csv is not None else None
+        if shards_dir is not None:
+            datasets_counts, videos_counts = merge_shards(shards_dir, progress, update)
+        else:
+            datasets_counts, videos_counts = process_project(progress, update, shard_writer)
+    if shard_writer is not None:
+        shard_writer.close()
+
+    classes_stats = class_balance.calculate_classes_stats(datasets_counts)
+    rows_in_order &= object_balance.append_objects_rows(
+        objects_store, videos_counts, need_to_add_tags, appended
+    )
+    if not rows_in_order:
+        objects_store = object_balance.calculate_objects_store(videos_counts, need_to_add_tags)
+
+    if report_dir is not None and shard_writer is None:
+        cooccurrence_stats = None
+        if len(g.PROJECT_META.obj_classes) > 0:
+            cooccurrence_stats = cooccurrence.calculate_cooccurrence_stats()
+        write_report_files(
+            classes_stats,
+            objects_store,
+            report_dir,
+            formats,
+            videos_counts,
+            need_to_add_tags,
+            objects_csv,
+            cooccurrence_stats,
+        )
+        perf.dump_report(os.path.join(report_dir, perf.TIMINGS_FILE))
+    perf.log_report()
+    return classes_stats, objects_store
 
 
 def download_csv(data, filename):
@@ -142,75 +685,115 @@ def download_csv(data, filename):
     csv.to_csv(filename, index=False)
 
 
-def save_report(cls_stats, obj_stats):
-    """save report to file *.lnk (link to report)"""
-    report_dir = os.path.join(g.STORAGE_DIR, "reports")
-    sly.fs.mkdir(report_dir)
-
-    report_name = f"{g.PROJECT.id}_{g.PROJECT.name}.lnk"
-    report_path = os.path.join(report_dir, report_name)
-    with open(report_path, "w") as text_file:
-        print(g.api.app.get_url(g.TASK_ID), file=text_file)
-
-    download_csv(cls_stats, os.path.join(report_dir, "classes_stats.csv"))
-    download_csv(obj_stats, os.path.join(report_dir, "objects_stats.csv"))
-
-    remote_path = f"/reports/video_objects_stats_for_every_class/{g.TASK_ID}"
-    remote_path = g.api.file.get_free_dir_name(g.TEAM_ID, remote_path)
-    report_path = os.path.join(remote_path, report_name)
-    g.api.file.upload_directory(g.TEAM_ID, report_dir, remote_path)
-    file_info = g.api.file.get_info_by_path(g.TEAM_ID, report_path)
-    g.api.task.set_output_report(g.TASK_ID, file_info.id, report_name)
-
-    sly.fs.remove_dir(report_dir)
-    return file_info
+def write_report_files(
+    cls_stats,
+    objects_store,
+    report_dir,
+    formats=("csv",),
+    videos_counts=None,
+    need_to_add_tags=False,
+    objects_csv=None,
+    cooccurrence_stats=None,
+):
+    """Write classes and objects tables to report_dir in the given formats.
 
+    Supported formats: csv, json, parquet and arrow. Columnar formats are built straight
+    from video summaries, so videos_counts is required for them.
 
-def get_dataset_infos(api: sly.Api, dataset_id: int, include_itself: bool = True):
+    :param objects_csv: ObjectsCsvWriter with objects csv rows written while processing
+    :param cooccurrence_stats: classes co-occurrence table, written if given
 
-    dataset_info = api.dataset.get_info_by_id(dataset_id)
-    nested_dataset_infos = api.dataset.get_nested(dataset_info.project_id, dataset_id)
+    Temporal histogram of classes is written from videos_counts if g.TEMPORAL_BINS is set,
+    in sampled runs it has the sampled videos only and its file name says so.
+    """
+    sly.fs.mkdir(report_dir)
+    for fmt in formats:
+        cls_path = os.path.join(report_dir, f"classes_stats.{fmt}")
+        obj_path = os.path.join(report_dir, f"objects_stats.{fmt}")
+        pairs_path = os.path.join(report_dir, f"classes_cooccurrence.{fmt}")
+        temporal_path = os.path.join(report_dir, temporal.get_temporal_file_name(fmt))
+        with perf.stage(f"write_{fmt}"):
+            if fmt == "csv":
+                download_csv(cls_stats, cls_path)
+                if objects_csv is None:
+                    objects_csv = export.ObjectsCsvWriter(report_dir)
+                objects_csv.close(objects_store)
+            elif fmt == "json":
+                sly.json.dump_json_file(cls_stats, cls_path, indent=None)
+                obj_stats = object_balance.get_objects_table(objects_store, need_to_add_tags)
+                sly.json.dump_json_file(obj_stats, obj_path, indent=None)
+            elif fmt in export.COLUMNAR_FORMATS:
+                if videos_counts is None:
+                    raise ValueError(f"Video summaries are required to write {fmt!r} report")
+                export.write_classes_columnar(cls_stats, cls_path, fmt)
+                export.write_objects_columnar(videos_counts, need_to_add_tags, obj_path, fmt)
+            else:
+                raise ValueError(f"Unsupported report format {fmt!r}")
+            if cooccurrence_stats is not None:
+                write_cooccurrence_file(cooccurrence_stats, pairs_path, fmt)
+            if videos_counts is not None and g.TEMPORAL_BINS > 0:
+                export.write_rows(
+                    temporal.get_temporal_columns(),
+                    temporal.iter_temporal_rows(videos_counts),
+                    temporal_path,
+                    fmt,
+                    temporal.get_temporal_columns_types(),
+                )
 
-    if include_itself:
-        nested_dataset_infos.insert(0, dataset_info)
 
-    return nested_dataset_infos
+def write_cooccurrence_file(cooccurrence_stats, path, fmt):
+    if fmt == "csv":
+        download_csv(cooccurrence_stats, path)
+    elif fmt == "json":
+        sly.json.dump_json_file(cooccurrence_stats, path, indent=None)
+    elif fmt in export.COLUMNAR_FORMATS:
+        export.write_classes_columnar(
+            cooccurrence_stats, path, fmt, string_columns=("class", "paired class")
+        )
 
 
-def get_dataset_items_count(api: sly.Api, dataset_id: int, include_parent: bool = True) -> int:
-    """Get total number of items in a datasets, optionally including items in dataset itself.
+def get_report_dir():
+    return os.path.join(g.STORAGE_DIR, "reports")
 
-    :param dataset_id: ID of the dataset to get items count for.
-    :type dataset_id: int
-    :param include_parent: Whether to include items of the dataset itself.
-    :type include_parent: bool
-    :return: Total number of items_count.
-    :rtype: int
-    """
 
-    return sum(
-        ds_info.items_count
-        for ds_info in get_dataset_infos(api, dataset_id, include_itself=include_parent)
-    )
+def create_report_uploader() -> ReportUploader:
+    """Return uploader to a free Team Files directory for the report of the task"""
+    remote_path = f"/reports/video_objects_stats_for_every_class/{g.TASK_ID}"
+    remote_path = g.api.file.get_free_dir_name(g.TEAM_ID, remote_path)
+    return ReportUploader(g.api, g.TEAM_ID, remote_path)
 
 
-def get_all_selected_ds_list(api: sly.Api, dataset_id: int, include_parent: bool = True) -> list:
-    """Get list of all selected datasets, optionally including the parent dataset.
+def save_report(report_dir, uploader=None):
+    """save report to file *.lnk (link to report) and upload report_dir to Team Files.
 
-    :param dataset_id: ID of the dataset to get items count for.
-    :type dataset_id: int
-    :param include_parent: Whether to include the parent dataset itself.
-    :type include_parent: bool
-    :return: List of all selected datasets.
-    :rtype: list
+    Files already submitted to the uploader while processing are not uploaded again.
     """
+    sly.fs.mkdir(report_dir)
+    if uploader is None:
+        uploader = create_report_uploader()
 
-    ids = []
-    all_selected_ds = get_dataset_infos(api, dataset_id, include_itself=include_parent)
+    report_name = f"{g.PROJECT.id}_{g.PROJECT.name}.lnk"
+    report_path = os.path.join(report_dir, report_name)
+    with open(report_path, "w") as text_file:
+        print(g.api.app.get_url(g.TASK_ID), file=text_file)
 
-    for ds_info in all_selected_ds:
-        ids.append(ds_info.id)
+    remote_path = uploader.remote_dir
+    report_path = os.path.join(remote_path, report_name)
+    # timings file is uploaded after the report to include the upload time
+    timings_path = os.path.join(report_dir, perf.TIMINGS_FILE)
+    sly.fs.silent_remove(timings_path)
+    try:
+        with perf.stage("upload"):
+            uploader.submit_directory(report_dir)
+            uploader.wait()
+    finally:
+        uploader.close()
+    if g.PERF_STATS:
+        perf.dump_report(timings_path)
+        g.api.file.upload(g.TEAM_ID, timings_path, os.path.join(remote_path, perf.TIMINGS_FILE))
+        perf.log_report(["upload", "upload_files"])
+    file_info = g.api.file.get_info_by_path(g.TEAM_ID, report_path)
+    g.api.task.set_output_report(g.TASK_ID, file_info.id, report_name)
 
-    return [
-        ds_info.id for ds_info in get_dataset_infos(api, dataset_id, include_itself=include_parent)
-    ]
+    sly.fs.remove_dir(report_dir)
+    return file_info
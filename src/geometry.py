@@ -0,0 +1,187 @@
+import uuid
+from collections import namedtuple
+
+import numpy as np
+
+import supervisely as sly
+
+# area (pixels) and bounding box extent statistics of all figures of an object
+GeometryStats = namedtuple(
+    "GeometryStats",
+    ["area_mean", "area_min", "area_median", "area_max", "width_mean", "height_mean"],
+)
+RECTANGLE = sly.Rectangle.geometry_name()
+POLYGON = sly.Polygon.geometry_name()
+BITMAP = sly.Bitmap.geometry_name()
+DECIMALS = 2
+
+
+class FiguresGeometry:
+    """Figure geometries of a video gathered from json into flat lists.
+
+    Areas and extents are calculated at once for all figures of a type in
+    get_figures_stats, the same way as sly geometries do: rectangle and bounding box
+    sides include both edge pixels, polygon area is the shoelace area of the exterior
+    without holes, bitmap area is the number of mask pixels.
+    """
+
+    def __init__(self):
+        self.rect_objects = []
+        # left, top, right, bottom of every rectangle
+        self.rect_coords = []
+        self.poly_objects = []
+        # (x, y) points of all polygons, points count of every polygon
+        self.poly_points = []
+        self.poly_sizes = []
+        # holes: index of the polygon, points and points count of every hole
+        self.hole_polygons = []
+        self.hole_points = []
+        self.hole_sizes = []
+        # bitmaps are decoded one by one, it is the most expensive part of geometry stats:
+        # object, area, width, height
+        self.bitmap_stats = []
+
+    def add(self, obj_idx: int, geometry_type: str, geometry: dict):
+        """Add figure geometry json, figures of other types are ignored"""
+        if geometry_type == RECTANGLE:
+            (left, top), (right, bottom) = geometry["points"]["exterior"]
+            self.rect_objects.append(obj_idx)
+            self.rect_coords.append((left, top, right, bottom))
+        elif geometry_type == POLYGON:
+            exterior = geometry["points"]["exterior"]
+            if len(exterior) == 0:
+                return
+            for hole in geometry["points"].get("interior", []):
+                self.hole_polygons.append(len(self.poly_sizes))
+                self.hole_points.extend(hole)
+                self.hole_sizes.append(len(hole))
+            self.poly_objects.append(obj_idx)
+            self.poly_points.extend(exterior)
+            self.poly_sizes.append(len(exterior))
+        elif geometry_type == BITMAP:
+            mask = sly.Bitmap.base64_2_data(geometry["bitmap"]["data"])
+            rows = np.flatnonzero(mask.any(axis=1))
+            cols = np.flatnonzero(mask.any(axis=0))
+            if len(rows) == 0:
+                return
+            self.bitmap_stats.append(
+                (
+                    obj_idx,
+                    np.count_nonzero(mask),
+                    cols[-1] - cols[0] + 1,
+                    rows[-1] - rows[0] + 1,
+                )
+            )
+
+    def get_figures_stats(self):
+        """Return object index, area, width and height arrays of all figures"""
+        parts = [np.asarray(self.bitmap_stats, dtype=np.float64).reshape(-1, 4).T]
+        if len(self.rect_coords) > 0:
+            coords = np.asarray(self.rect_coords, dtype=np.float64)
+            widths = np.abs(coords[:, 2] - coords[:, 0]) + 1
+            heights = np.abs(coords[:, 3] - coords[:, 1]) + 1
+            parts.append((np.asarray(self.rect_objects), widths * heights, widths, heights))
+        if len(self.poly_sizes) > 0:
+            points = np.round(np.asarray(self.poly_points, dtype=np.float64))
+            areas = get_polygons_areas(points, self.poly_sizes)
+            if len(self.hole_sizes) > 0:
+                holes_points = np.round(np.asarray(self.hole_points, dtype=np.float64))
+                holes_areas = get_polygons_areas(holes_points, self.hole_sizes)
+                areas -= np.bincount(self.hole_polygons, weights=holes_areas, minlength=len(areas))
+            starts = np.cumsum(self.poly_sizes) - self.poly_sizes
+            extents = (
+                np.maximum.reduceat(points, starts, axis=0)
+                - np.minimum.reduceat(points, starts, axis=0)
+                + 1
+            )
+            parts.append((np.asarray(self.poly_objects), areas, extents[:, 0], extents[:, 1]))
+        objects, areas, widths, heights = (np.concatenate(values) for values in zip(*parts))
+        return objects.astype(np.int64), areas, widths, heights
+
+
+def get_polygons_areas(points: np.ndarray, sizes: list) -> np.ndarray:
+    """Shoelace areas of polygons given as concatenated (x, y) points and points counts"""
+    sizes = np.asarray(sizes)
+    polygons = np.repeat(np.arange(len(sizes)), sizes)
+    starts = np.cumsum(sizes) - sizes
+    # index of the next point, the last point of a polygon is followed by its first point
+    next_idx = np.arange(1, len(points) + 1)
+    next_idx[starts + sizes - 1] = starts
+    x, y = points[:, 0], points[:, 1]
+    cross = x * y[next_idx] - x[next_idx] * y
+    return np.abs(np.bincount(polygons, weights=cross, minlength=len(sizes))) / 2
+
+
+def get_groups_stats(groups: np.ndarray, values: np.ndarray, groups_count: int):
+    """Mean, min, median and max of values in every group, groups without values are NaN"""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    counts = np.bincount(groups, minlength=groups_count)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    present = counts > 0
+    stats = np.full((4, groups_count), np.nan)
+    sums = np.bincount(groups, weights=values, minlength=groups_count)
+    stats[0, present] = sums[present] / counts[present]
+    stats[1, present] = values[starts[present]]
+    low = starts + (counts - 1) // 2
+    high = starts + counts // 2
+    stats[2, present] = (values[low[present]] + values[high[present]]) / 2
+    stats[3, present] = values[ends[present] - 1]
+    return stats
+
+
+def get_objects_geometry(ann_json: dict) -> dict:
+    """Return object key -> GeometryStats of its rectangle, polygon and bitmap figures.
+
+    Object keys are the ones of the json counting engine. Objects without such figures
+    are not in the result.
+    """
+    obj_keys = []
+    # keys as they are in json and normalized, so most figures are matched without uuid parsing
+    objkey2idx = {}
+    objid2idx = {}
+    for obj in ann_json["objects"]:
+        if "key" not in obj:
+            continue
+        obj_key = str(uuid.UUID(obj["key"]))
+        objkey2idx[obj_key] = objkey2idx[obj["key"]] = len(obj_keys)
+        obj_keys.append(obj_key)
+        if obj.get("id") is not None:
+            objid2idx[obj["id"]] = objkey2idx[obj_key]
+
+    figures = FiguresGeometry()
+    for frame in ann_json["frames"]:
+        for fig in frame.get("figures", []):
+            if "objectKey" in fig:
+                obj_idx = objkey2idx.get(fig["objectKey"])
+                if obj_idx is None:
+                    obj_idx = objkey2idx.get(str(uuid.UUID(fig["objectKey"])))
+            else:
+                obj_idx = objid2idx.get(fig.get("objectId"))
+            if obj_idx is not None and "geometry" in fig:
+                figures.add(obj_idx, fig.get("geometryType"), fig["geometry"])
+
+    objects, areas, widths, heights = figures.get_figures_stats()
+    if len(objects) == 0:
+        return {}
+    area_stats = get_groups_stats(objects, areas, len(obj_keys))
+    counts = np.bincount(objects, minlength=len(obj_keys))
+    present = counts > 0
+    width_means = np.bincount(objects, weights=widths, minlength=len(obj_keys))
+    height_means = np.bincount(objects, weights=heights, minlength=len(obj_keys))
+    width_means[present] /= counts[present]
+    height_means[present] /= counts[present]
+    rows = np.vstack([area_stats, width_means, height_means]).round(DECIMALS).T.tolist()
+    return {
+        obj_keys[obj_idx]: GeometryStats(*rows[obj_idx])
+        for obj_idx in np.flatnonzero(present).tolist()
+    }
+
+
+def get_frame_size(ann_json: dict):
+    """Return (height, width) of video frames or None"""
+    size = ann_json.get("size")
+    if not size:
+        return None
+    return size["height"], size["width"]
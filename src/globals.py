@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -8,39 +9,146 @@ if sly.is_development():
     load_dotenv("local.env")
     load_dotenv(os.path.expanduser("~/supervisely.env"))
 
-api = sly.Api.from_env()
+# no API calls on import: project state is resolved by init() for every stats run
+api: sly.Api = None
 
-TEAM_ID = sly.env.team_id()
-TASK_ID = sly.env.task_id()
-WORKSPACE_ID = sly.env.workspace_id()
+TEAM_ID = sly.env.team_id(raise_not_found=False)
+TASK_ID = sly.env.task_id(raise_not_found=False)
+WORKSPACE_ID = sly.env.workspace_id(raise_not_found=False)
 PROJECT_ID = sly.env.project_id(raise_not_found=False)
 DATASET_ID = sly.env.dataset_id(raise_not_found=False)
-PROJECT = api.project.get_info_by_id(PROJECT_ID)
+PROJECT = None
 DATASET = None
-if DATASET_ID is not None:
-    DATASET = api.dataset.get_info_by_id(DATASET_ID)
-
+PROJECT_META = None
+DATASET_TREE = None
 ANNOTATED_FRAMES = {}
-PROJECT_META = sly.ProjectMeta.from_json(api.project.get_meta(PROJECT.id))
+# dataset name -> {(class index, class index): frames with both classes}
+CLASS_PAIRS = {}
+# sampling.ProjectSample of an approximate run, None for exact stats
+SAMPLE = None
+
+
+def init(api_: sly.Api, project_id: int = None, dataset_id: int = None):
+    """Resolve project, dataset and project meta for a stats run.
+
+    If only dataset_id is given, project is taken from the dataset.
+    """
+    global api, PROJECT_ID, DATASET_ID, PROJECT, DATASET, PROJECT_META, ANNOTATED_FRAMES
+    global CLASS_PAIRS, SAMPLE
+
+    api = api_
+    DATASET = None
+    if dataset_id is not None:
+        DATASET = api.dataset.get_info_by_id(dataset_id)
+        if DATASET is None:
+            raise RuntimeError("Dataset {!r} not found".format(dataset_id))
+        if project_id is None:
+            project_id = DATASET.project_id
+    PROJECT_ID = project_id
+    DATASET_ID = dataset_id
+    PROJECT = api.project.get_info_by_id(PROJECT_ID)
+
+    if PROJECT is None:
+        raise RuntimeError("Project {!r} not found".format(PROJECT_ID))
+    if PROJECT.type != str(sly.ProjectType.VIDEOS):
+        raise TypeError(
+            "Project type is {!r}, but has to be {!r}".format(PROJECT.type, sly.ProjectType.VIDEOS)
+        )
 
-if PROJECT is None:
-    raise RuntimeError("Project {!r} not found".format(PROJECT.name))
-if PROJECT.type != str(sly.ProjectType.VIDEOS):
-    raise TypeError(
-        "Project type is {!r}, but has to be {!r}".format(PROJECT.type, sly.ProjectType.VIDEOS)
+    PROJECT_META = sly.ProjectMeta.from_json(api.project.get_meta(PROJECT.id))
+    ANNOTATED_FRAMES = {}
+    CLASS_PAIRS = {}
+    SAMPLE = None
+
+    sly.logger.info(
+        "Script arguments",
+        extra={
+            "TEAM_ID": TEAM_ID,
+            "WORKSPACE_ID": WORKSPACE_ID,
+            "VIDEO_PROJECT_ID": PROJECT_ID,
+            "VIDEO_DATASET_ID": DATASET_ID,
+        },
     )
 
-sly.logger.info(
-    "Script arguments",
-    extra={
-        "TEAM_ID": TEAM_ID,
-        "WORKSPACE_ID": WORKSPACE_ID,
-        "VIDEO_PROJECT_ID": PROJECT_ID,
-        "VIDEO_DATASET_ID": DATASET_ID,
-    },
-)
-
-STORAGE_DIR = sly.app.get_data_dir()
+
+try:
+    STORAGE_DIR = sly.app.get_data_dir()
+except ValueError:
+    # headless run outside of the app task
+    STORAGE_DIR = os.path.join(tempfile.gettempdir(), "video-objects-stats")
+
+# annotation fetching
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 4))
+FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", 50))
+FETCH_PREFETCH = int(os.environ.get("FETCH_PREFETCH", 8))
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", 3))
+FETCH_BACKOFF = float(os.environ.get("FETCH_BACKOFF", 1.0))
+# "threads" - thread pool of sync requests, "async" - asyncio requests over a pooled
+# keep-alive http client, FETCH_WORKERS is the number of concurrent requests
+FETCH_ENGINE = os.environ.get("FETCH_ENGINE", "threads")
+
+# "annotation" - count via VideoAnnotation.from_json, "json" - count straight from annotation json,
+# "validate" - run both engines and report mismatches
+COUNT_ENGINE = os.environ.get("COUNT_ENGINE", "annotation")
+
+# area, width and height statistics of object figures (rectangles, polygons and bitmaps), off by
+# default: every bitmap figure is decoded to count its pixels
+GEOMETRY_STATS = os.environ.get("GEOMETRY_STATS", "false").lower() in ("1", "true", "yes")
+
+# parts of the video in the per class temporal histogram of every video, 0 - no histogram
+TEMPORAL_BINS = int(os.environ.get("TEMPORAL_BINS", 10))
+
+# worker processes for annotations aggregation: 1 - serial run, 0 - one per CPU core
+AGGREGATION_WORKERS = int(os.environ.get("AGGREGATION_WORKERS", 1))
+AGGREGATION_CHUNK_SIZE = int(os.environ.get("AGGREGATION_CHUNK_SIZE", 16))
+
+# approximate stats from a stratified random sample of videos of every dataset, either
+# SAMPLE_SHARE - share of videos of every dataset (up to 1) or SAMPLE_VIDEOS - number of videos
+# in the project split between datasets by their size; 0 - all videos
+SAMPLE_SHARE = float(os.environ.get("SAMPLE_SHARE", 0))
+SAMPLE_VIDEOS = int(os.environ.get("SAMPLE_VIDEOS", 0))
+# seconds to spend on sampled videos, split between datasets by their size, 0 - no limit
+SAMPLE_TIME_BUDGET = float(os.environ.get("SAMPLE_TIME_BUDGET", 0))
+
+# sharded run: the task processes shard SHARD_INDEX of SHARD_COUNT and saves its video
+# summaries for the merge, SHARD_BY - "video" (by a hash of video id) or "dataset"; 1 - no shards
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 1))
+SHARD_INDEX = int(os.environ.get("SHARD_INDEX", 0))
+SHARD_BY = os.environ.get("SHARD_BY", "video")
+if SHARD_COUNT > 1:
+    # spill files, checkpoint and stats cache of shards on one machine are kept apart
+    STORAGE_DIR = os.path.join(STORAGE_DIR, f"shard-{SHARD_INDEX}")
+
+# incremental stats cache, on by default for sampled runs: a following exact run with the cache
+# reuses the sampled videos
+_SAMPLING = SAMPLE_SHARE > 0 or SAMPLE_VIDEOS > 0 or SAMPLE_TIME_BUDGET > 0
+CACHE_ENABLED = os.environ.get("STATS_CACHE", str(_SAMPLING)).lower() in ("1", "true", "yes")
+CACHE_TEAM_FILES_DIR = os.environ.get("STATS_CACHE_TEAM_FILES_DIR", "")
+
+# checkpoints of processed videos in STORAGE_DIR every N seconds and after each dataset,
+# so a restarted run resumes where the previous one stopped; 0 - disabled
+CHECKPOINT_INTERVAL = float(os.environ.get("CHECKPOINT_INTERVAL", 0))
+
+# in-memory buffer (MB) of video summaries and objects table, the rest is spilled to files
+# in STORAGE_DIR, so projects larger than RAM can be processed; 0 - everything in memory
+SPILL_MEMORY_MB = float(os.environ.get("SPILL_MEMORY_MB", 0))
+
+# report files formats: csv, json, parquet, arrow
+REPORT_FORMATS = [fmt.strip() for fmt in os.environ.get("REPORT_FORMATS", "csv").split(",")]
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION", "zstd")
+# objects csv is written while processing: gzipped and split into parts of N rows
+# that are uploaded before processing ends; 0 - one file
+REPORT_CSV_GZIP = os.environ.get("REPORT_CSV_GZIP", "false").lower() in ("1", "true", "yes")
+REPORT_CSV_PART_ROWS = int(os.environ.get("REPORT_CSV_PART_ROWS", 0))
+
+# per-stage timings, calls, downloaded bytes and process peak memory in logs and timings.json
+PERF_STATS = os.environ.get("PERF_STATS", "false").lower() in ("1", "true", "yes")
+
+# live tables updates while processing: every N videos and after each dataset,
+# but not more often than LIVE_UPDATE_INTERVAL seconds and LIVE_UPDATE_SHARE of runtime
+LIVE_UPDATE_VIDEOS = int(os.environ.get("LIVE_UPDATE_VIDEOS", 50))
+LIVE_UPDATE_INTERVAL = float(os.environ.get("LIVE_UPDATE_INTERVAL", 2.0))
+LIVE_UPDATE_SHARE = float(os.environ.get("LIVE_UPDATE_SHARE", 0.05))
 
 # constants
 BY_CLS_NAME = "by_class_name"
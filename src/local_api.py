@@ -0,0 +1,136 @@
+import os
+from collections import namedtuple
+
+import supervisely as sly
+
+ProjectInfo = namedtuple("ProjectInfo", ["id", "name", "type", "items_count"])
+DatasetInfo = namedtuple("DatasetInfo", ["id", "name", "project_id", "parent_id", "items_count"])
+VideoInfo = namedtuple(
+    "VideoInfo", ["id", "name", "dataset_id", "frames_count", "duration", "updated_at"]
+)
+
+
+class _Namespace:
+    pass
+
+
+class LocalApi:
+    """Read-only subset of sly.Api served from a video project in Supervisely format on disk.
+
+    Allows running and benchmarking the stats pipeline offline:
+
+        project_dir/meta.json
+        project_dir/<dataset>/ann/<video name>.json
+        project_dir/<dataset>/datasets/<nested dataset>/ann/<video name>.json
+    """
+
+    def __init__(self, project_dir: str, project_id: int = 1):
+        self.project_dir = project_dir
+        self.server_address = ""
+        self._meta = sly.json.load_json_file(os.path.join(project_dir, "meta.json"))
+        self._datasets = []
+        # dataset id -> video ids, video infos are made when the dataset is listed
+        self._video_ids = {}
+        self._videos = {}
+        self._ann_paths = {}
+        # video id -> annotation json parsed for the videos list of the last listed dataset,
+        # it is given to the following download instead of reading the file again
+        self._parsed_anns = {}
+        self._scan_datasets(project_dir, project_id, None)
+        self._project = ProjectInfo(
+            id=project_id,
+            name=os.path.basename(os.path.normpath(project_dir)),
+            type=str(sly.ProjectType.VIDEOS),
+            items_count=len(self._ann_paths),
+        )
+
+        self.project = _Namespace()
+        self.project.get_info_by_id = self._get_project_info
+        self.project.get_meta = lambda project_id: self._meta
+        self.dataset = _Namespace()
+        self.dataset.get_list = self._get_dataset_list
+        self.dataset.get_info_by_id = self._get_dataset_info
+        self.dataset.get_nested = self._get_nested_datasets
+        self.video = _Namespace()
+        self.video.get_list = self._get_video_list
+        self.video.annotation = _Namespace()
+        self.video.annotation.download = self._download_annotation
+        self.video.annotation.download_bulk = self._download_annotations_bulk
+
+    def _scan_datasets(self, parent_dir, project_id, parent_id):
+        for name in sorted(os.listdir(parent_dir)):
+            ds_dir = os.path.join(parent_dir, name)
+            ann_dir = os.path.join(ds_dir, "ann")
+            if not os.path.isdir(ann_dir):
+                continue
+            dataset_id = len(self._datasets) + 1
+            ann_files = sorted(f for f in os.listdir(ann_dir) if f.endswith(".json"))
+            video_ids = []
+            for ann_file in ann_files:
+                video_id = len(self._ann_paths) + 1
+                self._ann_paths[video_id] = os.path.join(ann_dir, ann_file)
+                video_ids.append(video_id)
+            self._datasets.append(
+                DatasetInfo(dataset_id, name, project_id, parent_id, len(video_ids))
+            )
+            self._video_ids[dataset_id] = video_ids
+            nested_dir = os.path.join(ds_dir, "datasets")
+            if os.path.isdir(nested_dir):
+                self._scan_datasets(nested_dir, project_id, dataset_id)
+
+    def _get_video_list(self, dataset_id):
+        """Frames count is in the annotation, so annotations of the dataset are parsed once here
+        and kept for the download. Annotations of other datasets that were not downloaded are
+        dropped, so only one dataset is kept in memory.
+        """
+        if dataset_id not in self._videos:
+            self._parsed_anns.clear()
+            videos = []
+            for video_id in self._video_ids.get(dataset_id, []):
+                ann_path = self._ann_paths[video_id]
+                ann_json = sly.json.load_json_file(ann_path)
+                self._parsed_anns[video_id] = ann_json
+                videos.append(
+                    VideoInfo(
+                        id=video_id,
+                        name=os.path.basename(ann_path)[: -len(".json")],
+                        dataset_id=dataset_id,
+                        frames_count=ann_json.get("framesCount"),
+                        duration=None,
+                        updated_at=str(os.path.getmtime(ann_path)),
+                    )
+                )
+            self._videos[dataset_id] = videos
+        return list(self._videos[dataset_id])
+
+    def _get_project_info(self, project_id):
+        return self._project if project_id == self._project.id else None
+
+    def _get_dataset_list(self, project_id, recursive=False):
+        if recursive:
+            return list(self._datasets)
+        return [ds_info for ds_info in self._datasets if ds_info.parent_id is None]
+
+    def _get_dataset_info(self, dataset_id):
+        for ds_info in self._datasets:
+            if ds_info.id == dataset_id:
+                return ds_info
+        return None
+
+    def _get_nested_datasets(self, project_id, dataset_id):
+        nested = []
+        for ds_info in self._datasets:
+            if ds_info.parent_id == dataset_id:
+                nested.append(ds_info)
+                nested.extend(self._get_nested_datasets(project_id, ds_info.id))
+        return nested
+
+    def _download_annotation(self, video_id):
+        ann_json = self._parsed_anns.pop(video_id, None)
+        if ann_json is None:
+            ann_json = sly.json.load_json_file(self._ann_paths[video_id])
+        ann_json["videoId"] = video_id
+        return ann_json
+
+    def _download_annotations_bulk(self, dataset_id, video_ids):
+        return [self._download_annotation(video_id) for video_id in video_ids]
@@ -2,17 +2,22 @@ import src.functions as f
 import src.globals as g
 import src.ui.class_stats as class_stats
 import src.ui.controls as controls
+import src.ui.cooccurrence as cooccurrence
 import src.ui.input as input
 import src.ui.object_stats as object_stats
 import src.ui.output as output
 import supervisely as sly
+from src.stats.cooccurrence import calculate_cooccurrence_stats
 from supervisely.app.widgets import Container
 
 input_output = Container(
     widgets=[input.card, controls.card, output.card], direction="horizontal", fractions=[1, 1, 1]
 )
 
-layout = Container(widgets=[input_output, class_stats.card, object_stats.card])
+layout = Container(widgets=[input_output, class_stats.card, cooccurrence.card, object_stats.card])
+
+g.init(sly.Api.from_env(), g.PROJECT_ID, g.DATASET_ID)
+input.set_input(g.PROJECT, g.DATASET)
 
 
 @controls.start_btn.click
@@ -21,12 +26,28 @@ def calculate_stats():
     controls.text.hide()
     controls.start_btn.disable()
     need_to_add_tags = controls.tags_checkbox.is_checked()
-    controls.tags_checkbox.hide()
+    controls.apply_settings()
+    controls.settings.hide()
+
+    # calculate and set stats, tables are filled while processing
+    def show_stats(cls_stats, objects_store):
+        if cls_stats is not None:
+            class_stats.fast_table.read_json(cls_stats, meta=g.PROJECT_META)
+        object_stats.set_store(objects_store, need_to_add_tags)
 
-    # calculate and set stats
-    cls_stats, obj_stats = f.calculate_stats(need_to_add_tags)
-    class_stats.fast_table.read_json(cls_stats, meta=g.PROJECT_META)
-    object_stats.fast_table.read_json(obj_stats, meta=g.PROJECT_META)
+    report_dir = f.get_report_dir()
+    # objects csv parts are uploaded while processing
+    uploader = f.create_report_uploader()
+    cls_stats, objects_store = f.calculate_stats(
+        need_to_add_tags,
+        progress=controls.progress,
+        report_dir=report_dir,
+        on_update=show_stats,
+        uploader=uploader,
+    )
+    show_stats(cls_stats, objects_store)
+    if len(g.PROJECT_META.obj_classes) > 0:
+        cooccurrence.fast_table.read_json(calculate_cooccurrence_stats(), meta=g.PROJECT_META)
 
     # ui
     controls.progress.hide()
@@ -34,7 +55,7 @@ def calculate_stats():
     controls.text.set("Calculating statistics finished. Uploading to Team Files...", status="info")
 
     # upload stats to team files
-    report_info = f.save_report(cls_stats, obj_stats)
+    report_info = f.save_report(report_dir, uploader)
 
     # ui
     output.output_thumbnail.set(report_info)
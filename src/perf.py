@@ -0,0 +1,175 @@
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import src.globals as g
+import supervisely as sly
+
+TIMINGS_FILE = "timings.json"
+
+# (stage, dataset name) -> {"time", "calls", "bytes", "process_peak_rss_mb"}
+records = {}
+current_dataset = None
+started_at = None
+_lock = threading.Lock()
+
+
+def reset():
+    global current_dataset, started_at
+    records.clear()
+    current_dataset = None
+    started_at = time.perf_counter()
+
+
+def set_dataset(dataset_name):
+    """Attribute next records to the dataset (None for project-level stages)"""
+    global current_dataset
+    current_dataset = dataset_name
+
+
+def get_max_rss_mb() -> float:
+    """Peak RSS of the process since its start, not the memory of the current stage"""
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def add(stage: str, elapsed: float = 0.0, calls: int = 1, bytes_count: int = 0):
+    key = (stage, current_dataset)
+    # the process peak at the end of the stage, the stage may not be what raised it
+    peak_rss_mb = get_max_rss_mb()
+    with _lock:
+        record = records.setdefault(
+            key, {"time": 0.0, "calls": 0, "bytes": 0, "process_peak_rss_mb": 0}
+        )
+        record["time"] += elapsed
+        record["calls"] += calls
+        record["bytes"] += bytes_count
+        record["process_peak_rss_mb"] = max(record["process_peak_rss_mb"], peak_rss_mb)
+
+
+def pop_records() -> dict:
+    """Return and clear the records, e.g. of a worker process to merge them in the parent"""
+    with _lock:
+        popped = dict(records)
+        records.clear()
+    return popped
+
+
+def merge_records(worker_records: dict):
+    """Add records of a worker process to the current dataset"""
+    with _lock:
+        for (stage_name, _), worker_record in worker_records.items():
+            record = records.setdefault(
+                (stage_name, current_dataset),
+                {"time": 0.0, "calls": 0, "bytes": 0, "process_peak_rss_mb": 0},
+            )
+            record["time"] += worker_record["time"]
+            record["calls"] += worker_record["calls"]
+            record["bytes"] += worker_record["bytes"]
+            record["process_peak_rss_mb"] = max(
+                record["process_peak_rss_mb"], worker_record["process_peak_rss_mb"]
+            )
+
+
+@contextmanager
+def stage(name: str):
+    if not g.PERF_STATS:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator recording function calls as stage. Returns the function itself if
+    instrumentation is off, so there is no overhead.
+    """
+
+    def decorator(func):
+        if not g.PERF_STATS:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_api(api):
+    """Record time, calls and response bytes of API requests (sync and async) as "api" stage"""
+    if not g.PERF_STATS or not hasattr(api, "post") or getattr(api.post, "perf_wrapped", False):
+        return
+    post = api.post
+
+    @wraps(post)
+    def post_with_stats(*args, **kwargs):
+        start = time.perf_counter()
+        response = post(*args, **kwargs)
+        add("api", time.perf_counter() - start, bytes_count=len(response.content))
+        return response
+
+    post_with_stats.perf_wrapped = True
+    api.post = post_with_stats
+
+    if not hasattr(api, "post_async"):
+        return
+    post_async = api.post_async
+
+    @wraps(post_async)
+    async def post_async_with_stats(*args, **kwargs):
+        start = time.perf_counter()
+        response = await post_async(*args, **kwargs)
+        add("api", time.perf_counter() - start, bytes_count=len(response.content))
+        return response
+
+    api.post_async = post_async_with_stats
+
+
+def get_report() -> dict:
+    with _lock:
+        stages = [
+            {
+                "stage": stage_name,
+                "dataset": dataset_name,
+                "time": round(record["time"], 4),
+                "calls": record["calls"],
+                "bytes": record["bytes"],
+                "process_peak_rss_mb": round(record["process_peak_rss_mb"], 1),
+            }
+            for (stage_name, dataset_name), record in records.items()
+        ]
+    total_time = time.perf_counter() - started_at if started_at is not None else None
+    return {"total_time": total_time, "process_peak_rss_mb": get_max_rss_mb(), "stages": stages}
+
+
+def log_report(stages: list = None):
+    """Log records of the given stages (all by default) as structured log fields"""
+    if not g.PERF_STATS:
+        return
+    report = get_report()
+    for stage_record in report["stages"]:
+        if stages is not None and stage_record["stage"] not in stages:
+            continue
+        sly.logger.info(f"Stage {stage_record['stage']!r} timings", extra=stage_record)
+    sly.logger.info(
+        "Run timings",
+        extra={
+            "total_time": report["total_time"],
+            "process_peak_rss_mb": report["process_peak_rss_mb"],
+        },
+    )
+
+
+def dump_report(path: str):
+    if not g.PERF_STATS:
+        return
+    sly.json.dump_json_file(get_report(), path)
@@ -0,0 +1,207 @@
+import math
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import src.globals as g
+import supervisely as sly
+
+# normal quantile of the two-sided 95% confidence interval
+CONFIDENCE_Z = 1.96
+# the variance of a dataset estimate is unknown for a single sampled video
+MIN_DATASET_SAMPLE = 2
+# per video values of every class (and of all classes in the last row)
+METRICS = ("objects", "figures", "frames")
+
+
+def is_enabled() -> bool:
+    return g.SAMPLE_SHARE > 0 or g.SAMPLE_VIDEOS > 0 or g.SAMPLE_TIME_BUDGET > 0
+
+
+def check_sample_settings(share: float, videos: int):
+    if not 0 <= share <= 1:
+        raise ValueError(f"Share of sampled videos must be between 0 and 1, got {share}")
+    if videos < 0 or videos != int(videos):
+        raise ValueError(f"Number of sampled videos must be a whole number, got {videos}")
+    if share > 0 and videos > 0:
+        raise ValueError("Set either share or number of sampled videos, not both")
+
+
+def get_sample_sizes(populations: dict, share: float = 0, videos: int = 0) -> dict:
+    """Stratified sample size of every dataset, every dataset gets at least MIN_DATASET_SAMPLE
+    videos.
+
+    :param populations: dataset id -> number of videos
+    :param share: share of videos of every dataset
+    :param videos: number of videos in the project split between datasets in proportion to
+        their size, used if share is 0
+    :return: dataset id -> number of videos to sample
+    """
+    if share == 0:
+        share = min(videos / max(sum(populations.values()), 1), 1)
+    return {
+        ds_id: min(max(math.ceil(population * share), MIN_DATASET_SAMPLE), population)
+        for ds_id, population in populations.items()
+    }
+
+
+def select_videos(videos: list, size: int, seed: int) -> list:
+    """Return random sample of videos in random order, the same for the same seed and videos"""
+    videos = sorted(videos, key=lambda video_info: video_info.id)
+    random.Random(seed).shuffle(videos)
+    return videos[:size]
+
+
+class Stratum:
+    """Sums and sums of squares of per video counts of a sampled dataset"""
+
+    def __init__(self, population: int, classes_count: int):
+        self.population = population
+        self.sampled = 0
+        self.sums = np.zeros((classes_count + 1, len(METRICS)))
+        self.squares = np.zeros((classes_count + 1, len(METRICS)))
+
+    def add(self, values: np.ndarray):
+        self.sampled += 1
+        self.sums += values
+        self.squares += values**2
+
+    def get_estimates(self):
+        """Return estimated totals and their variances"""
+        if self.sampled == 0:
+            return np.zeros_like(self.sums), np.zeros_like(self.sums)
+        mean = self.sums / self.sampled
+        variance = np.zeros_like(self.sums)
+        if self.sampled > 1:
+            variance = np.maximum(self.squares - self.sums * mean, 0) / (self.sampled - 1)
+        population = max(self.population, self.sampled)
+        correction = 1 - self.sampled / population
+        return population * mean, population**2 * correction * variance / self.sampled
+
+
+class ProjectSample:
+    """Stratified random sample of videos, every dataset is a stratum.
+
+    Counts of a dataset are estimated as N * mean of the sampled videos, with the variance
+    N^2 * (1 - n/N) * s^2 / n, where s^2 is the sample variance of per video counts.
+    Datasets are sampled independently, so project estimates and variances are their sums.
+
+    With a time budget, the rest of the budget is split between the remaining datasets in
+    proportion to their size, and a dataset is sampled until its share of time is spent.
+    """
+
+    def __init__(
+        self, class_names: list, share: float = None, videos: int = None, time_budget: float = None
+    ):
+        self.class_names = list(class_names)
+        self.class_idx = {name: idx for idx, name in enumerate(self.class_names)}
+        self.share = g.SAMPLE_SHARE if share is None else share
+        self.videos = g.SAMPLE_VIDEOS if videos is None else videos
+        self.time_budget = g.SAMPLE_TIME_BUDGET if time_budget is None else time_budget
+        check_sample_settings(self.share, self.videos)
+        self.started_at = time.monotonic()
+        # dataset id -> Stratum, names are only for display: they are not unique in a project
+        self.strata = {}
+        self.names = {}
+        self.sizes = {}
+        self.remaining_population = 0
+        self.deadline = None
+
+    def plan(self, datasets: list) -> int:
+        """Split the sample between datasets, return the number of videos to process"""
+        populations = {ds_info.id: ds_info.items_count for ds_info in datasets}
+        self.remaining_population = sum(populations.values())
+        if self.share > 0 or self.videos > 0:
+            self.sizes = get_sample_sizes(populations, self.share, self.videos)
+        else:
+            self.sizes = populations
+        return sum(self.sizes.values())
+
+    def select_videos(self, ds_info, videos: list) -> list:
+        """Start sampling of a dataset, return its videos to process in order"""
+        self.strata[ds_info.id] = Stratum(len(videos), len(self.class_names))
+        self.names[ds_info.id] = ds_info.name
+        if self.time_budget > 0:
+            remaining = self.time_budget - (time.monotonic() - self.started_at)
+            share = ds_info.items_count / max(self.remaining_population, 1)
+            self.deadline = time.monotonic() + max(remaining, 0) * share
+        self.remaining_population -= ds_info.items_count
+        size = min(self.sizes.get(ds_info.id, len(videos)), len(videos))
+        return select_videos(videos, size, ds_info.id)
+
+    def add(self, ds_id: int, video_summary, video_frames: dict):
+        """Add counts of a sampled video, video_frames are its annotated frames counts"""
+        values = np.zeros((len(self.class_names) + 1, len(METRICS)))
+        for column, counts in enumerate(
+            [
+                video_summary.class_objects,
+                video_summary.class_figures,
+                video_frames[g.BY_CLS_NAME],
+            ]
+        ):
+            for class_name, count in counts.items():
+                if class_name in self.class_idx:
+                    values[self.class_idx[class_name], column] = count
+        values[-1, :2] = values[:-1, :2].sum(axis=0)
+        values[-1, 2] = video_frames[g.FRAMES]
+        self.strata[ds_id].add(values)
+
+    def is_over(self, ds_id: int) -> bool:
+        """True if the time share of the dataset is spent"""
+        stratum = self.strata[ds_id]
+        if self.deadline is None or stratum.sampled < min(MIN_DATASET_SAMPLE, stratum.population):
+            return False
+        return time.monotonic() >= self.deadline
+
+    def get_dataset_counts(self, ds_id: int):
+        """Return estimated (ds_name, objects, figures, frames) counters of classes"""
+        totals, _ = self.strata[ds_id].get_estimates()
+        totals = np.rint(totals).astype(np.int64).tolist()
+        counters = [defaultdict(int) for _ in METRICS]
+        for class_name, idx in self.class_idx.items():
+            for counter, value in zip(counters, totals[idx]):
+                if value > 0:
+                    counter[class_name] = value
+        return (self.names[ds_id], *counters)
+
+    def get_total_frames_counts(self) -> dict:
+        """Return dataset id -> estimated annotated frames of all classes, in the order of
+        datasets
+        """
+        return {
+            ds_id: int(round(stratum.get_estimates()[0][-1, 2]))
+            for ds_id, stratum in self.strata.items()
+        }
+
+    def get_weights(self) -> dict:
+        """Return dataset name -> number of dataset videos per sampled video, counts of
+        the sampled videos times the weight are the estimates of the dataset
+        """
+        return {
+            self.names[ds_id]: max(stratum.population, stratum.sampled) / max(stratum.sampled, 1)
+            for ds_id, stratum in self.strata.items()
+        }
+
+    def get_margins(self) -> list:
+        """Return 95% confidence interval half-widths of project objects, figures and frames
+        of every class and of all classes in the last row
+        """
+        variance = np.zeros((len(self.class_names) + 1, len(METRICS)))
+        for stratum in self.strata.values():
+            variance += stratum.get_estimates()[1]
+        return np.rint(CONFIDENCE_Z * np.sqrt(variance)).astype(np.int64).tolist()
+
+    def log_summary(self):
+        sampled = sum(stratum.sampled for stratum in self.strata.values())
+        population = sum(stratum.population for stratum in self.strata.values())
+        sly.logger.info(
+            f"Stats are estimated from {sampled} of {population} videos",
+            extra={
+                "datasets": [
+                    f"{self.names[ds_id]}: {stratum.sampled}/{stratum.population}"
+                    for ds_id, stratum in self.strata.items()
+                ]
+            },
+        )
@@ -0,0 +1,221 @@
+import glob
+import gzip
+import heapq
+import json
+import os
+import zlib
+from itertools import groupby
+
+import src.globals as g
+import supervisely as sly
+from src import summary
+from src.cache import get_meta_hash
+
+SHARD_BY = ("video", "dataset")
+SHARD_FILE_VERSION = 1
+SHARD_FILES_PATTERN = "shard-*-of-*.jsonl.gz"
+
+
+def is_enabled() -> bool:
+    return g.SHARD_COUNT > 1
+
+
+def configure(index: int, count: int, by: str = None):
+    """Make this process a shard of a sharded run, its local state is kept apart from the
+    state of other shards on the same machine
+    """
+    by = by or g.SHARD_BY
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index {index} is out of range for {count} shards")
+    if by not in SHARD_BY:
+        raise ValueError(f"Unsupported shard mode {by!r}, expected one of {SHARD_BY}")
+    g.SHARD_INDEX, g.SHARD_COUNT, g.SHARD_BY = index, count, by
+    g.STORAGE_DIR = os.path.join(g.STORAGE_DIR, f"shard-{index}")
+
+
+def get_file_name(index: int, count: int) -> str:
+    return f"shard-{index:05d}-of-{count:05d}.jsonl.gz"
+
+
+def get_video_shard(video_id: int, count: int) -> int:
+    """Shard of a video by a hash of its id, the same in every process"""
+    return zlib.crc32(str(video_id).encode("utf-8")) % count
+
+
+def get_datasets_shards(datasets: list, count: int) -> dict:
+    """Assign whole datasets to shards: the largest dataset goes to the least loaded shard.
+
+    :return: dataset id -> shard index
+    """
+    loads = [0] * count
+    shards = {}
+    for ds_info in sorted(datasets, key=lambda ds_info: (-ds_info.items_count, ds_info.id)):
+        idx = min(range(count), key=lambda idx: (loads[idx], idx))
+        shards[ds_info.id] = idx
+        loads[idx] += ds_info.items_count
+    return shards
+
+
+def get_header() -> dict:
+    return {
+        "version": SHARD_FILE_VERSION,
+        "project_id": g.PROJECT.id,
+        "dataset_id": g.DATASET_ID,
+        "meta_hash": get_meta_hash(g.PROJECT_META),
+        "shards": g.SHARD_COUNT,
+        "by": g.SHARD_BY,
+    }
+
+
+class ShardWriter:
+    """Partial aggregate of a shard: video summaries of the shard's videos.
+
+    Every summary is written with its position in the dataset videos list, and every
+    dataset of the shard with positions of its videos, so the merge restores the order of a
+    single run and checks that no video is missing. The file is gzipped json lines: header,
+    then dataset and summary lines in the order of processing. It is written to a temporary
+    file and renamed on close, so an interrupted shard leaves no shard file.
+    """
+
+    def __init__(self, dir_path: str):
+        sly.fs.mkdir(dir_path)
+        self.path = os.path.join(dir_path, get_file_name(g.SHARD_INDEX, g.SHARD_COUNT))
+        self.datasets_shards = {}
+        self.positions = {}
+        self.videos = 0
+        self._file = gzip.open(self.path + ".tmp", "wt", encoding="utf-8")
+        self._write({**get_header(), "shard": g.SHARD_INDEX})
+
+    def _write(self, data):
+        self._file.write(json.dumps(data, separators=(",", ":")))
+        self._file.write("\n")
+
+    def plan(self, datasets: list) -> int:
+        """Return the number of videos of the shard, estimated for sharding by video"""
+        total = sum(ds_info.items_count for ds_info in datasets)
+        if g.SHARD_BY == "video":
+            return -(-total // g.SHARD_COUNT)
+        self.datasets_shards = get_datasets_shards(datasets, g.SHARD_COUNT)
+        return sum(
+            ds_info.items_count
+            for ds_info in datasets
+            if self.datasets_shards[ds_info.id] == g.SHARD_INDEX
+        )
+
+    def has_dataset(self, ds_info) -> bool:
+        return self.datasets_shards.get(ds_info.id, g.SHARD_INDEX) == g.SHARD_INDEX
+
+    def select_videos(self, ds_info, videos: list) -> list:
+        """Return videos of the dataset that belong to the shard, in the order of videos"""
+        positions = [
+            position
+            for position, video_info in enumerate(videos)
+            if g.SHARD_BY == "dataset"
+            or get_video_shard(video_info.id, g.SHARD_COUNT) == g.SHARD_INDEX
+        ]
+        self.positions = {videos[position].id: position for position in positions}
+        self._write({"dataset_id": ds_info.id, "videos_count": len(videos), "positions": positions})
+        return [videos[position] for position in positions]
+
+    def add(self, ds_info, video_summary: summary.VideoSummary):
+        position = self.positions[video_summary.video.id]
+        self._write([ds_info.id, position, summary.summary_to_json(video_summary)])
+        self.videos += 1
+
+    def close(self):
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+        sly.logger.info(f"Shard {g.SHARD_INDEX} of {g.SHARD_COUNT}: {self.videos} videos saved")
+
+
+class ShardsReader:
+    """Shard files of a sharded run, validated against each other and the current project"""
+
+    def __init__(self, dir_path: str):
+        self.paths = sorted(glob.glob(os.path.join(dir_path, SHARD_FILES_PATTERN)))
+        if len(self.paths) == 0:
+            raise FileNotFoundError(f"No shard files in {dir_path!r}")
+        # dataset id -> [videos count, positions of all shards]
+        self.datasets = {}
+        headers = [self._read_datasets(path) for path in self.paths]
+        self._check_headers(headers)
+
+    def _read_datasets(self, path: str) -> dict:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != SHARD_FILE_VERSION:
+                raise ValueError(f"Unsupported shard file version in {path!r}")
+            for line in file:
+                if not line.startswith("{"):
+                    continue
+                data = json.loads(line)
+                videos_count, positions = self.datasets.setdefault(
+                    data["dataset_id"], [data["videos_count"], []]
+                )
+                if videos_count != data["videos_count"]:
+                    raise ValueError(
+                        f"Dataset {data['dataset_id']} has different videos in shards, "
+                        "it was changed while shards were running"
+                    )
+                positions.extend(data["positions"])
+        return header
+
+    def _check_headers(self, headers: list):
+        expected = get_header()
+        expected.pop("shards")
+        expected.pop("by")
+        for path, header in zip(self.paths, headers):
+            for key, value in expected.items():
+                if header[key] != value:
+                    raise ValueError(
+                        f"Shard {path!r} was calculated for other {key.replace('_', ' ')}"
+                    )
+        first = headers[0]
+        for header in headers:
+            if (header["shards"], header["by"]) != (first["shards"], first["by"]):
+                raise ValueError("Shard files are from different sharded runs")
+        indexes = sorted(header["shard"] for header in headers)
+        if indexes != list(range(first["shards"])):
+            missing = sorted(set(range(first["shards"])) - set(indexes))
+            raise ValueError(f"Shards {missing} of {first['shards']} are missing or duplicated")
+
+    def check_datasets(self, datasets: list):
+        """Check that every video of the datasets is in exactly one shard"""
+        for ds_info in datasets:
+            if ds_info.id not in self.datasets:
+                raise ValueError(f"Dataset {ds_info.name!r} is not in shards")
+            videos_count, positions = self.datasets[ds_info.id]
+            if sorted(positions) != list(range(videos_count)):
+                raise ValueError(f"Videos of dataset {ds_info.name!r} are missing in shards")
+
+    def _iter_summaries(self, path: str, datasets_order: dict):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            file.readline()
+            for line in file:
+                if not line.startswith("["):
+                    continue
+                dataset_id, position, summary_json = json.loads(line)
+                # datasets removed since the shards were calculated are skipped
+                if dataset_id in datasets_order:
+                    yield datasets_order[dataset_id], position, summary_json
+
+    def iter_datasets(self, datasets: list):
+        """Yield (dataset info, iterator of its VideoSummary) for every dataset in order.
+
+        Shard files are sorted by dataset and position, so they are merged as streams and
+        summaries are not kept in memory.
+        """
+        self.check_datasets(datasets)
+        datasets_order = {ds_info.id: order for order, ds_info in enumerate(datasets)}
+        merged = heapq.merge(
+            *(self._iter_summaries(path, datasets_order) for path in self.paths),
+            key=lambda item: item[:2],
+        )
+        groups = groupby(merged, key=lambda item: item[0])
+        group = next(groups, None)
+        for order, ds_info in enumerate(datasets):
+            if group is None or group[0] != order:
+                yield ds_info, iter(())
+                continue
+            yield ds_info, (summary.summary_from_json(item[2]) for item in group[1])
+            group = next(groups, None)
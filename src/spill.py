@@ -0,0 +1,132 @@
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+import src.globals as g
+import supervisely as sly
+
+
+def get_spill_dir() -> str:
+    return os.path.join(g.STORAGE_DIR, "spill")
+
+
+def is_enabled() -> bool:
+    return g.SPILL_MEMORY_MB > 0
+
+
+def get_buffer_bytes() -> int:
+    return int(g.SPILL_MEMORY_MB * 1024 * 1024)
+
+
+def reset():
+    """Remove files of the previous run. Files still mapped by its tables stay readable"""
+    sly.fs.remove_dir(get_spill_dir())
+
+
+def create_file(suffix: str) -> str:
+    sly.fs.mkdir(get_spill_dir())
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=get_spill_dir())
+    os.close(fd)
+    return path
+
+
+def to_disk(array: np.ndarray) -> np.ndarray:
+    """Write array to a spill file and return it memory-mapped read-only"""
+    path = create_file(".npy")
+    np.save(path, array)
+    return np.load(path, mmap_mode="r")
+
+
+def concatenate(arrays) -> np.ndarray:
+    """np.concatenate into a memory-mapped spill file, spill files of arrays are removed"""
+    arrays = list(arrays)
+    path = create_file(".npy")
+    shape = (sum(len(array) for array in arrays),)
+    result = np.lib.format.open_memmap(path, mode="w+", dtype=arrays[0].dtype, shape=shape)
+    start = 0
+    for array in arrays:
+        result[start : start + len(array)] = array
+        start += len(array)
+    result.flush()
+    del result
+    for array in arrays:
+        if isinstance(array, np.memmap):
+            sly.fs.silent_remove(array.filename)
+    return np.load(path, mmap_mode="r")
+
+
+class SpilledList:
+    """Append-only list kept on disk in chunks of pickled items.
+
+    Items are pickled on append and the buffer is written to a new chunk file when it
+    reaches buffer_bytes, so memory does not depend on the number of items. Iteration and
+    slices read the chunks one by one.
+    """
+
+    def __init__(self, buffer_bytes: int = None):
+        self.buffer_bytes = get_buffer_bytes() if buffer_bytes is None else buffer_bytes
+        # (path, items count) of every chunk
+        self.chunks = []
+        self._buffer = []
+        self._buffer_size = 0
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, item):
+        data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        self._length += 1
+        if self._buffer_size >= self.buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        if len(self._buffer) == 0:
+            return
+        path = create_file(".pkl")
+        with open(path, "wb") as file:
+            file.writelines(self._buffer)
+        self.chunks.append((path, len(self._buffer)))
+        self._buffer = []
+        self._buffer_size = 0
+
+    def iter_from(self, start: int = 0):
+        """Yield items starting from index start, skipping the chunks before it"""
+        chunk_start = 0
+        for path, count in self.chunks:
+            if chunk_start + count > start:
+                with open(path, "rb") as file:
+                    for idx in range(chunk_start, chunk_start + count):
+                        item = pickle.load(file)
+                        if idx >= start:
+                            yield item
+            chunk_start += count
+        for idx, data in enumerate(list(self._buffer), start=chunk_start):
+            if idx >= start:
+                yield pickle.loads(data)
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.stop is not None or index.step is not None:
+            raise TypeError("SpilledList supports only [start:] slices")
+        return _SpilledTail(self, index.start or 0)
+
+
+class _SpilledTail:
+    """Lazy SpilledList[start:] view"""
+
+    def __init__(self, items: SpilledList, start: int):
+        self.items = items
+        self.start = start
+
+    def __len__(self) -> int:
+        return max(len(self.items) - self.start, 0)
+
+    def __iter__(self):
+        return self.items.iter_from(self.start)
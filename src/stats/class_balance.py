@@ -1,22 +1,18 @@
-import json
-
-import pandas as pd
+import numpy as np
 
 import src.globals as g
 import supervisely as sly
+from src import perf
+from src.stats.table import get_split_table
 
 
 def get_total_frames_counts():
+    if g.SAMPLE is not None:
+        return g.SAMPLE.get_total_frames_counts()
     annotated_frames_totals = {ds_name: 0 for ds_name in g.ANNOTATED_FRAMES.keys()}
     for ds_name, videos_dict in g.ANNOTATED_FRAMES.items():
         for video_name, annotated_frames_by_objects_dict in videos_dict.items():
-            set_of_annotated_frames_for_video = set()
-            for object_frames_list in annotated_frames_by_objects_dict[g.BY_CLS_NAME].values():
-                set_of_annotated_frames_for_video = set_of_annotated_frames_for_video.union(
-                    set(object_frames_list)
-                )
-
-            annotated_frames_totals[ds_name] += len(set_of_annotated_frames_for_video)
+            annotated_frames_totals[ds_name] += annotated_frames_by_objects_dict[g.FRAMES]
     return annotated_frames_totals
 
 
@@ -36,9 +32,8 @@ def update_totals_by_datasets(dsname2total, total_row, columns, column_base):
     return total_row
 
 
+@perf.timed("classes_table")
 def calculate_classes_stats(datasets_counts):
-    from src.functions import get_all_selected_ds_list
-
     table_options = {"fixColumns": 1, "pageSize": 10}
 
     if len(g.PROJECT_META.obj_classes) == 0:
@@ -57,17 +52,24 @@ def calculate_classes_stats(datasets_counts):
         columns.extend([f"total {name}" for name in column_base])
         columns_options.extend([{"subtitle": "in the project"} for name in column_base])
 
-    for dataset in g.api.dataset.get_list(g.PROJECT.id, recursive=True):
-        if g.DATASET_ID is not None and dataset.id not in get_all_selected_ds_list(
-            g.api, g.DATASET_ID
-        ):
-            continue
-
+    for dataset in g.DATASET_TREE.get_selected():
         columns.extend(column_base)
         columns_options.extend(
             [{"subtitle": f"in '{dataset.name}' dataset"} for name in column_base]
         )
 
+    margins = None
+    if g.SAMPLE is not None:
+        # confidence intervals of the estimated counts in the project
+        margins = g.SAMPLE.get_margins()
+        columns.extend([f"± {name}" for name in column_base])
+        columns_options.extend(
+            [
+                {"subtitle": "95% confidence interval", "tooltip": f"estimated {name} ± margin"}
+                for name in column_base
+            ]
+        )
+
     data = []
     for idx, obj_class in enumerate(g.PROJECT_META.obj_classes):
         obj_class: sly.ObjClass
@@ -82,19 +84,20 @@ def calculate_classes_stats(datasets_counts):
                 row[2] += ds_objects[name]
                 row[3] += ds_figures[name]
                 row[4] += ds_frames.get(name, 0)
+        if margins is not None:
+            row.extend(margins[idx])
         data.append(row)
 
-    df = pd.DataFrame(data, columns=columns)
-    total_row = list(df.sum(axis=0))
-    total_row[0] = len(df)
-    total_row[1] = "Total"
+    counts = np.array([row[2:] for row in data], dtype=np.int64).reshape(len(data), -1)
+    total_row = [len(data), "Total", *counts.sum(axis=0).tolist()]
 
     dsname2total = get_total_frames_counts()
     total_row = update_totals_by_datasets(dsname2total, total_row, columns, column_base)
-    df.loc[len(df)] = total_row
+    if margins is not None:
+        total_row[-len(column_base) :] = margins[-1]
     data.append(total_row)
 
-    result = json.loads(df.to_json(orient="split"))
+    result = get_split_table(columns, data)
     result.update({"columnsOptions": columns_options, "options": table_options})
 
     return result
@@ -0,0 +1,213 @@
+from itertools import islice
+
+import numpy as np
+
+from src import spill
+
+# rows are converted to columns in batches of about this number of values
+APPEND_BATCH_VALUES = 2**20
+
+
+class ColumnStore:
+    """Table rows kept on the server as numpy columns with sorted access, filtering and paging.
+
+    Numeric columns are float64 arrays with NaN for missing values. Other columns are
+    dictionary encoded: int32 codes into the list of unique column values. Rows can be appended
+    in chunks, columns are concatenated lazily on the first query. With spill_to_disk columns
+    and sort indexes are memory-mapped spill files.
+    """
+
+    def __init__(
+        self, columns: list, numeric_columns=(), keys: dict = None, spill_to_disk: bool = False
+    ):
+        """
+        :param numeric_columns: names of columns with numbers or missing values
+        :param keys: column name -> function returning sort, search and filter key of a value
+        """
+        self.spill_to_disk = spill_to_disk
+        self.columns = list(columns)
+        self.numeric = [column in numeric_columns for column in self.columns]
+        self.keys = [(keys or {}).get(column) for column in self.columns]
+        self.rows_count = 0
+        self._chunks = [[] for _ in self.columns]
+        self._has_floats = [False] * len(self.columns)
+        self._has_missing = [False] * len(self.columns)
+        self._codes_by_value = [{} for _ in self.columns]
+        self._categories = [[] for _ in self.columns]
+        self._sorted_indexes = {}
+        self._selection = None
+
+    def __len__(self) -> int:
+        return self.rows_count
+
+    def append_rows(self, rows):
+        rows = iter(rows)
+        batch_size = max(APPEND_BATCH_VALUES // max(len(self.columns), 1), 1)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if len(batch) == 0:
+                break
+            self._append_batch(batch)
+
+    def _append_batch(self, rows):
+        columns_values = [[] for _ in self.columns]
+        for row in rows:
+            for values, value in zip(columns_values, row):
+                values.append(value)
+        rows_count = len(columns_values[0]) if len(self.columns) > 0 else 0
+        if rows_count == 0:
+            return
+
+        for col_idx, values in enumerate(columns_values):
+            if self.numeric[col_idx]:
+                types = set(map(type, values))
+                self._has_floats[col_idx] |= float in types
+                self._has_missing[col_idx] |= type(None) in types
+                array = np.array(
+                    [np.nan if value is None else value for value in values], dtype=np.float64
+                )
+            else:
+                codes_by_value = self._codes_by_value[col_idx]
+                array = np.fromiter(
+                    (codes_by_value.setdefault(value, len(codes_by_value)) for value in values),
+                    dtype=np.int32,
+                    count=rows_count,
+                )
+                self._categories[col_idx] = list(codes_by_value)
+            if self.spill_to_disk:
+                array = spill.to_disk(array)
+            self._chunks[col_idx].append(array)
+
+        self.rows_count += rows_count
+        self._sorted_indexes.clear()
+        self._selection = None
+
+    def _get_column(self, col_idx: int) -> np.ndarray:
+        chunks = self._chunks[col_idx]
+        if len(chunks) == 0:
+            return np.empty(0, dtype=np.float64 if self.numeric[col_idx] else np.int32)
+        if len(chunks) > 1:
+            chunks[:] = [
+                spill.concatenate(chunks) if self.spill_to_disk else np.concatenate(chunks)
+            ]
+        return chunks[0]
+
+    def _get_key(self, col_idx: int, value):
+        key = self.keys[col_idx]
+        if key is None or value is None:
+            return value
+        return key(value)
+
+    def _decode(self, col_idx: int, array: np.ndarray, exact_ints=False) -> list:
+        if not self.numeric[col_idx]:
+            categories = self._categories[col_idx]
+            return [categories[code] for code in array.tolist()]
+        # same as pandas: numbers with floats or missing values become floats
+        as_float = self._has_floats[col_idx] or (self._has_missing[col_idx] and not exact_ints)
+        return [
+            None if value != value else value if as_float else int(value)
+            for value in array.tolist()
+        ]
+
+    def get_rows(self, indexes, exact_ints=False) -> list:
+        """Return rows by indexes.
+
+        :param exact_ints: keep integer columns ints next to missing values, so values do not
+            depend on rows appended later
+        """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        columns_values = [
+            self._decode(col_idx, self._get_column(col_idx)[indexes], exact_ints)
+            for col_idx in range(len(self.columns))
+        ]
+        return [list(row) for row in zip(*columns_values)]
+
+    def iter_rows(self, batch_size: int = 65536):
+        for start in range(0, self.rows_count, batch_size):
+            yield from self.get_rows(np.arange(start, min(start + batch_size, self.rows_count)))
+
+    def get_values(self, column: str) -> list:
+        """Return sorted unique keys of column values"""
+        col_idx = self.columns.index(column)
+        keys = {self._get_key(col_idx, value) for value in self._categories[col_idx]}
+        return sorted(key for key in keys if key is not None)
+
+    def _get_sorted_indexes(self, col_idx: int):
+        """Return stable ascending order of rows by column and number of missing values in the end"""
+        if col_idx in self._sorted_indexes:
+            return self._sorted_indexes[col_idx]
+        column = self._get_column(col_idx)
+        if self.numeric[col_idx]:
+            sort_values = column
+            missing_count = int(np.isnan(column).sum())
+        else:
+            keys = [self._get_key(col_idx, value) for value in self._categories[col_idx]]
+            order = sorted(range(len(keys)), key=lambda code: (keys[code] is None, keys[code]))
+            ranks = np.empty(len(keys), dtype=np.int32)
+            ranks[order] = np.arange(len(keys), dtype=np.int32)
+            sort_values = ranks[column]
+            missing_codes = [code for code, key in enumerate(keys) if key is None]
+            missing_count = int(np.isin(column, missing_codes).sum())
+        sorted_indexes = np.argsort(sort_values, kind="stable")
+        if self.spill_to_disk:
+            sorted_indexes = spill.to_disk(sorted_indexes)
+        self._sorted_indexes[col_idx] = (sorted_indexes, missing_count)
+        return self._sorted_indexes[col_idx]
+
+    def _get_matching_codes(self, col_idx: int, match) -> list:
+        return [
+            code
+            for code, value in enumerate(self._categories[col_idx])
+            if match(self._get_key(col_idx, value))
+        ]
+
+    def _get_mask(self, filters: dict, search: str) -> np.ndarray:
+        mask = np.ones(self.rows_count, dtype=bool)
+        for column, value in (filters or {}).items():
+            if value is None or value == "":
+                continue
+            col_idx = self.columns.index(column)
+            codes = self._get_matching_codes(col_idx, lambda key: key == value)
+            mask &= np.isin(self._get_column(col_idx), codes)
+
+        if search:
+            try:
+                number = float(search)
+            except ValueError:
+                number = None
+            found = np.zeros(self.rows_count, dtype=bool)
+            for col_idx in range(len(self.columns)):
+                column = self._get_column(col_idx)
+                if not self.numeric[col_idx]:
+                    codes = self._get_matching_codes(
+                        col_idx, lambda key: key is not None and search in str(key)
+                    )
+                    found |= np.isin(column, codes)
+                elif number is not None:
+                    found |= column == number
+            mask &= found
+        return mask
+
+    def select(self, filters: dict = None, search: str = "", sort_column_idx=None, order=None):
+        """Return indexes of filtered rows in the sort order.
+
+        The result of the last query is cached, so paging through it costs only the page slice.
+        """
+        query = (tuple(sorted((filters or {}).items())), search, sort_column_idx, order)
+        if self._selection is not None and self._selection[0] == query:
+            return self._selection[1]
+
+        mask = self._get_mask(filters, search)
+        if sort_column_idx is None or order is None or sort_column_idx >= len(self.columns):
+            indexes = np.flatnonzero(mask)
+        else:
+            sorted_indexes, missing_count = self._get_sorted_indexes(sort_column_idx)
+            if order == "desc":
+                # missing values stay in the end as pandas does
+                present_count = self.rows_count - missing_count
+                sorted_indexes = np.concatenate(
+                    [sorted_indexes[:present_count][::-1], sorted_indexes[present_count:]]
+                )
+            indexes = sorted_indexes[mask[sorted_indexes]]
+        self._selection = (query, indexes)
+        return indexes
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+import numpy as np
+
+import src.globals as g
+import supervisely as sly
+from src import perf
+from src.stats.table import get_split_table
+
+# bytes of unpacked frames per matrix product, bounds memory for long videos with many classes
+PAIRS_CHUNK_BYTES = 2**24
+# float32 sums of zeros and ones are exact below 2**24 frames
+FLOAT32_MAX_FRAMES = 2**24
+TABLE_OPTIONS = {"fixColumns": 1, "pageSize": 10}
+
+
+def get_class_indexes() -> dict:
+    """Return class name -> index in project meta, pairs are ordered by it"""
+    return {obj_class.name: idx for idx, obj_class in enumerate(g.PROJECT_META.obj_classes)}
+
+
+def count_pairs_frames(class_frames: dict, class_indexes: dict) -> dict:
+    """Return number of frames with both classes for every pair of classes of a video.
+
+    Class frames are packed bitmaps (FrameSet). Only bytes with frames of two or more classes
+    are unpacked, so the cost depends on frames where classes overlap rather than on the video
+    length. Frames of all pairs are counted at once as a product of the class-frame matrix with
+    itself (sum of ANDs of every pair), in chunks of frames.
+
+    :param class_frames: class name -> FrameSet
+    :param class_indexes: class name -> index in project meta
+    :return: (class index, class index) -> frames count, only pairs that meet on some frame
+    """
+    names = sorted(
+        (name for name in class_frames if name in class_indexes), key=class_indexes.__getitem__
+    )
+    if len(names) < 2:
+        return {}
+    width = max(len(class_frames[name].bits) for name in names)
+    bits = np.zeros((len(names), width), dtype=np.uint8)
+    for idx, name in enumerate(names):
+        frame_bits = class_frames[name].bits
+        bits[idx, : len(frame_bits)] = frame_bits
+    bits = bits[:, np.count_nonzero(bits, axis=0) >= 2]
+    if bits.shape[1] == 0:
+        return {}
+
+    dtype = np.float32 if bits.shape[1] * 8 < FLOAT32_MAX_FRAMES else np.float64
+    pairs_frames = np.zeros((len(names), len(names)), dtype=dtype)
+    step = max(PAIRS_CHUNK_BYTES // (len(names) * np.dtype(dtype).itemsize * 8), 1)
+    for start in range(0, bits.shape[1], step):
+        frames = np.unpackbits(bits[:, start : start + step], axis=1).astype(dtype)
+        pairs_frames += frames @ frames.T
+
+    first, second = np.triu_indices(len(names), k=1)
+    counts = pairs_frames[first, second].astype(np.int64)
+    nonzero = np.flatnonzero(counts)
+    indexes = [class_indexes[name] for name in names]
+    return {
+        (indexes[first[idx]], indexes[second[idx]]): count
+        for idx, count in zip(nonzero.tolist(), counts[nonzero].tolist())
+    }
+
+
+@perf.timed("cooccurrence")
+def add_video_pairs(ds_pairs: defaultdict, class_frames: dict, class_indexes: dict):
+    """Add pairs frames of a video to dataset counters"""
+    for pair, count in count_pairs_frames(class_frames, class_indexes).items():
+        ds_pairs[pair] += count
+
+
+@perf.timed("cooccurrence_table")
+def calculate_cooccurrence_stats(datasets_pairs: dict = None):
+    """Return table of class pairs that appear on the same frames in the format of
+    FastTable.read_json. Pairs that never meet are not in the table.
+
+    In sampled runs frames of every dataset are scaled up by its sample weight, the same
+    way as the class counts.
+
+    :param datasets_pairs: dataset name -> {(class index, class index): frames count},
+        g.CLASS_PAIRS by default
+    """
+    datasets_pairs = g.CLASS_PAIRS if datasets_pairs is None else datasets_pairs
+    obj_classes = list(g.PROJECT_META.obj_classes)
+    weights = {} if g.SAMPLE is None else g.SAMPLE.get_weights()
+    tooltip = "frames with both classes"
+    if g.SAMPLE is not None:
+        tooltip = "estimated frames with both classes"
+
+    columns = ["#", "class", "paired class"]
+    columns_options = [{}, {"type": "class"}, {"type": "class"}]
+    if g.DATASET_ID is None:
+        columns.append("total frames")
+        columns_options.append({"subtitle": "in the project", "tooltip": tooltip})
+    for ds_name in datasets_pairs:
+        columns.append("frames")
+        columns_options.append({"subtitle": f"in '{ds_name}' dataset", "tooltip": tooltip})
+
+    pairs = sorted(set().union(*datasets_pairs.values()))
+    data = []
+    for idx, (first, second) in enumerate(pairs):
+        ds_counts = [
+            int(round(ds_pairs.get((first, second), 0) * weights.get(ds_name, 1)))
+            for ds_name, ds_pairs in datasets_pairs.items()
+        ]
+        row = [idx, obj_classes[first].name, obj_classes[second].name]
+        if g.DATASET_ID is None:
+            row.append(sum(ds_counts))
+        data.append(row + ds_counts)
+    sly.logger.debug(f"{len(data)} pairs of {len(obj_classes)} classes appear together")
+
+    result = get_split_table(columns, data)
+    result.update({"columnsOptions": columns_options, "options": dict(TABLE_OPTIONS)})
+    return result
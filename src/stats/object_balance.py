@@ -1,9 +1,50 @@
-import json
-
-import pandas as pd
-
 import src.globals as g
 import supervisely as sly
+from src import frame_ranges, perf, spill
+from src.stats.column_store import ColumnStore
+from src.stats.table import get_split_table
+
+# columns that may contain floats or missing values
+NUMERIC_COLUMNS = [
+    "#",
+    "video frames",
+    "frames",
+    "presence in video",
+    "count",
+    "first frame",
+    "last frame",
+    "runs",
+    "longest gap",
+    "average gap",
+    "average area",
+    "min area",
+    "median area",
+    "max area",
+    "average width",
+    "average height",
+]
+# columns of g.GEOMETRY_STATS, cells of GeometryStats follow the frame size
+GEOMETRY_COLUMNS = [
+    ("frame size", {"subtitle": "width x height"}),
+    (
+        "average area",
+        {"subtitle": "pixels", "postfix": "px", "tooltip": "average area of object figures"},
+    ),
+    ("min area", {"subtitle": "pixels", "postfix": "px"}),
+    ("median area", {"subtitle": "pixels", "postfix": "px"}),
+    ("max area", {"subtitle": "pixels", "postfix": "px"}),
+    (
+        "average width",
+        {"subtitle": "pixels", "postfix": "px", "tooltip": "average bounding box width"},
+    ),
+    (
+        "average height",
+        {"subtitle": "pixels", "postfix": "px", "tooltip": "average bounding box height"},
+    ),
+]
+TABLE_OPTIONS = {"fixColumns": 1, "pageSize": 10}
+VIDEO_COLUMN_IDX = 4
+FIRST_FRAME_COLUMN_IDX = 10
 
 
 def prepare_video_name_with_link(video_info, frame):
@@ -28,55 +69,23 @@ def seconds_to_time(seconds):
     return f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
 
 
-def calculate_video_tags_stats(video_info, video_ann, project_meta):
-    """Calculate stats for video-level frame-based tags"""
-    tag_stats = {}
-
-    # Get video-level tags
-    for tag in video_ann.tags:
-        tag_name = tag.meta.name
-
-        if tag_name not in tag_stats:
-            tag_stats[tag_name] = {
-                "total_frames": 0,
-                "frame_ranges": [],
-                "first_frame": None,
-                "last_frame": None,
-            }
-
-        # Count frames for this tag
-        if tag.frame_range is not None:
-            # Tag has a frame range
-            start_frame = tag.frame_range[0]
-            end_frame = tag.frame_range[1]
-            frame_count = end_frame - start_frame + 1
-            tag_stats[tag_name]["total_frames"] += frame_count
-            tag_stats[tag_name]["frame_ranges"].append((start_frame, end_frame))
-
-            # Update first and last frame
-            if (
-                tag_stats[tag_name]["first_frame"] is None
-                or start_frame < tag_stats[tag_name]["first_frame"]
-            ):
-                tag_stats[tag_name]["first_frame"] = start_frame
-            if (
-                tag_stats[tag_name]["last_frame"] is None
-                or end_frame > tag_stats[tag_name]["last_frame"]
-            ):
-                tag_stats[tag_name]["last_frame"] = end_frame
-        else:
-            # Tag applies to entire video or single frame
-            tag_stats[tag_name]["total_frames"] += video_info.frames_count
-            if tag_stats[tag_name]["first_frame"] is None:
-                tag_stats[tag_name]["first_frame"] = 0
-            tag_stats[tag_name]["last_frame"] = video_info.frames_count - 1
+def calculate_video_tags_stats(video_info, video_tags, project_meta):
+    """Calculate stats for video-level frame-based tags.
 
-    return tag_stats
+    Frame ranges of the same tag are merged, so overlapping ranges are counted once.
+    Tags without frame range cover the whole video.
 
+    :return: tag name -> RangesCoverage
+    """
+    whole_video = (0, (video_info.frames_count or 0) - 1)
+    return frame_ranges.get_ranges_coverage(
+        [tag.name for tag in video_tags],
+        [tag.frame_range if tag.frame_range is not None else whole_video for tag in video_tags],
+    )
 
-def calculate_objects_stats(videos_counts, need_to_add_tags=False):
-    table_options = {"fixColumns": 1, "pageSize": 10}
 
+def get_objects_columns(need_to_add_tags=False):
+    """Return objects table columns and columns options"""
     columns = [
         "#",
         "type",  # Changed from "class" to "type" to accommodate both objects and tags
@@ -90,12 +99,9 @@ def calculate_objects_stats(videos_counts, need_to_add_tags=False):
         "count",  # Changed from "figures" to "count occurencies"
         "first frame",
         "last frame",
-        # "frame size",
-        # "average area",
-        # "average width",
-        # "average width",
-        # "average height",
-        # "average height",
+        "runs",
+        "longest gap",
+        "average gap",
     ]
     columns_options = [
         {},
@@ -118,137 +124,284 @@ def calculate_objects_stats(videos_counts, need_to_add_tags=False):
         {"subtitle": "number of occurrences", "postfix": "occurrences"},  # Updated postfix
         {"subtitle": "frame index", "tooltip": "first frame index with current object"},
         {"subtitle": "frame index", "tooltip": "last frame index with current object"},
+        {"subtitle": "count", "tooltip": "number of continuous frame ranges with current object"},
+        {
+            "subtitle": "frames",
+            "postfix": "frames",
+            "tooltip": "the longest range of frames without current object between its first "
+            "and last frames",
+        },
+        {
+            "subtitle": "frames",
+            "postfix": "frames",
+            "tooltip": "average number of frames between continuous ranges",
+        },
     ]
+    if g.GEOMETRY_STATS:
+        for column, options in GEOMETRY_COLUMNS:
+            columns.append(column)
+            columns_options.append(options)
 
     if need_to_add_tags:
-        for tagmeta in g.PROJECT_META.tag_metas:
-            if tagmeta.applicable_to != sly.TagApplicableTo.IMAGES_ONLY:
-                sly.logger.debug(f"Adding columns for tag: {tagmeta.name}")
-                columns.append(f"tag: {tagmeta.name} (object)")
-                sly.logger.debug(f"Added column for object property tag: {tagmeta.name}")
-                columns_options.append({"subtitle": "object property tag", "postfix": "tagged"})
-                columns.append(f"tag: {tagmeta.name} (frames)")
-                columns_options.append({"subtitle": "object frame tag", "postfix": "frames"})
-
-    data = []
-    object_id = 1
+        for tagmeta in get_video_tag_metas():
+            sly.logger.debug(f"Adding columns for tag: {tagmeta.name}")
+            columns.append(f"tag: {tagmeta.name} (object)")
+            sly.logger.debug(f"Added column for object property tag: {tagmeta.name}")
+            columns_options.append({"subtitle": "object property tag", "postfix": "tagged"})
+            columns.append(f"tag: {tagmeta.name} (frames)")
+            columns_options.append({"subtitle": "object frame tag", "postfix": "frames"})
+    return columns, columns_options
+
+
+def get_video_tag_metas():
+    """Return project tag metas that have columns in the objects table"""
+    return [
+        tag_meta
+        for tag_meta in g.PROJECT_META.tag_metas
+        if tag_meta.applicable_to != sly.TagApplicableTo.IMAGES_ONLY
+    ]
+
+
+def get_object_tags_cells(obj_tags, tag_metas_index, empty_tags_cells):
+    """Return (object, frames) cells for every tag meta column.
+
+    Only cells of the object tags are filled, so the cost does not depend on tag metas count.
+    Frames cells list merged frame ranges of the tag.
+
+    :param tag_metas_index: tag name -> (cell index, tag meta)
+    """
+    cells = list(empty_tags_cells)
+    ranges_cells, ranges = [], []
+    for tag in obj_tags:
+        if tag.name not in tag_metas_index:
+            continue
+        cell_idx, tag_meta = tag_metas_index[tag.name]
+        if tag.frame_range is None:
+            txt = "✅"
+            if tag_meta.value_type != sly.TagValueType.NONE:
+                txt = txt + f" value: {tag.value}"
+            cells[cell_idx] = txt
+        else:
+            ranges_cells.append(cell_idx + 1)
+            ranges.append(tag.frame_range)
+    if len(set(ranges_cells)) == len(ranges_cells):
+        # nothing to merge
+        for cell_idx, (start, end) in zip(ranges_cells, ranges):
+            cells[cell_idx] = f"{start}-{end}"
+        return cells
+    for cell_idx, coverage in frame_ranges.get_ranges_coverage(ranges_cells, ranges).items():
+        cells[cell_idx] = ", ".join(f"{start}-{end}" for start, end in coverage.ranges)
+    return cells
+
+
+def get_track_cells(frames, first_frame, last_frame, runs, max_gap) -> list:
+    """Return runs, the longest and average gap cells of a track"""
+    if runs is None:
+        return [None, None, None]
+    average_gap = 0
+    if runs > 1:
+        average_gap = round((last_frame - first_frame + 1 - frames) / (runs - 1), 2)
+    return [runs, max_gap, average_gap]
+
+
+def get_geometry_cells(video_info, geometry_stats) -> list:
+    """Return frame size and GeometryStats cells, empty for objects without area"""
+    frame_size = ""
+    if video_info.frame_size is not None:
+        height, width = video_info.frame_size
+        frame_size = f"{width}x{height}"
+    if geometry_stats is None:
+        return [frame_size] + [None] * (len(GEOMETRY_COLUMNS) - 1)
+    return [frame_size, *geometry_stats]
+
+
+def get_video_name(video_info, frame):
+    return video_info.name
+
+
+def get_video_record(video_info, frame):
+    return video_info
+
+
+def iter_objects_rows(
+    videos_counts, need_to_add_tags=False, video_cell=prepare_video_name_with_link, first_id=1
+):
+    """Yield objects table rows built from video summaries.
+
+    :param video_cell: function(video_info, frame) returning the video column value,
+        html link to the labeling tool by default
+    :param first_id: value of "#" column of the first row
+    """
+
+    tag_metas = get_video_tag_metas() if need_to_add_tags else []
+    tag_metas_index = {tag_meta.name: (2 * idx, tag_meta) for idx, tag_meta in enumerate(tag_metas)}
+    empty_tags_cells = ["", ""] * len(tag_metas)
+
+    object_id = first_id
     for ds_name, videos_list in videos_counts.items():
-        print(f"Processing dataset: {ds_name}")
-        for (
-            video_info,
-            objkey2class,
-            objkey2frames_cnt,
-            objkey2tags,
-            obj_figures,
-            video_ann,
-        ) in videos_list:
+        sly.logger.debug(f"Processing dataset: {ds_name}")
+        for video_summary in videos_list:
+            video_info = video_summary.video
             # Process objects
-            for obj_key, annotated_frames_count in objkey2frames_cnt.items():
-                obj_figures_count = obj_figures[obj_key]
-                try:
-                    obj_class_name = objkey2class[obj_key]
-                except KeyError:
-                    extra_info = {"objkey2class": objkey2class, "video name": video_info.name}
-                    sly.logger.warning(
-                        "Object class with key {} not found. Skipping...".format(obj_key),
-                        extra=extra_info,
-                    )
-                    continue
+            for obj in video_summary.objects:
                 row = [
                     object_id,  # obj_key,
                     "Object",  # Type
-                    obj_class_name,
+                    obj.class_name,
                     ds_name,
-                    prepare_video_name_with_link(video_info, annotated_frames_count[1]),
+                    video_cell(video_info, obj.first_frame),
                     seconds_to_time(video_info.duration),
                     video_info.frames_count,
-                    annotated_frames_count[0],
-                    round(obj_figures_count / video_info.frames_count * 100, 2),
-                    obj_figures_count,
-                    annotated_frames_count[1],
-                    annotated_frames_count[2],
+                    obj.frames,
+                    round(obj.figures / video_info.frames_count * 100, 2),
+                    obj.figures,
+                    obj.first_frame,
+                    obj.last_frame,
+                    *get_track_cells(
+                        obj.frames, obj.first_frame, obj.last_frame, obj.runs, obj.max_gap
+                    ),
                 ]
+                if g.GEOMETRY_STATS:
+                    row.extend(get_geometry_cells(video_info, obj.geometry))
                 if need_to_add_tags:
-                    for tag_meta in g.PROJECT_META.tag_metas:
-                        if tag_meta.applicable_to != sly.TagApplicableTo.IMAGES_ONLY:
-                            object_tag = ""
-                            frame_ranges_tags = []
-                            tags = objkey2tags[obj_key].get_by_name(tag_meta.name)
-                            if len(tags) == 0:
-                                row.append("")
-                                row.append("")
-                                continue
-                            for tag in tags:
-                                if tag.frame_range is None:
-                                    txt = "✅"
-                                    if tag_meta.value_type != sly.TagValueType.NONE:
-                                        txt = txt + f" value: {tag.value}"
-                                    object_tag = txt
-                                else:
-                                    frame_ranges_tags.append(
-                                        f"{tag.frame_range[0]}-{tag.frame_range[1]}"
-                                    )
-                            row.append(object_tag)
-                            if len(frame_ranges_tags) > 0:
-                                row.append(", ".join(frame_ranges_tags))
-                            else:
-                                row.append("")
-
-                data.append(row)
+                    if len(obj.tags) == 0:
+                        row.extend(empty_tags_cells)
+                    else:
+                        row.extend(
+                            get_object_tags_cells(obj.tags, tag_metas_index, empty_tags_cells)
+                        )
+
+                yield row
                 object_id += 1
 
             # Process video-level tags
             try:
                 sly.logger.debug(f"Calculating video-level tags for video '{video_info.name}'")
-                video_tag_stats = calculate_video_tags_stats(video_info, video_ann, g.PROJECT_META)
+                video_tag_stats = calculate_video_tags_stats(
+                    video_info, video_summary.tags, g.PROJECT_META
+                )
                 sly.logger.debug(
                     f"Found {len(video_tag_stats)} video-level tags for video '{video_info.name}'"
                 )
 
-                for tag_name, tag_data in video_tag_stats.items():
+                for tag_name, coverage in video_tag_stats.items():
+                    first_frame = coverage.first_frame if coverage.first_frame is not None else 0
                     tag_row = [
                         object_id,
                         "Video Tag",  # Type
                         tag_name,
                         ds_name,
-                        prepare_video_name_with_link(
-                            video_info,
-                            tag_data["first_frame"] if tag_data["first_frame"] is not None else 0,
-                        ),
+                        video_cell(video_info, first_frame),
                         seconds_to_time(video_info.duration),
                         video_info.frames_count,
-                        tag_data["total_frames"],
+                        coverage.frames,
                         (
-                            round(tag_data["total_frames"] / video_info.frames_count * 100, 2)
+                            round(coverage.frames / video_info.frames_count * 100, 2)
                             if video_info.frames_count > 0
                             else 0
                         ),
+                        coverage.count,  # Number of tag instances
+                        first_frame,
                         (
-                            len(tag_data["frame_ranges"]) if tag_data["frame_ranges"] else 1
-                        ),  # Number of tag instances
-                        tag_data["first_frame"] if tag_data["first_frame"] is not None else 0,
-                        (
-                            tag_data["last_frame"]
-                            if tag_data["last_frame"] is not None
+                            coverage.last_frame
+                            if coverage.last_frame is not None
                             else video_info.frames_count - 1
                         ),
+                        *get_track_cells(
+                            coverage.frames,
+                            coverage.first_frame,
+                            coverage.last_frame,
+                            *frame_ranges.get_ranges_gaps(coverage.ranges),
+                        ),
                     ]
+                    if g.GEOMETRY_STATS:
+                        tag_row.extend(get_geometry_cells(video_info, None))
 
                     if need_to_add_tags:
-                        for tag_meta in g.PROJECT_META.tag_metas:
-                            if tag_meta.applicable_to != sly.TagApplicableTo.IMAGES_ONLY:
-                                tag_row.append("")  # Video tags don't have object-level tags
-                                tag_row.append("")
+                        # Video tags don't have object-level tags
+                        tag_row.extend(empty_tags_cells)
 
-                    data.append(tag_row)
+                    yield tag_row
                     object_id += 1
             except Exception as e:
                 sly.logger.warning(f"Failed to process video tags for video {video_info.name}: {e}")
                 continue
 
-    df = pd.DataFrame(data, columns=columns)
 
-    result = json.loads(df.to_json(orient="split"))
-    result.update({"columnsOptions": columns_options, "options": table_options})
+def create_objects_store(need_to_add_tags=False) -> ColumnStore:
+    """Create empty objects table kept on the server. Video column holds video records,
+    links are made only for the rows that are shown (see format_objects_rows).
+    """
+    columns, _ = get_objects_columns(need_to_add_tags)
+    return ColumnStore(
+        columns,
+        NUMERIC_COLUMNS,
+        keys={"video": get_video_name_key},
+        spill_to_disk=spill.is_enabled(),
+    )
+
+
+@perf.timed("objects_table")
+def append_objects_rows(objects_store, videos_counts, need_to_add_tags, appended: dict) -> bool:
+    """Append rows of video summaries that are not in the store yet.
+
+    :param appended: dataset name -> number of video summaries in the store, updated in place
+    :return: False if rows were appended after rows of the next dataset (datasets with the same
+        name), so the rows order differs from calculate_objects_store
+    """
+    in_order = True
+    for ds_name, videos_list in videos_counts.items():
+        appended_count = appended.get(ds_name, 0)
+        if appended_count == len(videos_list):
+            continue
+        if ds_name in appended and ds_name != list(appended)[-1]:
+            in_order = False
+        rows = iter_objects_rows(
+            {ds_name: videos_list[appended_count:]},
+            need_to_add_tags,
+            get_video_record,
+            first_id=len(objects_store) + 1,
+        )
+        objects_store.append_rows(rows)
+        # the last appended dataset is the last key
+        appended.pop(ds_name, None)
+        appended[ds_name] = len(videos_list)
+    return in_order
+
+
+def calculate_objects_store(videos_counts, need_to_add_tags=False) -> ColumnStore:
+    objects_store = create_objects_store(need_to_add_tags)
+    append_objects_rows(objects_store, videos_counts, need_to_add_tags, {})
+    return objects_store
+
+
+def get_video_name_key(video_info):
+    return video_info.name
+
+
+def format_objects_rows(rows):
+    """Replace video records with labeling tool links to the first frame in place"""
+    for row in rows:
+        first_frame = row[FIRST_FRAME_COLUMN_IDX]
+        row[VIDEO_COLUMN_IDX] = prepare_video_name_with_link(
+            row[VIDEO_COLUMN_IDX], int(first_frame) if first_frame is not None else None
+        )
+    return rows
+
+
+@perf.timed("objects_table_json")
+def get_objects_table(objects_store: ColumnStore, need_to_add_tags=False):
+    """Return objects table in the format of FastTable.read_json"""
+    _, columns_options = get_objects_columns(need_to_add_tags)
+    data = format_objects_rows(objects_store.get_rows(range(len(objects_store))))
+
+    result = get_split_table(objects_store.columns, data, NUMERIC_COLUMNS)
+    result.update({"columnsOptions": columns_options, "options": dict(TABLE_OPTIONS)})
 
     return result
+
+
+def calculate_objects_stats(videos_counts, need_to_add_tags=False):
+    return get_objects_table(
+        calculate_objects_store(videos_counts, need_to_add_tags), need_to_add_tags
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+
+import src.globals as g
+from src import perf
+
+TEMPORAL_COLUMNS = ["dataset", "video", "class", "frames"]
+
+
+def get_temporal_file_name(fmt: str) -> str:
+    """Rows are per video, so a sampled run has rows of the sampled videos only"""
+    if g.SAMPLE is not None:
+        return f"temporal_histogram_sample.{fmt}"
+    return f"temporal_histogram.{fmt}"
+
+
+def get_bins_columns(bins: int) -> list:
+    """Names of histogram columns as parts of the video, e.g. 0-10%, 10-20% for 10 bins"""
+    return [f"{100 * idx // bins}-{100 * (idx + 1) // bins}%" for idx in range(bins)]
+
+
+def get_temporal_columns(bins: int = None) -> list:
+    bins = g.TEMPORAL_BINS if bins is None else bins
+    return TEMPORAL_COLUMNS + get_bins_columns(bins)
+
+
+def get_temporal_columns_types(bins: int = None) -> dict:
+    columns = get_temporal_columns(bins)
+    return {column: "int64" for column in columns if column not in ("dataset", "video", "class")}
+
+
+@perf.timed("temporal_histogram")
+def count_classes_bins(class_frames: dict, frames_count: int, bins: int):
+    """Return annotated frames of every class of a video in equal parts of the video.
+
+    Frame indexes of all classes are binned at once with a single bincount.
+
+    :param class_frames: class name -> FrameSet
+    :param frames_count: number of video frames, frames past it fall into the last bin
+    :return: class names and array of shape (classes, bins)
+    """
+    names = list(class_frames)
+    indexes = [class_frames[name].to_indexes() for name in names]
+    sizes = [len(name_indexes) for name_indexes in indexes]
+    if sum(sizes) == 0:
+        return names, np.zeros((len(names), bins), dtype=np.int64)
+    frames = np.concatenate(indexes)
+    frames_count = max(frames_count or 0, int(frames.max()) + 1)
+    frame_bins = np.minimum(frames * bins // frames_count, bins - 1)
+    groups = np.repeat(np.arange(len(names)), sizes)
+    counts = np.bincount(groups * bins + frame_bins, minlength=len(names) * bins)
+    return names, counts.reshape(len(names), bins)
+
+
+def iter_temporal_rows(videos_counts, bins: int = None):
+    """Yield dataset, video, class, annotated frames and frames in every part of the video
+    for every class of every video
+    """
+    bins = g.TEMPORAL_BINS if bins is None else bins
+    for ds_name, videos_list in videos_counts.items():
+        for video_summary in videos_list:
+            video_info = video_summary.video
+            names, counts = count_classes_bins(
+                video_summary.class_frames, video_info.frames_count, bins
+            )
+            for name, class_counts in zip(names, counts.tolist()):
+                yield [ds_name, video_info.name, name, sum(class_counts), *class_counts]
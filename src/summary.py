@@ -0,0 +1,187 @@
+from collections import namedtuple
+
+import supervisely as sly
+from src.frame_set import FrameSet
+from src.geometry import GeometryStats
+
+# compact per-video records: annotations are released right after they are summarized
+# frame_size - (height, width) of video frames
+VideoRecord = namedtuple(
+    "VideoRecord",
+    ["id", "name", "dataset_id", "frames_count", "duration", "updated_at", "frame_size"],
+    defaults=[None],
+)
+TagRecord = namedtuple("TagRecord", ["name", "value", "frame_range"])
+# geometry - GeometryStats of the object figures or None,
+# runs - number of contiguous frame ranges of the object, max_gap - the longest gap between them
+ObjectRecord = namedtuple(
+    "ObjectRecord",
+    [
+        "key",
+        "class_name",
+        "figures",
+        "frames",
+        "first_frame",
+        "last_frame",
+        "tags",
+        "geometry",
+        "runs",
+        "max_gap",
+    ],
+    defaults=[None, None, None],
+)
+VideoSummary = namedtuple(
+    "VideoSummary",
+    ["video", "objects", "tags", "class_objects", "class_figures", "class_frames"],
+)
+
+
+def video_record(video_info, frame_size=None) -> VideoRecord:
+    return VideoRecord(
+        id=video_info.id,
+        name=video_info.name,
+        dataset_id=video_info.dataset_id,
+        frames_count=video_info.frames_count,
+        duration=video_info.duration,
+        updated_at=getattr(video_info, "updated_at", None),
+        frame_size=frame_size,
+    )
+
+
+def tag_records(tags) -> tuple:
+    """Convert VideoTagCollection to tuple of TagRecord"""
+    return tuple(
+        TagRecord(
+            tag.meta.name,
+            tag.value,
+            tuple(tag.frame_range) if tag.frame_range is not None else None,
+        )
+        for tag in tags
+    )
+
+
+def tag_records_from_json(tags_json, tag_metas: sly.TagMetaCollection) -> tuple:
+    """Convert list of video tags in json format to tuple of TagRecord"""
+    records = []
+    for tag_json in tags_json:
+        if isinstance(tag_json, str):
+            tag_json = {"name": tag_json}
+        name = tag_json["name"]
+        if tag_metas.get(name) is None:
+            raise ValueError(f"Tag meta {name!r} was not found in the given project meta")
+        frame_range = tag_json.get("frameRange")
+        records.append(
+            TagRecord(
+                name,
+                tag_json.get("value"),
+                tuple(frame_range) if frame_range is not None else None,
+            )
+        )
+    return tuple(records)
+
+
+def summarize_video(
+    video_info,
+    objkey2classname,
+    objkey2frames_cnt,
+    objkey2tags,
+    obj_figures,
+    video_tags,
+    class_objects,
+    class_figures,
+    class_frames,
+    objkey2geometry=None,
+    frame_size=None,
+):
+    """Build VideoSummary from per-video counters.
+
+    :param objkey2classname: object key -> class name
+    :param objkey2frames_cnt: object key -> TrackStats
+    :param objkey2tags: object key -> tuple of TagRecord
+    :param obj_figures: object key -> figures count
+    :param video_tags: tuple of video-level TagRecord
+    :param class_objects: class name -> objects count
+    :param class_figures: class name -> figures count
+    :param class_frames: class name -> list of annotated frame indexes
+    :param objkey2geometry: object key -> GeometryStats
+    :param frame_size: (height, width) of video frames
+    """
+    objects = []
+    for obj_key, track in objkey2frames_cnt.items():
+        class_name = objkey2classname.get(obj_key)
+        if class_name is None:
+            extra_info = {"objkey2class": objkey2classname, "video name": video_info.name}
+            sly.logger.warning(
+                "Object class with key {} not found. Skipping...".format(obj_key),
+                extra=extra_info,
+            )
+            continue
+        objects.append(
+            ObjectRecord(
+                key=obj_key,
+                class_name=class_name,
+                figures=obj_figures[obj_key],
+                frames=track.frames,
+                first_frame=track.first_frame,
+                last_frame=track.last_frame,
+                tags=objkey2tags.get(obj_key, ()),
+                geometry=(objkey2geometry or {}).get(obj_key),
+                runs=track.runs,
+                max_gap=track.max_gap,
+            )
+        )
+    return VideoSummary(
+        video_record(video_info, frame_size),
+        tuple(objects),
+        video_tags,
+        dict(class_objects),
+        dict(class_figures),
+        {
+            class_name: FrameSet.from_indexes(indexes, video_info.frames_count or 0)
+            for class_name, indexes in class_frames.items()
+        },
+    )
+
+
+def summary_to_json(video_summary: VideoSummary) -> list:
+    """Convert VideoSummary to json-serializable list"""
+    return [
+        list(video_summary.video),
+        [
+            [*obj[:6], [list(tag) for tag in obj.tags], obj.geometry, obj.runs, obj.max_gap]
+            for obj in video_summary.objects
+        ],
+        [list(tag) for tag in video_summary.tags],
+        video_summary.class_objects,
+        video_summary.class_figures,
+        {name: frame_set.to_json() for name, frame_set in video_summary.class_frames.items()},
+    ]
+
+
+def _tag_from_json(data) -> TagRecord:
+    name, value, frame_range = data
+    return TagRecord(name, value, tuple(frame_range) if frame_range is not None else None)
+
+
+def summary_from_json(data) -> VideoSummary:
+    """Restore VideoSummary from the result of summary_to_json"""
+    video, objects, tags, class_objects, class_figures, class_frames = data
+    video = VideoRecord(*video)
+    if video.frame_size is not None:
+        video = video._replace(frame_size=tuple(video.frame_size))
+    return VideoSummary(
+        video,
+        tuple(
+            ObjectRecord(
+                *obj[:6],
+                tuple(_tag_from_json(tag) for tag in obj[6]),
+                GeometryStats(*obj[7]) if obj[7] is not None else None,
+                *obj[8:],
+            )
+            for obj in objects
+        ),
+        tuple(_tag_from_json(tag) for tag in tags),
+        class_objects,
+        class_figures,
+        {name: FrameSet.from_json(frame_set) for name, frame_set in class_frames.items()},
+    )
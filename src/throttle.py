@@ -0,0 +1,30 @@
+import time
+
+import src.globals as g
+
+
+class Throttle:
+    """Limits calls of a slow function (e.g. UI update) to a share of the total runtime"""
+
+    def __init__(self, max_share: float = None, min_interval: float = None):
+        self.max_share = g.LIVE_UPDATE_SHARE if max_share is None else max_share
+        self.min_interval = g.LIVE_UPDATE_INTERVAL if min_interval is None else min_interval
+        self.started_at = time.monotonic()
+        self.last_call_at = None
+        self.spent = 0.0
+        self.calls = 0
+
+    def is_ready(self) -> bool:
+        now = time.monotonic()
+        if self.last_call_at is not None and now - self.last_call_at < self.min_interval:
+            return False
+        return self.spent <= self.max_share * (now - self.started_at)
+
+    def call(self, func, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.last_call_at = time.monotonic()
+            self.spent += self.last_call_at - start
+            self.calls += 1
@@ -1,6 +1,45 @@
-from supervisely.app.widgets import Button, Card, Checkbox, Container, Progress, Text
+import src.globals as g
+from src import sampling
+from supervisely.app.widgets import (
+    Button,
+    Card,
+    Checkbox,
+    Container,
+    Field,
+    InputNumber,
+    Progress,
+    Text,
+)
 
 tags_checkbox = Checkbox("Add tags info to the report", checked=True)
+
+sample_checkbox = Checkbox(
+    "Approximate stats from a sample of videos", checked=sampling.is_enabled()
+)
+sample_share_input = InputNumber(
+    value=g.SAMPLE_SHARE * 100 or 10, min=0.1, max=100, step=1, precision=1
+)
+sample_time_input = InputNumber(value=g.SAMPLE_TIME_BUDGET, min=0, step=10)
+sample_fields = Container(
+    widgets=[
+        Field(
+            sample_share_input,
+            "Share of videos, %",
+            "random videos of every dataset, class counts are estimated for all videos",
+        ),
+        Field(
+            sample_time_input,
+            "Time budget, seconds",
+            "time to spend on sampled videos, 0 - no limit",
+        ),
+    ]
+)
+if not sampling.is_enabled():
+    sample_fields.hide()
+cache_checkbox = Checkbox(
+    "Keep stats cache, so the next exact run reuses processed videos", checked=g.CACHE_ENABLED
+)
+
 start_btn = Button("Start", button_size="mini")
 progress = Progress(hide_on_finish=False)
 text = Text(color="#697c8d")
@@ -8,8 +47,29 @@ text.hide()
 finish_text = Text("Please, finish the app after you are done.", status="info")
 finish_text.hide()
 
+settings = Container(widgets=[tags_checkbox, sample_checkbox, sample_fields, cache_checkbox])
+
 card = Card(
     title="Controls",
-    content=Container(widgets=[progress, tags_checkbox, text, finish_text]),
+    content=Container(widgets=[progress, settings, text, finish_text]),
     content_top_right=start_btn,
 )
+
+
+@sample_checkbox.value_changed
+def toggle_sampling(checked):
+    if not checked:
+        sample_fields.hide()
+        return
+    sample_fields.show()
+    # a sample is refined into exact stats through the cache
+    cache_checkbox.check()
+
+
+def apply_settings():
+    """Set sampling and cache settings of the run from the controls, they override env"""
+    g.SAMPLE_SHARE, g.SAMPLE_VIDEOS, g.SAMPLE_TIME_BUDGET = 0, 0, 0
+    if sample_checkbox.is_checked():
+        g.SAMPLE_SHARE = sample_share_input.get_value() / 100
+        g.SAMPLE_TIME_BUDGET = sample_time_input.get_value()
+    g.CACHE_ENABLED = cache_checkbox.is_checked()
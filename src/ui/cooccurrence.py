@@ -0,0 +1,9 @@
+from supervisely.app.widgets import Card, Container, FastTable
+
+fast_table = FastTable()
+
+card = Card(
+    title="Class Co-occurrence",
+    description="number of frames where two classes appear together",
+    content=Container(widgets=[fast_table]),
+)
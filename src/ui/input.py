@@ -1,12 +1,19 @@
 from supervisely.app.widgets import Card, Container, DatasetThumbnail, ProjectThumbnail
 
-import src.globals as g
-
-input_thumbnail = ProjectThumbnail(g.PROJECT)
-if g.DATASET is not None:
-    input_thumbnail = DatasetThumbnail(g.PROJECT, g.DATASET)
+project_thumbnail = ProjectThumbnail()
+dataset_thumbnail = DatasetThumbnail()
+dataset_thumbnail.hide()
 
 card = Card(
     title="Input",
-    content=Container(widgets=[input_thumbnail]),
+    content=Container(widgets=[project_thumbnail, dataset_thumbnail]),
 )
+
+
+def set_input(project_info, dataset_info=None):
+    if dataset_info is None:
+        project_thumbnail.set(project_info)
+        return
+    dataset_thumbnail.set(project_info, dataset_info)
+    project_thumbnail.hide()
+    dataset_thumbnail.show()
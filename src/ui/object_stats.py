@@ -1,9 +1,184 @@
-from supervisely.app.widgets import Card, Container, FastTable
+from importlib.metadata import version
+
+import src.globals as g
+from src.stats import object_balance
+from supervisely.app import DataJson, StateJson
+from supervisely.app.widgets import Card, Container, FastTable, Field, Select
+from supervisely.app.widgets_context import JinjaWidgets
+
+FILTER_COLUMNS = {"type": "Type", "name": "Class", "dataset": "Dataset", "video": "Video"}
+# ObjectsTable overrides FastTable internals (_refresh, _update_page, _validate_sort_attrs and
+# its attributes) and the widget scripts registry of this SDK version, the same version as in
+# dev_requirements.txt and the docker image in config.json. The table fails on other versions:
+# check the overrides with tests/test_objects_table.py and update the version with the SDK
+FAST_TABLE_SDK_VERSION = "6.73.440"
+
+
+class ObjectsTable(FastTable):
+    """FastTable serving pages of the objects ColumnStore kept on the server.
+
+    Only the rows of the active page are decoded and sent to the browser. Sorting uses the
+    store indexes, filters are {column: value} dicts. Public set_sort/set_search/set_filter
+    hooks of FastTable run on a pandas frame of all rows, so private methods are overridden,
+    see FAST_TABLE_SDK_VERSION.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if version("supervisely") != FAST_TABLE_SDK_VERSION:
+            raise RuntimeError(
+                f"Objects table is made for supervisely {FAST_TABLE_SDK_VERSION}, "
+                f"installed {version('supervisely')}: it overrides FastTable internals of "
+                "that version, see FAST_TABLE_SDK_VERSION"
+            )
+        self._store = None
+        super().__init__(*args, **kwargs)
+        # the same vue component as FastTable
+        scripts = JinjaWidgets().context["__widget_scripts__"]
+        scripts.setdefault(FastTable.__name__, scripts.pop(type(self).__name__))
+
+    def read_store(self, store, columns_options, options, meta=None):
+        self._store = store
+        self._columns_first_idx = store.columns
+        self._columns_options = columns_options
+        self._project_meta = self._unpack_project_meta(meta)
+        self._parsed_source_data = {"columns": store.columns, "data": []}
+        options = dict(options)
+        self._page_size = options.pop("pageSize", 10)
+        self._active_page = 1
+        self._sort_column_idx = None
+        self._sort_order = None
+        self._search_str = ""
+        self._filter_value = None
+        self._update_page()
+
+        DataJson()[self.widget_id]["columns"] = store.columns
+        DataJson()[self.widget_id]["columnsOptions"] = columns_options
+        DataJson()[self.widget_id]["options"].update(options)
+        DataJson()[self.widget_id]["pageSize"] = self._page_size
+        DataJson()[self.widget_id]["projectMeta"] = self._project_meta
+        StateJson()[self.widget_id]["sort"] = {"column": None, "order": None}
+        StateJson()[self.widget_id]["search"] = ""
+        StateJson()[self.widget_id]["selectedRows"] = []
+        StateJson()[self.widget_id]["selectedCell"] = None
+        DataJson().send_changes()
+        StateJson().send_changes()
+
+    @property
+    def store(self):
+        return self._store
+
+    def update_rows(self):
+        """Show rows appended to the store keeping the page, sorting, search and filters"""
+        self._update_page()
+        DataJson().send_changes()
+        StateJson().send_changes()
+
+    def _update_page(self):
+        indexes = self._store.select(
+            self._filter_value, self._search_str, self._sort_column_idx, self._sort_order
+        )
+        self._rows_total = len(indexes)
+        max_page = max((self._rows_total - 1) // self._page_size + 1, 1)
+        if self._active_page < 1 or self._active_page > max_page:
+            self._active_page = 1
+
+        start = (self._active_page - 1) * self._page_size
+        page_indexes = indexes[start : start + self._page_size]
+        rows = object_balance.format_objects_rows(self._store.get_rows(page_indexes))
+        self._parsed_active_data = {
+            "columns": self._store.columns,
+            "data": [{"idx": int(idx), "items": row} for idx, row in zip(page_indexes, rows)],
+        }
+        StateJson()[self.widget_id]["page"] = self._active_page
+        DataJson()[self.widget_id]["data"] = self._parsed_active_data["data"]
+        DataJson()[self.widget_id]["total"] = self._rows_total
+
+    def _refresh(self):
+        if self._store is None:
+            return super()._refresh()
+        state = StateJson()[self.widget_id]
+        search = state["search"] or ""
+        self._active_page = state["page"] if search == self._search_str else 1
+        self._search_str = search
+        self._sort_order = state["sort"]["order"]
+        self._sort_column_idx = state["sort"]["column"]
+        self._update_page()
+        DataJson().send_changes()
+        StateJson().send_changes()
+
+    def filter(self, filter_value) -> None:
+        if self._store is None:
+            return super().filter(filter_value)
+        self._filter_value = filter_value
+        self._active_page = 1
+        self._update_page()
+        DataJson().send_changes()
+        StateJson().send_changes()
+
+    def sort(self, column_idx=None, order=None) -> None:
+        if self._store is None:
+            return super().sort(column_idx, order)
+        self._sort_column_idx = column_idx
+        self._sort_order = order
+        self._validate_sort_attrs()
+        StateJson()[self.widget_id]["sort"] = {
+            "column": self._sort_column_idx,
+            "order": self._sort_order,
+        }
+        self._update_page()
+        DataJson().send_changes()
+        StateJson().send_changes()
+
+
+fast_table = ObjectsTable()
+
+filters = {
+    column: Select(items=[Select.Item("", "all")], filterable=True, size="small")
+    for column in FILTER_COLUMNS
+}
+filters_container = Container(
+    widgets=[Field(filters[column], title) for column, title in FILTER_COLUMNS.items()],
+    direction="horizontal",
+)
+filters_container.hide()
+
+
+def get_filters():
+    return {column: select.get_value() for column, select in filters.items()}
+
+
+def set_store(store, need_to_add_tags):
+    """Show objects store in the table and fill filters with the store values.
+
+    Can be called repeatedly while the store grows: the table state is kept.
+    """
+    if fast_table.store is store:
+        fast_table.update_rows()
+    else:
+        _, columns_options = object_balance.get_objects_columns(need_to_add_tags)
+        fast_table.read_store(
+            store, columns_options, object_balance.TABLE_OPTIONS, meta=g.PROJECT_META
+        )
+    for column, select in filters.items():
+        values = store.get_values(column)
+        if values == [item.value for item in select.get_items()[1:]]:
+            continue
+        selected_value = select.get_value()
+        select.set([Select.Item("", "all"), *[Select.Item(value) for value in values]])
+        select.set_value(selected_value)
+    filters_container.show()
+
+
+def apply_filters(value):
+    fast_table.filter(get_filters())
+
+
+for select in filters.values():
+    select.value_changed(apply_filters)
 
-fast_table = FastTable()
 
 card = Card(
     title="Objects and Tags",
     description="general statistics for every single object and video-level frame-based tag in dataset/project",
-    content=Container(widgets=[fast_table]),
+    content=Container(widgets=[filters_container, fast_table]),
 )
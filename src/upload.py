@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import supervisely as sly
+from src import perf
+
+
+class ReportUploader:
+    """Uploads report files to a Team Files directory in a background thread.
+
+    Files finished early (e.g. parts of the objects csv) are uploaded while the rest of the
+    report is still calculated, so only the files written last are uploaded after it.
+    """
+
+    def __init__(self, api: sly.Api, team_id: int, remote_dir: str):
+        self.api = api
+        self.team_id = team_id
+        self.remote_dir = remote_dir
+        self.submitted = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report_upload")
+        self._futures = []
+
+    def get_remote_path(self, local_path: str) -> str:
+        return os.path.join(self.remote_dir, os.path.basename(local_path))
+
+    def submit(self, *local_paths: str):
+        """Upload files in the background, files are uploaded in the order of submission"""
+        local_paths = [path for path in local_paths if path not in self.submitted]
+        if len(local_paths) == 0:
+            return
+        self.submitted.update(local_paths)
+        self._futures.append(self._executor.submit(self._upload, local_paths))
+
+    def submit_directory(self, local_dir: str):
+        """Upload files of local_dir that are not submitted yet"""
+        self.submit(*sorted(sly.fs.list_files(local_dir)))
+
+    def _upload(self, local_paths: list):
+        remote_paths = [self.get_remote_path(path) for path in local_paths]
+        with perf.stage("upload_files"):
+            self.api.file.upload_bulk(self.team_id, local_paths, remote_paths)
+
+    def wait(self):
+        """Wait for submitted uploads, raise the error of a failed one"""
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._futures = []
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
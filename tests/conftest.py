@@ -0,0 +1,70 @@
+"""Offline stats runs over a small synthetic project served by LocalApi"""
+
+import os
+
+import pytest
+
+import src.functions as f
+import src.globals as g
+from benchmarks.synthetic import generate_project
+from src.local_api import LocalApi
+
+REPORT_FILES = ["classes_stats.csv", "objects_stats.csv", "classes_cooccurrence.csv"]
+# settings of a plain run, tests change them with monkeypatch
+RUN_SETTINGS = {
+    "CACHE_ENABLED": False,
+    "CHECKPOINT_INTERVAL": 0,
+    "SPILL_MEMORY_MB": 0,
+    "SAMPLE_SHARE": 0,
+    "SAMPLE_VIDEOS": 0,
+    "SAMPLE_TIME_BUDGET": 0,
+    "SHARD_COUNT": 1,
+    "SHARD_INDEX": 0,
+    "AGGREGATION_WORKERS": 0,
+    "PERF_STATS": False,
+}
+# state of a run set by g.init and process_project
+RUN_STATE = [
+    "api",
+    "PROJECT_ID",
+    "DATASET_ID",
+    "PROJECT",
+    "DATASET",
+    "PROJECT_META",
+    "ANNOTATED_FRAMES",
+    "CLASS_PAIRS",
+    "SAMPLE",
+    "DATASET_TREE",
+    "SHARD_BY",
+]
+
+
+@pytest.fixture(scope="session")
+def project_dir(tmp_path_factory):
+    project_dir = str(tmp_path_factory.mktemp("fixture") / "project")
+    generate_project(project_dir, datasets=3, videos=5, frames=60, objects=6, classes=4)
+    return project_dir
+
+
+@pytest.fixture
+def run_stats(project_dir, tmp_path, monkeypatch):
+    """Return function(report_name, api=None, **calculate_stats_kwargs) that calculates stats
+    of the fixture project and returns report file name -> contents
+    """
+    monkeypatch.setattr(g, "STORAGE_DIR", str(tmp_path / "storage"))
+    for name, value in RUN_SETTINGS.items():
+        monkeypatch.setattr(g, name, value)
+    for name in RUN_STATE:
+        monkeypatch.setattr(g, name, getattr(g, name, None))
+
+    def run(report_name, api=None, **kwargs):
+        report_dir = str(tmp_path / report_name)
+        g.init(api or LocalApi(project_dir), 1)
+        f.calculate_stats(need_to_add_tags=True, report_dir=report_dir, formats=["csv"], **kwargs)
+        reports = {}
+        for file_name in REPORT_FILES:
+            with open(os.path.join(report_dir, file_name)) as file:
+                reports[file_name] = file.read()
+        return reports
+
+    return run
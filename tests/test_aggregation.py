@@ -0,0 +1,30 @@
+import src.functions as f
+import src.globals as g
+import supervisely as sly
+from src.local_api import VideoInfo
+from tests.test_count_engines import META, get_annotations
+
+
+def test_spawned_workers_match_serial_run(monkeypatch):
+    # workers get project meta and settings from the initializer, not from the parent state
+    monkeypatch.setattr(g, "PROJECT_META", META)
+    monkeypatch.setattr(g, "COUNT_ENGINE", "validate")
+    monkeypatch.setattr(g, "AGGREGATION_WORKERS", 2)
+    monkeypatch.setattr(g, "AGGREGATION_CHUNK_SIZE", 2)
+    fetched = []
+    for _ in range(3):
+        for name, ann_json in get_annotations().items():
+            video_id = len(fetched) + 1
+            ann_json["videoId"] = video_id
+            video_info = VideoInfo(video_id, name, 1, ann_json["framesCount"], 0.5, "2024-01-01")
+            fetched.append((video_info, ann_json))
+
+    serial = list(f.iter_summaries(fetched, sly.KeyIdMap()))
+    executor = f.get_aggregation_executor()
+    try:
+        parallel = list(f.iter_summaries(fetched, sly.KeyIdMap(), executor))
+    finally:
+        executor.shutdown()
+
+    assert all(video_summary is not None for _, video_summary in serial)
+    assert parallel == serial
@@ -0,0 +1,70 @@
+import os
+
+import src.functions as f
+from src import cache
+from src.local_api import VideoInfo
+from tests.test_count_engines import META, get_annotations
+
+
+def make_summaries(dataset_id: int, first_id: int, updated_at: str = "2024-01-01") -> list:
+    summaries = []
+    for video_id, ann_json in enumerate(get_annotations().values(), start=first_id):
+        frames_count = ann_json["framesCount"]
+        video_info = VideoInfo(video_id, str(video_id), dataset_id, frames_count, 0.5, updated_at)
+        summaries.append(f.summarize_annotation_json(video_info, ann_json, META))
+    return summaries
+
+
+def fill(stats_cache: cache.StatsCache, summaries_by_dataset: dict):
+    for dataset_id, summaries in summaries_by_dataset.items():
+        for video_summary in summaries:
+            stats_cache.put(video_summary)
+        stats_cache.complete_dataset(dataset_id, [s.video.id for s in summaries])
+    stats_cache.save()
+
+
+def test_only_changed_datasets_are_rewritten(tmp_path):
+    summaries = {1: make_summaries(1, 1), 2: make_summaries(2, 10)}
+    fill(cache.StatsCache(str(tmp_path), "hash"), summaries)
+    assert sorted(os.listdir(tmp_path)) == ["1.json.gz", "2.json.gz"]
+
+    stats_cache = cache.StatsCache(str(tmp_path), "hash")
+    for video_summary in summaries[2]:
+        assert stats_cache.get(video_summary.video) == video_summary
+    stats_cache.complete_dataset(2, [s.video.id for s in summaries[2]])
+    # dataset 1 is never read, it is not in memory and not rewritten
+    changed = make_summaries(1, 1, updated_at="2024-02-02")
+    stats_cache.put(changed[0])
+    assert stats_cache.get(summaries[1][1].video) == summaries[1][1]
+    stats_cache.complete_dataset(1, [s.video.id for s in summaries[1]])
+    stats_cache.save()
+    assert stats_cache.saved == ["1.json.gz"]
+    assert stats_cache.datasets == {}
+    assert (stats_cache.hits, stats_cache.misses) == (4, 0)
+
+    stats_cache = cache.StatsCache(str(tmp_path), "hash")
+    assert stats_cache.get(summaries[1][0].video) is None
+    assert stats_cache.get(changed[0].video) == changed[0]
+
+
+def test_deleted_videos_are_evicted(tmp_path):
+    summaries = make_summaries(1, 1)
+    fill(cache.StatsCache(str(tmp_path), "hash"), {1: summaries})
+
+    stats_cache = cache.StatsCache(str(tmp_path), "hash")
+    stats_cache.complete_dataset(1, [summaries[0].video.id])
+    assert stats_cache.evicted == 2
+    stats_cache = cache.StatsCache(str(tmp_path), "hash")
+    assert stats_cache.get(summaries[0].video) == summaries[0]
+    assert stats_cache.get(summaries[1].video) is None
+
+
+def test_cache_of_other_meta_is_ignored(tmp_path):
+    summaries = make_summaries(1, 1)
+    fill(cache.StatsCache(str(tmp_path), "hash"), {1: summaries})
+
+    stats_cache = cache.StatsCache(str(tmp_path), "other hash")
+    assert all(stats_cache.get(video_summary.video) is None for video_summary in summaries)
+    stats_cache.complete_dataset(1, [video_summary.video.id for video_summary in summaries])
+    # the dataset file of the old meta is replaced
+    assert stats_cache.saved == ["1.json.gz"]
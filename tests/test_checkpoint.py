@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import src.globals as g
+from src import checkpoint
+from src.local_api import LocalApi
+
+
+class Interrupted(Exception):
+    pass
+
+
+def get_api(project_dir, listed: list, interrupt_at=None) -> LocalApi:
+    """LocalApi that records listed datasets and fails when it lists interrupt_at dataset"""
+    api = LocalApi(project_dir)
+    get_list = api.video.get_list
+
+    def get_video_list(dataset_id):
+        if dataset_id == interrupt_at:
+            raise Interrupted()
+        listed.append(dataset_id)
+        return get_list(dataset_id)
+
+    api.video.get_list = get_video_list
+    return api
+
+
+def test_restarted_run_skips_completed_datasets(run_stats, project_dir, monkeypatch):
+    expected = run_stats("clean")
+    monkeypatch.setattr(g, "CHECKPOINT_INTERVAL", 3600)
+    checkpoint_dir = checkpoint.get_checkpoint_dir(1)
+
+    listed = []
+    with pytest.raises(Interrupted):
+        run_stats("interrupted", get_api(project_dir, listed, interrupt_at=2))
+    assert listed == [1]
+    assert os.path.isfile(os.path.join(checkpoint_dir, checkpoint.STATE_FILE))
+
+    # the dataset completed before the interruption is restored, not listed again
+    listed = []
+    assert run_stats("resumed", get_api(project_dir, listed)) == expected
+    assert listed == [2, 3]
+    # the checkpoint of a finished run is removed
+    assert not os.path.exists(checkpoint_dir)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.frame_set import FrameSet
+from src.stats import cooccurrence
+
+
+def count_pairs_brute_force(class_frames: dict, class_indexes: dict) -> dict:
+    pairs = {}
+    names = [name for name in class_frames if name in class_indexes]
+    for first in names:
+        for second in names:
+            if class_indexes[first] >= class_indexes[second]:
+                continue
+            frames = set(class_frames[first].to_indexes().tolist())
+            count = len(frames & set(class_frames[second].to_indexes().tolist()))
+            if count > 0:
+                pairs[(class_indexes[first], class_indexes[second])] = count
+    return pairs
+
+
+def random_class_frames(seed: int, classes_count: int = 7, frames_count: int = 2000) -> dict:
+    rng = np.random.default_rng(seed)
+    class_frames = {}
+    for idx in range(classes_count):
+        # classes of different density and length, some never meet the others
+        size = int(rng.integers(1, frames_count))
+        density = rng.choice([0.0, 0.001, 0.05, 0.5, 1.0])
+        class_frames[f"class_{idx}"] = FrameSet.from_mask(rng.random(size) < density)
+    return class_frames
+
+
+@pytest.fixture
+def class_indexes():
+    # not in the order of names, "unknown" class is not in project meta
+    return {f"class_{idx}": (idx * 5) % 7 for idx in range(7)}
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("chunk_bytes", [cooccurrence.PAIRS_CHUNK_BYTES, 1, 64, 1000])
+@pytest.mark.parametrize("max_float32_frames", [cooccurrence.FLOAT32_MAX_FRAMES, 0])
+def test_pairs_match_brute_force(monkeypatch, class_indexes, seed, chunk_bytes, max_float32_frames):
+    monkeypatch.setattr(cooccurrence, "PAIRS_CHUNK_BYTES", chunk_bytes)
+    monkeypatch.setattr(cooccurrence, "FLOAT32_MAX_FRAMES", max_float32_frames)
+    class_frames = random_class_frames(seed)
+    class_frames["unknown"] = FrameSet.from_indexes(range(100))
+
+    expected = count_pairs_brute_force(class_frames, class_indexes)
+    assert cooccurrence.count_pairs_frames(class_frames, class_indexes) == expected
+
+
+def test_no_pairs(class_indexes):
+    assert cooccurrence.count_pairs_frames({}, class_indexes) == {}
+    single = {"class_0": FrameSet.from_indexes([1, 2, 3])}
+    assert cooccurrence.count_pairs_frames(single, class_indexes) == {}
+    apart = {"class_0": FrameSet.from_indexes([1, 2]), "class_1": FrameSet.from_indexes([40])}
+    assert cooccurrence.count_pairs_frames(apart, class_indexes) == {}
@@ -0,0 +1,133 @@
+"""Parity of the raw json counting engine with counting over deserialized VideoAnnotation"""
+
+from itertools import count
+
+import numpy as np
+import pytest
+
+import src.functions as f
+import src.globals as g
+import supervisely as sly
+from src.local_api import VideoInfo
+
+RECT = sly.ObjClass("car", sly.Rectangle)
+POLYGON = sly.ObjClass("road", sly.Polygon)
+MASK = sly.ObjClass("sky", sly.Bitmap)
+WEATHER = sly.TagMeta("weather", sly.TagValueType.ANY_STRING)
+OCCLUDED = sly.TagMeta("occluded", sly.TagValueType.NONE)
+SPEED = sly.TagMeta("speed", sly.TagValueType.ANY_NUMBER)
+META = sly.ProjectMeta(obj_classes=[RECT, POLYGON, MASK], tag_metas=[WEATHER, OCCLUDED, SPEED])
+FRAMES_COUNT = 12
+IMG_SIZE = (40, 60)
+# ids are unique in the project
+IDS = count(1)
+
+
+def make_annotation(objects_frames, video_tags=(), frames_count=FRAMES_COUNT):
+    """Build annotation json: objects_frames is a list of (VideoObject, {frame: geometry})"""
+    frames = {}
+    for video_object, geometries in objects_frames:
+        for frame_index, geometry in geometries.items():
+            figure = sly.VideoFigure(video_object, geometry, frame_index)
+            frames.setdefault(frame_index, []).append(figure)
+    ann = sly.VideoAnnotation(
+        IMG_SIZE,
+        frames_count,
+        objects=sly.VideoObjectCollection([video_object for video_object, _ in objects_frames]),
+        frames=sly.FrameCollection(
+            [sly.Frame(index, figures) for index, figures in sorted(frames.items())]
+        ),
+        tags=sly.VideoTagCollection(list(video_tags)),
+    )
+    return add_ids(ann.to_json())
+
+
+def add_ids(ann_json):
+    """Set ids of objects, figures and tags like in annotations downloaded from the server"""
+    items = [*ann_json["objects"], *ann_json["tags"]]
+    items += [figure for frame in ann_json["frames"] for figure in frame["figures"]]
+    items += [tag for obj in ann_json["objects"] for tag in obj["tags"]]
+    for item in items:
+        item["id"] = next(IDS)
+    return ann_json
+
+
+def rectangle(shift):
+    return sly.Rectangle(2 + shift, 3, 10 + shift, 20)
+
+
+def polygon(shift):
+    exterior = [sly.PointLocation(0, 0), sly.PointLocation(0, 20 + shift), sly.PointLocation(15, 5)]
+    interior = [[sly.PointLocation(2, 2), sly.PointLocation(2, 4), sly.PointLocation(4, 3)]]
+    return sly.Polygon(exterior, interior)
+
+
+def bitmap(size):
+    mask = np.zeros((10, 12), dtype=bool)
+    mask[1 : 1 + size, 2 : 2 + 2 * size] = True
+    return sly.Bitmap(mask, origin=sly.PointLocation(5, 7))
+
+
+def get_annotations():
+    car = sly.VideoObject(
+        RECT,
+        tags=sly.VideoTagCollection(
+            [
+                sly.VideoTag(OCCLUDED, frame_range=(1, 2)),
+                sly.VideoTag(OCCLUDED, frame_range=(6, 9)),
+                sly.VideoTag(SPEED, value=42),
+            ]
+        ),
+    )
+    road = sly.VideoObject(POLYGON, tags=sly.VideoTagCollection([sly.VideoTag(WEATHER, "rain")]))
+    sky = sly.VideoObject(MASK)
+    other_car = sly.VideoObject(RECT)
+    tracks = make_annotation(
+        [
+            # gappy track: runs 0-2, 5-6, 9
+            (car, {frame: rectangle(frame) for frame in (0, 1, 2, 5, 6, 9)}),
+            (road, {frame: polygon(frame) for frame in (3, 4, 10)}),
+            (sky, {frame: bitmap(1 + frame % 3) for frame in range(0, FRAMES_COUNT, 4)}),
+            # object on the same frames as another object of its class
+            (other_car, {1: rectangle(5), 11: rectangle(7)}),
+        ],
+        video_tags=[
+            sly.VideoTag(WEATHER, "sunny", frame_range=(0, 5)),
+            sly.VideoTag(WEATHER, "fog", frame_range=(4, 8)),
+            sly.VideoTag(OCCLUDED),
+        ],
+    )
+    video_tags_only = make_annotation([], video_tags=[sly.VideoTag(SPEED, 3, frame_range=(2, 7))])
+    empty = make_annotation([], frames_count=0)
+    return {"tracks": tracks, "video_tags_only": video_tags_only, "empty": empty}
+
+
+@pytest.fixture(autouse=True)
+def project_meta(monkeypatch):
+    monkeypatch.setattr(g, "PROJECT_META", META)
+    monkeypatch.setattr(g, "GEOMETRY_STATS", True)
+
+
+@pytest.mark.parametrize("name", ["tracks", "video_tags_only", "empty"])
+def test_json_engine_matches_deserialized_annotation(name):
+    ann_json = get_annotations()[name]
+    video_info = VideoInfo(1, f"{name}.mp4", 1, ann_json["framesCount"], 0.5, "2024-01-01")
+
+    json_summary = f.summarize_annotation_json(video_info, ann_json, META)
+    sdk_summary = f.summarize_annotation_deserialized(video_info, ann_json, sly.KeyIdMap())
+
+    assert sdk_summary is not None
+    assert json_summary == sdk_summary
+
+
+def test_gappy_track_and_geometry_are_counted():
+    ann_json = get_annotations()["tracks"]
+    video_info = VideoInfo(1, "tracks.mp4", 1, FRAMES_COUNT, 0.5, "2024-01-01")
+    video_summary = f.summarize_annotation_json(video_info, ann_json, META)
+
+    cars = [obj for obj in video_summary.objects if obj.class_name == "car"]
+    car = max(cars, key=lambda obj: obj.frames)
+    assert (car.frames, car.first_frame, car.last_frame, car.runs, car.max_gap) == (6, 0, 9, 3, 2)
+    assert video_summary.class_frames["car"].to_indexes().tolist() == [0, 1, 2, 5, 6, 9, 11]
+    assert all(obj.geometry is not None for obj in video_summary.objects)
+    assert len(video_summary.tags) == 3
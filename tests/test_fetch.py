@@ -0,0 +1,30 @@
+import pytest
+
+from src.fetch import order_annotations
+
+
+def test_order_annotations_restores_requested_order():
+    ann_infos = [{"videoId": 3}, {"videoId": 1}, {"videoId": 2}]
+    ordered = order_annotations([1, 2, 3], ann_infos, download=None)
+    assert [ann_info["videoId"] for ann_info in ordered] == [1, 2, 3]
+
+
+def test_order_annotations_downloads_missing_videos():
+    downloaded = []
+
+    def download(video_id):
+        downloaded.append(video_id)
+        return {"videoId": video_id, "single": True}
+
+    ordered = order_annotations([1, 2, 3, 4], [{"videoId": 4}, {"videoId": 2}], download)
+    assert downloaded == [1, 3]
+    assert [ann_info["videoId"] for ann_info in ordered] == [1, 2, 3, 4]
+    assert [ann_info.get("single", False) for ann_info in ordered] == [True, False, True, False]
+
+
+def test_order_annotations_never_pairs_by_position():
+    def download(video_id):
+        return {"videoId": video_id + 100}
+
+    with pytest.raises(RuntimeError):
+        order_annotations([1, 2], [{"videoId": 2}], download)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src import frame_ranges
+from src.frame_ranges import TrackStats
+
+RANGES_CASES = {
+    "overlapping": ([(3, 8), (0, 5)], [(0, 8)]),
+    "contained": ([(0, 10), (2, 3)], [(0, 10)]),
+    "touching": ([(0, 2), (3, 4)], [(0, 4)]),
+    "one frame apart": ([(0, 2), (4, 5)], [(0, 2), (4, 5)]),
+    "single frames": ([(7, 7), (7, 7), (8, 8), (1, 1)], [(1, 1), (7, 8)]),
+    "empty range": ([(5, 4), (1, 2)], [(1, 2)]),
+    "only empty ranges": ([(5, 4)], []),
+    "no ranges": ([], []),
+}
+
+
+@pytest.mark.parametrize("ranges, expected", RANGES_CASES.values(), ids=RANGES_CASES.keys())
+def test_merge_ranges(ranges, expected):
+    assert frame_ranges.merge_ranges(ranges) == expected
+
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    groups, starts, ends = frame_ranges.merge_ranges_by_group([0] * len(ranges), starts, ends)
+    assert groups.tolist() == [0] * len(expected)
+    assert list(zip(starts.tolist(), ends.tolist())) == expected
+
+
+def test_ranges_of_groups_are_merged_apart():
+    # ranges of the next group start right after and inside the ranges of the previous one
+    groups, starts, ends = frame_ranges.merge_ranges_by_group(
+        [1, 0, 1, 2], [5, 0, 11, 0], [6, 10, 11, 0]
+    )
+    assert groups.tolist() == [0, 1, 1, 2]
+    assert list(zip(starts.tolist(), ends.tolist())) == [(0, 10), (5, 6), (11, 11), (0, 0)]
+
+
+@pytest.mark.parametrize("vectorize_min_ranges", [frame_ranges.VECTORIZE_MIN_RANGES, 0])
+def test_ranges_coverage(monkeypatch, vectorize_min_ranges):
+    monkeypatch.setattr(frame_ranges, "VECTORIZE_MIN_RANGES", vectorize_min_ranges)
+    names = ["a", "b", "a", "c", "a", "d"]
+    ranges = [(0, 5), (7, 7), (6, 9), (4, 3), (20, 21), (2, 2)]
+
+    coverage = frame_ranges.get_ranges_coverage(names, ranges)
+
+    assert coverage["a"] == (12, [(0, 9), (20, 21)], 0, 21, 3)
+    assert coverage["b"] == (1, [(7, 7)], 7, 7, 1)
+    assert coverage["c"] == (0, [], None, None, 1)
+    assert coverage["d"] == (1, [(2, 2)], 2, 2, 1)
+    assert frame_ranges.get_ranges_coverage([], []) == {}
+
+
+def test_tracks_stats():
+    frames_by_key = {
+        "single frame": [5],
+        "continuous": [4, 3, 5],
+        "gappy": [10, 0, 1, 5, 9],
+        # a gap of one frame is a gap
+        "one frame apart": np.array([2, 0]),
+    }
+
+    assert frame_ranges.get_tracks_stats(frames_by_key) == {
+        "single frame": TrackStats(1, 5, 5, 1, 0),
+        "continuous": TrackStats(3, 3, 5, 1, 0),
+        "gappy": TrackStats(5, 0, 10, 3, 3),
+        "one frame apart": TrackStats(2, 0, 2, 2, 1),
+    }
+    assert frame_ranges.get_tracks_stats({}) == {}
+
+
+@pytest.mark.parametrize(
+    "merged_ranges, expected",
+    [([], (0, 0)), ([(3, 3)], (1, 0)), ([(0, 2), (4, 4), (8, 9)], (3, 3))],
+)
+def test_ranges_gaps(merged_ranges, expected):
+    assert frame_ranges.get_ranges_gaps(merged_ranges) == expected
@@ -0,0 +1,61 @@
+"""ObjectsTable overrides FastTable internals of the pinned SDK, see FAST_TABLE_SDK_VERSION"""
+
+import pytest
+
+import src.functions as f
+import src.globals as g
+from src.local_api import LocalApi
+from src.stats import object_balance
+from src.ui import object_stats
+from supervisely.app import DataJson, StateJson
+
+PAGE_SIZE = object_balance.TABLE_OPTIONS["pageSize"]
+
+
+@pytest.fixture
+def objects_store(run_stats, project_dir):
+    g.init(LocalApi(project_dir), 1)
+    _, objects_store = f.calculate_stats(need_to_add_tags=True)
+    return objects_store
+
+
+def get_page(table) -> list:
+    return [row["items"] for row in DataJson()[table.widget_id]["data"]]
+
+
+def test_objects_table_pages_sorts_and_filters_the_store(objects_store):
+    columns = objects_store.columns
+    all_rows = object_balance.format_objects_rows(objects_store.get_rows(range(len(objects_store))))
+    _, columns_options = object_balance.get_objects_columns(need_to_add_tags=True)
+    table = object_stats.ObjectsTable()
+    table.read_store(objects_store, columns_options, object_balance.TABLE_OPTIONS, g.PROJECT_META)
+
+    assert DataJson()[table.widget_id]["total"] == len(all_rows) > 2 * PAGE_SIZE
+    assert get_page(table) == all_rows[:PAGE_SIZE]
+
+    # the browser changes the page and the sorting in the state
+    frames_idx = columns.index("frames")
+    StateJson()[table.widget_id]["page"] = 2
+    StateJson()[table.widget_id]["sort"] = {"column": frames_idx, "order": "desc"}
+    table._refresh()
+    frames = sorted((row[frames_idx] for row in all_rows), reverse=True)
+    assert [row[frames_idx] for row in get_page(table)] == frames[PAGE_SIZE : 2 * PAGE_SIZE]
+
+    # the page is kept as in FastTable.sort
+    table.sort(frames_idx, "asc")
+    assert [row[frames_idx] for row in get_page(table)] == sorted(frames)[PAGE_SIZE : 2 * PAGE_SIZE]
+    table.sort(frames_idx, "unknown order")
+    assert StateJson()[table.widget_id]["sort"] == {"column": frames_idx, "order": None}
+
+    dataset_idx = columns.index("dataset")
+    table.filter({"dataset": "ds_1"})
+    expected = [row for row in all_rows if row[dataset_idx] == "ds_1"]
+    assert DataJson()[table.widget_id]["total"] == len(expected)
+    assert StateJson()[table.widget_id]["page"] == 1
+    assert get_page(table) == expected[:PAGE_SIZE]
+
+
+def test_objects_table_fails_on_other_sdk_version(monkeypatch):
+    monkeypatch.setattr(object_stats, "version", lambda package: "0.0.1")
+    with pytest.raises(RuntimeError):
+        object_stats.ObjectsTable()
@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+import src.globals as g
+import supervisely as sly
+from src import sampling
+from src.stats import cooccurrence
+
+DatasetInfo = namedtuple("DatasetInfo", ["id", "name", "items_count"])
+VideoInfo = namedtuple("VideoInfo", ["id"])
+VideoSummary = namedtuple("VideoSummary", ["class_objects", "class_figures"])
+
+
+def test_sample_sizes_by_share_and_by_count():
+    populations = {1: 100, 2: 10, 3: 1}
+    assert sampling.get_sample_sizes(populations, share=0.1) == {1: 10, 2: 2, 3: 1}
+    assert sampling.get_sample_sizes(populations, videos=1) == {1: 2, 2: 2, 3: 1}
+    assert sampling.get_sample_sizes(populations, videos=1000) == populations
+
+
+@pytest.mark.parametrize("share, videos", [(1.5, 0), (-0.1, 0), (0, 0.5), (0, -3), (0.1, 10)])
+def test_invalid_sample_settings(share, videos):
+    with pytest.raises(ValueError):
+        sampling.ProjectSample(["car"], share=share, videos=videos, time_budget=0)
+
+
+def run_sample(datasets: list) -> sampling.ProjectSample:
+    """Sample half of 4 videos of every dataset, sampled videos have 1 and 5 cars"""
+    sample = sampling.ProjectSample(["car"], share=0.5, time_budget=0)
+    sample.plan(datasets)
+    for ds_info in datasets:
+        videos = sample.select_videos(ds_info, [VideoInfo(idx) for idx in range(4)])
+        assert len(videos) == 2
+        for cars in (1, 5):
+            video_summary = VideoSummary({"car": cars}, {"car": cars * 3})
+            video_frames = {g.BY_CLS_NAME: {"car": cars * 2}, g.FRAMES: cars * 2}
+            sample.add(ds_info.id, video_summary, video_frames)
+    return sample
+
+
+def test_datasets_with_the_same_name_are_separate_strata():
+    datasets = [DatasetInfo(1, "train", 4), DatasetInfo(2, "train", 4)]
+    sample = run_sample(datasets)
+    single = run_sample(datasets[:1])
+
+    assert set(sample.strata) == {1, 2}
+    assert [sample.get_dataset_counts(ds_info.id)[0] for ds_info in datasets] == ["train"] * 2
+    assert sample.get_dataset_counts(2)[1] == {"car": 12}
+    assert list(sample.get_total_frames_counts().values()) == [24, 24]
+    # variances of independent strata add up
+    expected = np.rint(np.array(single.get_margins()) * np.sqrt(2)).astype(np.int64)
+    assert np.array_equal(sample.get_margins(), expected)
+
+
+def test_cooccurrence_is_scaled_like_class_counts(monkeypatch):
+    datasets = [DatasetInfo(1, "train", 4), DatasetInfo(2, "val", 4)]
+    sample = run_sample(datasets)
+    meta = sly.ProjectMeta(
+        obj_classes=[sly.ObjClass("car", sly.Rectangle), sly.ObjClass("road", sly.Polygon)]
+    )
+    monkeypatch.setattr(g, "PROJECT_META", meta)
+    monkeypatch.setattr(g, "DATASET_ID", None)
+    monkeypatch.setattr(g, "SAMPLE", sample)
+
+    assert sample.get_weights() == {"train": 2, "val": 2}
+    table = cooccurrence.calculate_cooccurrence_stats({"train": {(0, 1): 3}, "val": {(0, 1): 5}})
+    # pairs of 2 of 4 sampled videos are estimated for all videos like the class counts
+    assert table["data"] == [[0, "car", "road", 16, 6, 10]]
@@ -0,0 +1,25 @@
+import glob
+import os
+
+import pytest
+
+import src.functions as f
+import src.globals as g
+from src import shard
+from src.local_api import LocalApi
+
+
+@pytest.mark.parametrize("by", shard.SHARD_BY)
+def test_merged_shards_match_single_run(run_stats, project_dir, tmp_path, monkeypatch, by):
+    expected = run_stats("single")
+    storage_dir = g.STORAGE_DIR
+    shards_dir = str(tmp_path / "shards")
+    for index in range(3):
+        monkeypatch.setattr(g, "STORAGE_DIR", storage_dir)
+        shard.configure(index, 3, by)
+        g.init(LocalApi(project_dir), 1)
+        f.calculate_stats(need_to_add_tags=True, report_dir=shards_dir, formats=["csv"])
+    assert len(glob.glob(os.path.join(shards_dir, shard.SHARD_FILES_PATTERN))) == 3
+
+    monkeypatch.setattr(g, "SHARD_COUNT", 1)
+    assert run_stats("merged", shards_dir=shards_dir) == expected
@@ -0,0 +1,15 @@
+import os
+
+import src.globals as g
+from src import spill
+
+
+def test_spilled_run_matches_run_in_memory(run_stats, monkeypatch):
+    expected = run_stats("in_memory")
+    # a buffer of a few video summaries, so they are written in many chunks
+    monkeypatch.setattr(g, "SPILL_MEMORY_MB", 0.005)
+
+    assert run_stats("spilled") == expected
+    # both video summaries and columns of the objects table were on disk
+    suffixes = {os.path.splitext(name)[1] for name in os.listdir(spill.get_spill_dir())}
+    assert suffixes == {".pkl", ".npy"}